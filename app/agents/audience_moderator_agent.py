@@ -1,6 +1,8 @@
-from langchain_groq import ChatGroq
 from langchain.prompts import ChatPromptTemplate
 
+from app.core.clients import get_chat_model
+from app.core.metrics import timed
+
 MOD_SYSTEM = """
 ...
 Format STRICT (JSON, sans texte autour):
@@ -16,12 +18,7 @@ Format STRICT (JSON, sans texte autour):
 
 class AudienceModeratorAgent:
     def __init__(self, api_key: str):
-        self.llm = ChatGroq(
-            api_key=api_key,
-            model="llama-3.1-8b-instant",
-            temperature=0.4,
-            streaming=False
-        )
+        self.llm = get_chat_model(api_key, temperature=0.4)
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", MOD_SYSTEM),
             ("human", "Contexte actuel: {context}\nPropositions audience:\n{raw_ideas}\n")
@@ -30,5 +27,6 @@ class AudienceModeratorAgent:
 
     def pick_three(self, context: str, ideas: list[str]):
         raw_ideas = "\n".join([f"- {x}" for x in ideas])
-        resp = self.chain.invoke({"context": context, "raw_ideas": raw_ideas})
+        with timed("moderator_llm"):
+            resp = self.chain.invoke({"context": context, "raw_ideas": raw_ideas})
         return resp.content
@@ -1,9 +1,16 @@
 import json
+import os
 import re
 
-from langchain_groq import ChatGroq
 from langchain.prompts import ChatPromptTemplate
 
+from app.agents.json_stream import JSONObjectStream
+from app.agents.scam_classifier import ScamClassifier
+from app.core import budget
+from app.core.clients import get_chat_model
+from app.core.hedging import LLMTimeout
+from app.core.metrics import DIRECTOR_FALLBACKS, timed
+
 SCAM_SCRIPTS = {
     "banque": {
         "stages": {
@@ -93,7 +100,7 @@ Règles :
 - Identifie le type d'arnaque et le stade actuel en te basant sur les signaux de détection.
 
 Format de sortie STRICT (JSON uniquement, sans texte autour) :
-{{"scam_type": "banque|support_technique|colis|autre", "stage": "1-4", "stage_description": "description courte du stade", "new_objective": "objectif actionnable pour Jeanne"}}
+{{"scam_type": "banque|support_technique|colis|autre", "stage": "1-4", "new_objective": "objectif actionnable pour Jeanne", "stage_description": "description courte du stade"}}
 """
 
 DEFAULT_RESULT = {
@@ -104,64 +111,196 @@ DEFAULT_RESULT = {
 }
 
 
-def _format_scam_scripts():
-    """Format SCAM_SCRIPTS into a readable string for the prompt."""
-    lines = []
-    for script_type, script in SCAM_SCRIPTS.items():
-        lines.append(f"\n{script_type.upper()} :")
-        for stage_num, stage in script["stages"].items():
-            signals = ", ".join(stage["signals"])
-            lines.append(f"  Stade {stage_num} ({stage['name']}) — Signaux : {signals}")
-            lines.append(f"    → Objectif Jeanne : {stage['objective']}")
+def _render_script(script_type: str, script: dict) -> str:
+    lines = [f"\n{script_type.upper()} :"]
+    for stage_num, stage in script["stages"].items():
+        signals = ", ".join(stage["signals"])
+        lines.append(f"  Stade {stage_num} ({stage['name']}) — Signaux : {signals}")
+        lines.append(f"    → Objectif Jeanne : {stage['objective']}")
     return "\n".join(lines)
 
 
-class DirectorAgent:
-    def __init__(self, api_key: str):
-        self.llm = ChatGroq(
-            api_key=api_key,
-            model="llama-3.1-8b-instant",
-            temperature=0.2,
-            streaming=False
-        )
-
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", DIRECTOR_SYSTEM),
-            ("human",
-             "Historique (résumé): {history_summary}\n"
-             "Dernier message arnaqueur: {last_scammer}\n"
-             "Type de script actuel: {script_hint}\n")
-        ])
+# Rendus une seule fois, à l'import
+SCRIPT_FRAGMENTS = {
+    script_type: _render_script(script_type, script)
+    for script_type, script in SCAM_SCRIPTS.items()
+}
+FULL_CATALOGUE = "\n".join(SCRIPT_FRAGMENTS.values())
+# One line per type: stage names only
+SCRIPT_INDEX = {
+    script_type: f"  {script_type.upper()} : " + ", ".join(
+        f"{num} {stage['name']}" for num, stage in script["stages"].items()
+    )
+    for script_type, script in SCAM_SCRIPTS.items()
+}
+FOCUSED_CATALOGUES = {
+    script_type: fragment + "\n\nAutres types (stades seulement) :\n" + "\n".join(
+        line for other, line in SCRIPT_INDEX.items() if other != script_type
+    )
+    for script_type, fragment in SCRIPT_FRAGMENTS.items()
+}
+
+CLASSIFIER = ScamClassifier(SCAM_SCRIPTS)
+
+
+def _fallback(reason: str) -> dict:
+    DIRECTOR_FALLBACKS.inc(1, reason)
+    return dict(DEFAULT_RESULT)
+
+
+def _format_scam_scripts(focus=None) -> str:
+    """Scripts for the prompt: one detailed type plus an index of the
+    others, or the full catalogue when ``focus`` is None."""
+    return FOCUSED_CATALOGUES.get(focus, FULL_CATALOGUE)
+
+
+def _script_focus(last_scammer: str, history_summary: str, script_hint: str, scam_type: str):
+    """Type worth detailing in the prompt, or None when classification is
+    uncertain and the director needs the full catalogue."""
+    detected = scam_type in SCAM_SCRIPTS
+    focus = scam_type if detected else script_hint
+    if focus not in SCAM_SCRIPTS:
+        return None
+    scores = CLASSIFIER.type_scores(last_scammer, _scammer_lines(history_summary))
+    if scores and max(scores, key=scores.get) != focus:
+        return None
+    if not detected and not scores.get(focus):
+        return None
+    return focus
+
+
+def _scammer_lines(history_summary: str) -> str:
+    """Only the scammer's side of the history: Jeanne's digressions
+    ("le code de la porte") must not count as signals."""
+    return "\n".join(line for line in history_summary.splitlines()
+                     if line.startswith("Arnaqueur:"))
+
+
+DIRECTOR_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", DIRECTOR_SYSTEM),
+    ("human",
+     "Historique (résumé): {history_summary}\n"
+     "Dernier message arnaqueur: {last_scammer}\n"
+     "Type de script actuel: {script_hint}\n")
+])
 
+
+class DirectorAgent:
+    def __init__(self, api_key: str, fast_path=None, streaming=None):
+        self.llm = get_chat_model(api_key, temperature=0.2)
+        self.prompt = DIRECTOR_PROMPT
         self.chain = self.prompt | self.llm
+        # Keyword classifier answers unambiguous messages without the LLM
+        self.fast_path = fast_path if fast_path is not None else (
+            os.getenv("DIRECTOR_FAST_PATH", "0").lower() in ("1", "true", "yes"))
+        # Parse the completion as it streams; new_objective is known early
+        self.streaming = streaming if streaming is not None else (
+            os.getenv("DIRECTOR_STREAMING", "0").lower() in ("1", "true", "yes"))
+
+    def _classify(self, last_scammer: str, history_summary: str):
+        if not (self.fast_path or budget.fast_director()):
+            return None
+        result = CLASSIFIER.classify(last_scammer, _scammer_lines(history_summary))
+        if result is None and budget.fast_director():
+            # Over budget: no LLM call, even for an ambiguous message
+            return _fallback("budget")
+        return result
+
+    @staticmethod
+    def _inputs(last_scammer: str, history_summary: str, script_hint: str, scam_type: str) -> dict:
+        focus = _script_focus(last_scammer, history_summary, script_hint, scam_type)
+        return {
+            "last_scammer": last_scammer,
+            "history_summary": history_summary,
+            "script_hint": script_hint,
+            "scam_scripts": _format_scam_scripts(focus),
+        }
+
+    def update_objective(self, last_scammer: str, history_summary: str = "", script_hint: str = "banque",
+                         scam_type: str = "") -> dict:
+        fast = self._classify(last_scammer, history_summary)
+        if fast is not None:
+            return fast
+        try:
+            with timed("director_llm"):
+                resp = self.chain.invoke(
+                    self._inputs(last_scammer, history_summary, script_hint, scam_type)
+                )
+            return self._parse_response(resp.content)
+        except Exception:
+            return _fallback("error")
 
-    def update_objective(self, last_scammer: str, history_summary: str = "", script_hint: str = "banque") -> dict:
+    async def aupdate_objective(self, last_scammer: str, history_summary: str = "", script_hint: str = "banque",
+                                scam_type: str = "", on_objective=None) -> dict:
+        """Async variant of update_objective.
+
+        When streaming, ``on_objective`` is called with a usable result as
+        soon as ``scam_type`` and ``new_objective`` are parsed, before the
+        trailing fields are generated.
+        """
+        fast = self._classify(last_scammer, history_summary)
+        if fast is not None:
+            return fast
+        inputs = self._inputs(last_scammer, history_summary, script_hint, scam_type)
+        if self.streaming:
+            with timed("director_llm"):
+                return await self._astream(inputs, on_objective)
         try:
-            resp = self.chain.invoke({
-                "last_scammer": last_scammer,
-                "history_summary": history_summary,
-                "script_hint": script_hint,
-                "scam_scripts": _format_scam_scripts()
-            })
+            with timed("director_llm"):
+                resp = await self.chain.ainvoke(inputs)
             return self._parse_response(resp.content)
+        except LLMTimeout:
+            return _fallback("timeout")
+        except Exception:
+            return _fallback("error")
+
+    async def _astream(self, inputs: dict, on_objective=None) -> dict:
+        parser = JSONObjectStream()
+        text = []
+        early = None
+        failed = False
+        stream = self.chain.astream(inputs)
+        try:
+            async for chunk in stream:
+                text.append(chunk.content)
+                parser.feed(chunk.content)
+                if early is None and on_objective is not None:
+                    early = self._complete(dict(parser.fields))
+                    if early is not None:
+                        on_objective(dict(early))
+                if parser.done:
+                    break  # nothing after the object is used
         except Exception:
-            return dict(DEFAULT_RESULT)
+            failed = True  # only fields already parsed are trusted
+        finally:
+            await stream.aclose()
+        # A truncated object still counts once its required fields are in
+        result = self._complete(dict(parser.fields))
+        if result is not None:
+            return result
+        return _fallback("error") if failed else self._parse_response("".join(text))
 
     @staticmethod
     def _parse_response(content: str) -> dict:
         """Extract JSON from LLM response with fallback."""
         match = re.search(r'\{[^{}]*\}', content)
         if not match:
-            return dict(DEFAULT_RESULT)
+            return _fallback("no_json")
 
         try:
             data = json.loads(match.group())
         except (json.JSONDecodeError, ValueError):
-            return dict(DEFAULT_RESULT)
+            return _fallback("invalid_json")
 
+        data = DirectorAgent._complete(data)
+        return data if data is not None else _fallback("missing_fields")
+
+    @staticmethod
+    def _complete(data: dict):
+        """Fill optional fields; None if a required one is missing."""
         required_keys = {"scam_type", "new_objective"}
-        if not required_keys.issubset(data.keys()):
-            return dict(DEFAULT_RESULT)
+        if not isinstance(data, dict) or not required_keys.issubset(data.keys()):
+            return None
 
         if "stage" not in data:
             data["stage"] = "1"
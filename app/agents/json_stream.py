@@ -0,0 +1,125 @@
+import json
+
+
+class JSONObjectStream:
+    """Incremental parser for the first JSON object of a streamed completion.
+
+    ``feed`` takes text chunks as they arrive and returns the top-level
+    ``(key, value)`` pairs completed by that chunk, so a caller can act on
+    a field before the rest of the object is generated. Text before the
+    opening brace is skipped, text after the closing one ignored. Invalid
+    JSON sets ``failed`` and stops the parsing.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.done = False
+        self.failed = False
+        self._state = "start"
+        self._token = []       # raw text of the key or value being read
+        self._key = None
+        self._in_string = False
+        self._escape = False
+        self._depth = 0        # nesting inside a value ({...} or [...])
+
+    def feed(self, chunk: str) -> list:
+        completed = []
+        for ch in chunk:
+            if self.done or self.failed:
+                break
+            self._step(ch, completed)
+        return completed
+
+    def close(self):
+        """Fields of the object if it was fully parsed, else None."""
+        return self.fields if self.done and not self.failed else None
+
+    def _fail(self):
+        self.failed = True
+
+    def _read_string(self, ch) -> bool:
+        """Consume one character of a string; True on its closing quote."""
+        self._token.append(ch)
+        if self._escape:
+            self._escape = False
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            return True
+        return False
+
+    def _finish_value(self, completed):
+        try:
+            value = json.loads("".join(self._token))
+        except ValueError:
+            self._fail()
+            return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
+        self._token = []
+        self._state = "after_value"
+
+    def _step(self, ch, completed):
+        state = self._state
+        if state == "start":
+            if ch == "{":
+                self._state = "before_key"
+        elif state == "before_key":
+            if ch == '"':
+                self._token = [ch]
+                self._state = "key"
+            elif ch == "}" and not self.fields:
+                self.done = True
+            elif not ch.isspace():
+                self._fail()
+        elif state == "key":
+            if self._read_string(ch):
+                self._key = json.loads("".join(self._token))
+                self._token = []
+                self._state = "colon"
+        elif state == "colon":
+            if ch == ":":
+                self._state = "before_value"
+            elif not ch.isspace():
+                self._fail()
+        elif state == "before_value":
+            if ch.isspace():
+                return
+            self._token = [ch]
+            if ch == '"':
+                self._state = "string"
+            elif ch in "{[":
+                self._depth = 1
+                self._state = "nested"
+            else:
+                self._state = "scalar"
+        elif state == "string":
+            if self._read_string(ch):
+                self._finish_value(completed)
+        elif state == "nested":
+            if self._in_string:
+                self._in_string = not self._read_string(ch)
+                return
+            self._token.append(ch)
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if not self._depth:
+                    self._finish_value(completed)
+        elif state == "scalar":
+            if ch in ",}" or ch.isspace():
+                self._finish_value(completed)
+                if not self.failed and not ch.isspace():
+                    self._step(ch, completed)
+            else:
+                self._token.append(ch)
+        elif state == "after_value":
+            if ch == ",":
+                self._state = "before_key"
+            elif ch == "}":
+                self.done = True
+            elif not ch.isspace():
+                self._fail()
@@ -0,0 +1,247 @@
+import asyncio
+import os
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from langchain.memory import ConversationBufferMemory
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, get_buffer_string
+from langchain_core.pydantic_v1 import Field, PrivateAttr
+
+from app.core.metrics import timed
+
+DEFAULT_TOKEN_BUDGET = 1200
+DEFAULT_KEEP_TURNS = 6
+
+_TYPE_CODES = {"human": "h", "ai": "a"}
+
+
+def dump_messages(messages) -> list:
+    """Compact, JSON-friendly form of a chat history: [[code, content], ...]."""
+    return [[_TYPE_CODES.get(m.type, "h"), m.content] for m in messages]
+
+
+def load_messages(data) -> list:
+    return [AIMessage(content=content) if code == "a" else HumanMessage(content=content)
+            for code, content in data]
+
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken's cl100k_base; about 4 chars per token if
+    the encoding cannot be loaded (offline)."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"⚠ tiktoken unavailable, estimating tokens: {e}")
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+class HistoryLines:
+    """Ring buffer of the last formatted history lines.
+
+    Each message is formatted once, when it is added; reading the history
+    is then a join over at most ``maxlen`` ready-made lines.
+    """
+
+    def __init__(self, format_line, maxlen: int = 40):
+        self.format_line = format_line
+        self.lines = deque(maxlen=maxlen)
+        self._last = None
+
+    def append(self, message: BaseMessage) -> None:
+        self.lines.append(self.format_line(message))
+        self._last = message
+
+    def sync(self, messages) -> None:
+        """Rebuild from ``messages`` if they were replaced behind our back
+        (memory loaded from the session store, tests...)."""
+        if not messages:
+            if self._last is not None:
+                self.lines.clear()
+                self._last = None
+            return
+        if messages[-1] is not self._last:
+            self.lines.clear()
+            for message in messages[-self.lines.maxlen:]:
+                self.append(message)
+
+    def text(self, max_lines: int) -> str:
+        start = max(len(self.lines) - max_lines, 0)
+        return "\n".join(self.lines[i] for i in range(start, len(self.lines)))
+
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "Tu résumes une conversation téléphonique en français, en quelques phrases "
+     "factuelles. Garde les noms, chiffres, demandes et informations déjà données."),
+    ("human",
+     "Résumé actuel :\n{summary}\n\n"
+     "Nouveaux échanges :\n{new_lines}\n\n"
+     "Résumé mis à jour :"),
+])
+
+
+class TokenBudgetMemory(ConversationBufferMemory):
+    """Conversation memory whose prompt stays within a token budget.
+
+    The last ``max_turns`` turns are kept verbatim as long as they fit in
+    ``max_token_limit`` together with the summary. Older messages move to
+    ``pending`` and are folded into ``summary`` by a background task, so
+    the LLM call that summarizes never sits on a turn's critical path.
+    """
+
+    max_token_limit: int = DEFAULT_TOKEN_BUDGET
+    max_turns: int = DEFAULT_KEEP_TURNS
+    summary: str = ""
+    pending: List[BaseMessage] = Field(default_factory=list)
+    llm: Optional[Any] = None
+    history: Optional[Any] = None  # HistoryLines kept in step with save_context
+    _fold_task: Optional[asyncio.Task] = PrivateAttr(default=None)
+
+    def prompt_messages(self) -> List[BaseMessage]:
+        self.prune()
+        messages = list(self.chat_memory.messages)
+        if self.summary:
+            messages.insert(0, SystemMessage(content=f"Résumé des échanges précédents : {self.summary}"))
+        return messages
+
+    def prune(self) -> None:
+        """Move the oldest messages out of the prompt until it fits."""
+        if self.max_token_limit <= 0:
+            return
+        messages = self.chat_memory.messages
+        budget = self.max_token_limit - count_tokens(self.summary)
+        sizes = [count_tokens(m.content) for m in messages]
+        total = sum(sizes)
+        dropped = 0
+        # Always keep the last exchange verbatim
+        while len(messages) - dropped > 2 and (
+            total > budget or len(messages) - dropped > 2 * self.max_turns
+        ):
+            total -= sizes[dropped]
+            dropped += 1
+        if dropped:
+            self.pending.extend(messages[:dropped])
+            self.chat_memory.messages = messages[dropped:]
+        if self.pending:
+            self._schedule_fold()
+
+    def _schedule_fold(self) -> None:
+        if self._fold_task is not None and not self._fold_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._fold_sync()  # console mode: no event loop to defer to
+            return
+        self._fold_task = loop.create_task(self._afold())
+
+    async def wait_for_fold(self) -> None:
+        if self._fold_task is not None:
+            await self._fold_task
+
+    def _summary_inputs(self, batch) -> dict:
+        return {
+            "summary": self.summary or "(aucun)",
+            "new_lines": get_buffer_string(batch, human_prefix=self.human_prefix,
+                                           ai_prefix=self.ai_prefix),
+        }
+
+    def _fallback_summary(self, batch) -> str:
+        lines = [f"{self.human_prefix if m.type == 'human' else self.ai_prefix}: {m.content[:80]}"
+                 for m in batch]
+        return " ".join(filter(None, [self.summary] + lines))
+
+    def _trim_summary(self, summary: str) -> str:
+        # The summary gets at most a third of the budget
+        limit = self.max_token_limit // 3
+        while summary and count_tokens(summary) > limit:
+            summary = summary[len(summary) // 4:]
+        return summary.strip()
+
+    async def _afold(self) -> None:
+        while self.pending:
+            pending = self.pending
+            batch = list(pending)
+            try:
+                with timed("memory_summary"):
+                    resp = await (SUMMARY_PROMPT | self.llm).ainvoke(self._summary_inputs(batch))
+                summary = resp.content
+            except Exception as e:
+                print(f"⚠ Memory summary failed: {e}")
+                summary = self._fallback_summary(batch)
+            if self.pending is not pending:
+                # load() replaced the memory meanwhile (rollback, speculation):
+                # its summary wins, and its pending messages are folded next
+                continue
+            self.summary = self._trim_summary(summary)
+            del pending[:len(batch)]
+
+    def _fold_sync(self) -> None:
+        batch = list(self.pending)
+        try:
+            with timed("memory_summary"):
+                summary = (SUMMARY_PROMPT | self.llm).invoke(self._summary_inputs(batch)).content
+        except Exception as e:
+            print(f"⚠ Memory summary failed: {e}")
+            summary = self._fallback_summary(batch)
+        self.summary = self._trim_summary(summary)
+        del self.pending[:len(batch)]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        messages = self.prompt_messages()
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {self.memory_key: self._buffer_as_str(messages)}
+
+    async def aload_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return self.load_memory_variables(inputs)
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        if self.history is not None:
+            for message in self.chat_memory.messages[-2:]:
+                self.history.append(message)
+        self.prune()
+
+    async def asave_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        self.save_context(inputs, outputs)
+
+    def dump(self) -> dict:
+        """Serializable snapshot: verbatim messages, summary and messages
+        not folded yet."""
+        data = {"messages": dump_messages(self.chat_memory.messages)}
+        if self.summary:
+            data["summary"] = self.summary
+        if self.pending:
+            data["pending"] = dump_messages(self.pending)
+        return data
+
+    def load(self, data: dict) -> None:
+        self.chat_memory.messages = load_messages(data.get("messages", []))
+        self.summary = data.get("summary", "")
+        self.pending = load_messages(data.get("pending", []))
+
+
+def make_memory(llm, human_prefix: str, ai_prefix: str) -> TokenBudgetMemory:
+    """Agent memory configured from MEMORY_TOKEN_BUDGET (0 disables the
+    budget) and MEMORY_KEEP_TURNS."""
+    return TokenBudgetMemory(
+        memory_key="chat_history",
+        input_key="input",
+        return_messages=True,
+        llm=llm,
+        human_prefix=human_prefix,
+        ai_prefix=ai_prefix,
+        max_token_limit=int(os.getenv("MEMORY_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)),
+        max_turns=int(os.getenv("MEMORY_KEEP_TURNS", DEFAULT_KEEP_TURNS)),
+    )
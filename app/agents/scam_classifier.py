@@ -0,0 +1,129 @@
+"""Keyword fast path for the director: scam type and stage without an LLM.
+
+The ``signals`` of every scripted stage are compiled into one Aho-Corasick
+automaton over accent- and case-folded text, so a message is scanned once
+whatever the number of signals.
+"""
+
+import unicodedata
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+LAST_MESSAGE_WEIGHT = 2
+HISTORY_WEIGHT = 1
+MIN_SCORE = 2  # at least one signal in the last message, or two in history
+MIN_MARGIN = 2  # over the runner-up stage
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents: "Accès" -> "acces"."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton matching whole words/phrases."""
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = [normalize(p) for p in patterns]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for index, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._out[node].append(index)
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> Set[int]:
+        """Indices of the patterns occurring in ``text`` as whole words."""
+        text = normalize(text)
+        found = set()
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for index in self._out[node]:
+                start = end - len(self.patterns[index]) + 1
+                if (start == 0 or not text[start - 1].isalnum()) and \
+                        (end + 1 == len(text) or not text[end + 1].isalnum()):
+                    found.add(index)
+        return found
+
+
+class ScamClassifier:
+    """Scores a scammer message against every scripted stage."""
+
+    def __init__(self, scripts: dict, min_score: int = MIN_SCORE, min_margin: int = MIN_MARGIN):
+        self.scripts = scripts
+        self.min_score = min_score
+        self.min_margin = min_margin
+        patterns = []
+        # pattern index -> stages listing that signal
+        self._stages_of: List[List[Tuple[str, str]]] = []
+        seen = {}
+        for scam_type, script in scripts.items():
+            for stage, data in script["stages"].items():
+                for signal in data["signals"]:
+                    key = normalize(signal)
+                    if key not in seen:
+                        seen[key] = len(patterns)
+                        patterns.append(signal)
+                        self._stages_of.append([])
+                    self._stages_of[seen[key]].append((scam_type, stage))
+        self.matcher = KeywordMatcher(patterns)
+
+    def scores(self, last_message: str, history: str = "") -> Dict[Tuple[str, str], int]:
+        scores: Dict[Tuple[str, str], int] = {}
+        for text, weight in ((last_message, LAST_MESSAGE_WEIGHT), (history, HISTORY_WEIGHT)):
+            if not text:
+                continue
+            for index in self.matcher.find(text):
+                for stage in self._stages_of[index]:
+                    scores[stage] = scores.get(stage, 0) + weight
+        return scores
+
+    def type_scores(self, last_message: str, history: str = "") -> Dict[str, int]:
+        """Scores summed per scam type."""
+        totals: Dict[str, int] = {}
+        for (scam_type, _), score in self.scores(last_message, history).items():
+            totals[scam_type] = totals.get(scam_type, 0) + score
+        return totals
+
+    def classify(self, last_message: str, history: str = "") -> Optional[dict]:
+        """Director-shaped result when one stage clearly wins, else None."""
+        ranked = sorted(self.scores(last_message, history).items(),
+                        key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < self.min_score:
+            return None
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        if ranked[0][1] - runner_up < self.min_margin:
+            return None
+        (scam_type, stage), _ = ranked[0]
+        data = self.scripts[scam_type]["stages"][stage]
+        return {
+            "scam_type": scam_type,
+            "stage": stage,
+            "stage_description": data["name"],
+            "new_objective": data["objective"],
+            "source": "keywords",
+        }
@@ -1,10 +1,14 @@
-import os
+import asyncio
 import re
-import base64
 
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationBufferMemory
-from langchain_groq import ChatGroq
+
+from app.agents.memory import make_memory
+from app.core import budget
+from app.core.audio_store import attach_audio
+from app.core.clients import get_chat_model, get_tts_client
+from app.core.metrics import timed
+from app.core.tts import escape_ssml, synthesize_ssml
 
 
 SCAMMER_SYSTEM_PROMPT = """Tu es un arnaqueur professionnel au téléphone. Tu parles UNIQUEMENT en français.
@@ -29,93 +33,101 @@ RÈGLES IMPORTANTES :
 Tu es en appel téléphonique avec la victime. Commence par te présenter si c'est le début de la conversation.
 """
 
+SCAMMER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SCAMMER_SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human", "{input}"),
+])
+
+OPENING_INPUT = "[Début de l'appel téléphonique. La personne décroche.]"
+
 
 class ScammerAgent:
     def __init__(self, api_key: str):
-        self.tts_client = None
-        if os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
-            try:
-                from google.cloud import texttospeech
-                from langchain_google_community._utils import get_client_info
-                self.tts_client = texttospeech.TextToSpeechClient(
-                    client_info=get_client_info(module="text-to-speech")
-                )
-            except Exception:
-                pass
-
-        self.llm = ChatGroq(
-            api_key=api_key,
-            model="llama-3.1-8b-instant",
-            temperature=0.8,
-            streaming=False,
-        )
+        # Clients are process-wide; the agent only owns its memory
+        self.tts_client = get_tts_client()
+        self.llm = get_chat_model(api_key, temperature=0.8)
 
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            input_key="input",
-            return_messages=True,
-        )
+        # Older turns are summarized (at the director's low temperature)
+        self.memory = make_memory(get_chat_model(api_key, temperature=0.2),
+                                  human_prefix="Jeanne", ai_prefix="Arnaqueur")
 
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", SCAMMER_SYSTEM_PROMPT),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-        ])
+        self.chain = SCAMMER_PROMPT | self.llm
 
-        self.chain = prompt | self.llm
+    def dump_memory(self) -> dict:
+        """Serializable snapshot of the conversation memory."""
+        return self.memory.dump()
+
+    def load_memory(self, data: dict) -> None:
+        self.memory.load(data)
 
     def respond_web(self, last_victim_response: str):
         """Generate scammer response. Returns (segments, clean_text)."""
         # Save victim message to memory and invoke
-        result = self.chain.invoke({
-            "input": last_victim_response,
-            "chat_history": self.memory.chat_memory.messages,
-        })
-        output = result.content
-
-        # Update memory
-        self.memory.chat_memory.add_user_message(last_victim_response)
-        self.memory.chat_memory.add_ai_message(output)
-
-        clean_text = self._clean_for_tts(output)
-
-        seg = {"type": "text", "content": clean_text}
-        if self.tts_client and clean_text:
-            try:
-                audio_bytes = self._synthesize_bytes(clean_text)
-                if audio_bytes:
-                    seg["tts_audio"] = base64.b64encode(audio_bytes).decode("ascii")
-            except Exception:
-                pass
-
-        return [seg], clean_text
+        with timed("scammer_llm"):
+            result = self.chain.invoke({
+                "input": last_victim_response,
+                "chat_history": self.memory.prompt_messages(),
+            })
+        return self._finish_turn(last_victim_response, result.content)
+
+    async def arespond_web(self, last_victim_response: str):
+        """Async variant of respond_web."""
+        with timed("scammer_llm"):
+            result = await self.chain.ainvoke({
+                "input": last_victim_response,
+                "chat_history": self.memory.prompt_messages(),
+            })
+        return await self._afinish_turn(last_victim_response, result.content)
 
     def generate_opening(self):
         """Generate the scammer's opening message (no prior victim input)."""
-        opening_input = "[Début de l'appel téléphonique. La personne décroche.]"
-        result = self.chain.invoke({
-            "input": opening_input,
-            "chat_history": [],
-        })
-        output = result.content
-
-        # Save to memory
-        self.memory.chat_memory.add_user_message(opening_input)
-        self.memory.chat_memory.add_ai_message(output)
-
-        clean_text = self._clean_for_tts(output)
-
+        with timed("scammer_llm"):
+            result = self.chain.invoke({
+                "input": OPENING_INPUT,
+                "chat_history": [],
+            })
+        return self._finish_turn(OPENING_INPUT, result.content)
+
+    async def agenerate_opening(self):
+        """Async variant of generate_opening."""
+        with timed("scammer_llm"):
+            result = await self.chain.ainvoke({
+                "input": OPENING_INPUT,
+                "chat_history": [],
+            })
+        return await self._afinish_turn(OPENING_INPUT, result.content)
+
+    def _record(self, user_input, output):
+        """Update memory and return the TTS-ready text of the reply."""
+        self.memory.save_context({"input": user_input}, {"output": output})
+        return self._clean_for_tts(output)
+
+    def _finish_turn(self, user_input, output):
+        clean_text = self._record(user_input, output)
         seg = {"type": "text", "content": clean_text}
-        if self.tts_client and clean_text:
-            try:
-                audio_bytes = self._synthesize_bytes(clean_text)
-                if audio_bytes:
-                    seg["tts_audio"] = base64.b64encode(audio_bytes).decode("ascii")
-            except Exception:
-                pass
+        if self._speaks() and clean_text:
+            attach_audio(seg, self._safe_synthesize(clean_text))
+        return [seg], clean_text
 
+    async def _afinish_turn(self, user_input, output):
+        clean_text = self._record(user_input, output)
+        seg = {"type": "text", "content": clean_text}
+        if self._speaks() and clean_text:
+            await asyncio.to_thread(lambda: attach_audio(seg, self._safe_synthesize(clean_text)))
         return [seg], clean_text
 
+    def _speaks(self):
+        """Whether this turn gets audio: a TTS client, and budget left for it."""
+        return self.tts_client is not None and not budget.text_only()
+
+    def _safe_synthesize(self, text):
+        """Synthesize text to MP3 bytes, returning None on any TTS error."""
+        try:
+            return self._synthesize_bytes(text)
+        except Exception:
+            return None
+
     def _synthesize_bytes(self, text):
         """Synthesize text to MP3 bytes with masculine voice."""
         from google.cloud import texttospeech
@@ -123,12 +135,11 @@ class ScammerAgent:
         if not text:
             return None
 
-        escaped = (text.replace("&", "&amp;").replace("<", "&lt;")
-                       .replace(">", "&gt;").replace('"', "&quot;"))
-        ssml = f'<speak><prosody pitch="0st" rate="100%">{escaped}</prosody></speak>'
+        ssml = f'<speak><prosody pitch="0st" rate="100%">{escape_ssml(text)}</prosody></speak>'
 
-        response = self.tts_client.synthesize_speech(
-            input=texttospeech.SynthesisInput(ssml=ssml),
+        return synthesize_ssml(
+            self.tts_client,
+            ssml,
             voice=texttospeech.VoiceSelectionParams(
                 language_code="fr-FR",
                 name="fr-FR-Neural2-D",
@@ -138,7 +149,6 @@ class ScammerAgent:
                 audio_encoding=texttospeech.AudioEncoding.MP3
             ),
         )
-        return response.audio_content
 
     @staticmethod
     def _clean_for_tts(text):
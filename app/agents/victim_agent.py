@@ -1,45 +1,21 @@
+import asyncio
 import os
 import re
 import time
 
 from langchain.agents import AgentExecutor, create_openai_functions_agent
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationBufferMemory
-from langchain_groq import ChatGroq
+from app.core.audio import mp3_frames, slice_mp3
+from app.agents.memory import HistoryLines, make_memory
+from app.core import budget
+from app.core.audio_store import attach_audio
+from app.core.clients import get_chat_model, get_tts_beta_client, get_tts_client
+from app.core.metrics import timed
+from app.core.tts import escape_ssml, synthesize_ssml, synthesize_ssml_with_marks
 from app.tools.sound_tools import play_sound_by_name, SOUND_TAGS
 
 
-class VictimAgent:
-    def __init__(self, api_key):
-        self.tts_client = None
-        if os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
-            try:
-                from google.cloud import texttospeech
-                from langchain_google_community._utils import get_client_info
-                self.tts_client = texttospeech.TextToSpeechClient(
-                    client_info=get_client_info(module="text-to-speech")
-                )
-                print("✓ Google TTS client initialized")
-            except Exception as e:
-                print(f"⚠ TTS client initialization failed: {e}")
-
-        self.llm = ChatGroq(
-            api_key=api_key,
-            model="llama-3.1-8b-instant",
-            temperature=0.7,
-            streaming=False
-        )
-
-        self.tools = []
-
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            input_key="input",
-            return_messages=True
-        )
-
-        sound_tags_list = ", ".join(SOUND_TAGS.keys())
-        system_prompt = """
+VICTIM_SYSTEM_PROMPT = """
 Tu es Jeanne Dubois, 78 ans, en conversation téléphonique. Tu parles UNIQUEMENT en français.
 
 RÈGLES IMPORTANTES :
@@ -72,19 +48,50 @@ Objectif : {objective}
 Contrainte : {constraint}
 
 Rappel : Parle naturellement comme Jeanne le ferait ! Uniquement du dialogue en français avec des marqueurs sonores.
-            """.replace("SOUND_TAGS_PLACEHOLDER", sound_tags_list)
+            """.replace("SOUND_TAGS_PLACEHOLDER", ", ".join(SOUND_TAGS.keys()))
 
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad"),
-        ])
+# Built once at import; every session's executor (or chain) shares these templates.
+VICTIM_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", VICTIM_SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human", "{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+])
+# Same messages without the (always empty) scratchpad, for the lean path
+VICTIM_LEAN_PROMPT = ChatPromptTemplate.from_messages(VICTIM_PROMPT.messages[:-1])
 
+
+class VictimAgent:
+    def __init__(self, api_key, tts_mode=None, lean=None):
+        self.api_key = api_key
+        # "segment": one TTS call per text segment; "turn": one call per reply
+        self.tts_mode = tts_mode or os.getenv("VICTIM_TTS_MODE", "segment")
+        # Clients are process-wide; the agent only owns its memory
+        self.tts_client = get_tts_client()
+        self.tts_beta_client = get_tts_beta_client() if self.tts_mode == "turn" else None
+        self.llm = get_chat_model(api_key, temperature=0.7)
+
+        self.tools = []
+
+        # Older turns are summarized (at the director's low temperature)
+        self.memory = make_memory(get_chat_model(api_key, temperature=0.2),
+                                  human_prefix="Arnaqueur", ai_prefix="Jeanne")
+        # Director history lines, formatted once per message
+        self.memory.history = HistoryLines(self._summary_line, maxlen=2 * self.HISTORY_TURNS)
+
+        # Lean: prompt | llm with explicit memory, no AgentExecutor (no tools yet)
+        self.lean = lean if lean is not None else (
+            os.getenv("VICTIM_LEAN", "0").lower() in ("1", "true", "yes"))
+        if self.lean and not self.tools:
+            self.agent = self.executor = None
+            self.chain = VICTIM_LEAN_PROMPT | self.llm
+            return
+
+        self.chain = None
         self.agent = create_openai_functions_agent(
             llm=self.llm,
             tools=self.tools,
-            prompt=prompt
+            prompt=VICTIM_PROMPT
         )
 
         self.executor = AgentExecutor(
@@ -94,38 +101,69 @@ Rappel : Parle naturellement comme Jeanne le ferait ! Uniquement du dialogue en
             verbose=True
         )
 
+    def dump_memory(self) -> dict:
+        """Serializable snapshot of the conversation memory."""
+        return self.memory.dump()
+
+    def load_memory(self, data: dict) -> None:
+        self.memory.load(data)
+
+    def fork(self) -> "VictimAgent":
+        """Independent copy of this agent and its memory."""
+        clone = VictimAgent(self.api_key, tts_mode=self.tts_mode, lean=self.lean)
+        clone.tts_client, clone.tts_beta_client = self.tts_client, self.tts_beta_client
+        clone.load_memory(self.dump_memory())
+        return clone
+
     # All special tags: sound effects + PAUSE
     _ALL_TAGS = list(SOUND_TAGS.keys()) + ["PAUSE"]
     _TAG_PATTERN = re.compile(r"(\[(?:" + "|".join(_ALL_TAGS) + r")\])", re.IGNORECASE)
 
-    def get_history_summary(self, max_turns: int = 5) -> str:
-        """Extract last N exchanges from memory, formatted for the Director."""
-        messages = self.memory.chat_memory.messages
-        if not messages:
-            return "Aucun historique"
+    HISTORY_TURNS = 20  # most turns get_history_summary can return
+    SUMMARY_LINE_CHARS = 100
 
-        # Take last max_turns*2 messages (each turn = human + ai)
-        recent = messages[-(max_turns * 2):]
-        lines = []
-        for msg in recent:
-            role = "Arnaqueur" if msg.type == "human" else "Jeanne"
-            content = self._TAG_PATTERN.sub("", msg.content).strip()
-            if len(content) > 100:
-                content = content[:100] + "..."
-            lines.append(f"{role}: {content}")
+    @classmethod
+    def _summary_line(cls, msg) -> str:
+        role = "Arnaqueur" if msg.type == "human" else "Jeanne"
+        content = cls._TAG_PATTERN.sub("", msg.content).strip()
+        if len(content) > cls.SUMMARY_LINE_CHARS:
+            content = content[:cls.SUMMARY_LINE_CHARS] + "..."
+        return f"{role}: {content}"
 
-        return "\n".join(lines)
+    def get_history_summary(self, max_turns: int = 5) -> str:
+        """Last N exchanges, formatted for the Director."""
+        history = self.memory.history
+        history.sync(self.memory.chat_memory.messages)
+        if not history.lines:
+            return "Aucun historique"
+        # Each turn = human + ai
+        return history.text(max_turns * 2)
 
     PAUSE_DURATION = 1.5  # seconds
 
-    def respond(self, user_input, objective="Respond slowly.", constraint="None"):
-        result = self.executor.invoke({
-            "input": user_input,
-            "objective": objective,
-            "constraint": constraint
-        })
+    def _generate(self, user_input, objective, constraint):
+        """Run one LLM turn and record it in memory. Returns the raw output."""
+        inputs = {"input": user_input, "objective": objective, "constraint": constraint}
+        with timed("victim_llm"):
+            if self.executor is not None:
+                return self.executor.invoke(inputs)["output"]
+            inputs["chat_history"] = self.memory.prompt_messages()
+            output = self.chain.invoke(inputs).content
+        self.memory.save_context({"input": user_input}, {"output": output})
+        return output
+
+    async def _agenerate(self, user_input, objective, constraint):
+        inputs = {"input": user_input, "objective": objective, "constraint": constraint}
+        with timed("victim_llm"):
+            if self.executor is not None:
+                return (await self.executor.ainvoke(inputs))["output"]
+            inputs["chat_history"] = self.memory.prompt_messages()
+            output = (await self.chain.ainvoke(inputs)).content
+        self.memory.save_context({"input": user_input}, {"output": output})
+        return output
 
-        output = result["output"]
+    def respond(self, user_input, objective="Respond slowly.", constraint="None"):
+        output = self._generate(user_input, objective, constraint)
 
         # Split response into text segments and tags
         segments = self._TAG_PATTERN.split(output)
@@ -160,19 +198,80 @@ Rappel : Parle naturellement comme Jeanne le ferait ! Uniquement du dialogue en
 
     def respond_web(self, user_input, objective="Respond slowly.", constraint="None"):
         """Web-compatible respond: returns structured segments instead of playing audio."""
-        import base64
+        output = self._generate(user_input, objective, constraint)
 
-        result = self.executor.invoke({
-            "input": user_input,
-            "objective": objective,
-            "constraint": constraint
-        })
-        output = result["output"]
+        segments = self._build_segments(output)
+        self._add_audio(segments)
 
-        segments = []
-        raw_segments = self._TAG_PATTERN.split(output)
+        clean_text = self._TAG_PATTERN.sub("", output).strip()
+        return segments, clean_text
+
+    async def arespond_web(self, user_input, objective="Respond slowly.", constraint="None"):
+        """Async variant of respond_web: awaits the LLM and synthesizes all
+        text segments concurrently without blocking the event loop."""
+        segments, clean_text = await self.agenerate(user_input, objective, constraint)
+        async for _ in self.aiter_audio(segments):
+            pass
+        return segments, clean_text
+
+    async def agenerate(self, user_input, objective="Respond slowly.", constraint="None"):
+        """Run the LLM only. Returns (segments without audio, clean_text)."""
+        output = await self._agenerate(user_input, objective, constraint)
+
+        segments = self._build_segments(output)
+        clean_text = self._TAG_PATTERN.sub("", output).strip()
+        return segments, clean_text
 
-        for segment in raw_segments:
+    async def aiter_audio(self, segments):
+        """Attach TTS audio to the text segments, yielding the index of each
+        segment as soon as its audio is ready."""
+        if not self._speaks():
+            return
+        if self.tts_mode == "turn" and await asyncio.to_thread(self._attach_turn_audio, segments):
+            for i, seg in enumerate(segments):
+                if seg.get("tts_url"):
+                    yield i
+            return
+
+        async def synthesize(i):
+            # attach_audio may write to disk: keep it in the worker thread too
+            return i, await asyncio.to_thread(self._synthesize_into, segments[i])
+
+        tasks = [
+            asyncio.ensure_future(synthesize(i))
+            for i, seg in enumerate(segments) if seg["type"] == "text"
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, attached = await next_done
+                if attached:
+                    yield i
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _add_audio(self, segments):
+        if not self._speaks():
+            return
+        if self.tts_mode == "turn" and self._attach_turn_audio(segments):
+            return
+        for seg in segments:
+            if seg["type"] == "text":
+                self._synthesize_into(seg)
+
+    def _speaks(self):
+        """Whether this turn gets audio: a TTS client, and budget left for it."""
+        return self.tts_client is not None and not budget.text_only()
+
+    def _synthesize_into(self, seg):
+        """Synthesize a text segment and attach its audio URL; True if it has one."""
+        attach_audio(seg, self._safe_synthesize(seg["content"]))
+        return "tts_url" in seg
+
+    def _build_segments(self, output):
+        """Split the LLM output into text, sound and pause segments (no audio)."""
+        segments = []
+        for segment in self._TAG_PATTERN.split(output):
             tag = segment.strip("[]").upper()
             if tag in SOUND_TAGS:
                 segments.append({
@@ -189,18 +288,86 @@ Rappel : Parle naturellement comme Jeanne le ferait ! Uniquement du dialogue en
                 text = segment.strip()
                 if not text:
                     continue
-                seg = {"type": "text", "content": text}
-                if self.tts_client:
-                    try:
-                        audio_bytes = self._synthesize_bytes(text)
-                        if audio_bytes:
-                            seg["tts_audio"] = base64.b64encode(audio_bytes).decode("ascii")
-                    except Exception:
-                        pass
-                segments.append(seg)
+                segments.append({"type": "text", "content": text})
+        return segments
 
-        clean_text = self._TAG_PATTERN.sub("", output).strip()
-        return segments, clean_text
+    def _safe_synthesize(self, text):
+        """Synthesize text to MP3 bytes, returning None on any TTS error."""
+        try:
+            return self._synthesize_bytes(text)
+        except Exception:
+            return None
+
+    TURN_BREAK = "300ms"
+
+    def _turn_ssml(self, segments):
+        """Build one SSML document covering every text segment of a reply.
+
+        Each spoken segment is framed by ``t{i}``/``e{i}`` marks (i being its
+        index in ``segments``). Sound and PAUSE boundaries become short breaks
+        so the cut points land in silence; pause durations stay on the pause
+        segments, so playback timing is unchanged.
+        """
+        parts = []
+        spoken = []
+        for i, seg in enumerate(segments):
+            if seg["type"] != "text":
+                continue
+            text = self._clean_for_tts(seg["content"])
+            if not text:
+                continue
+            if parts:
+                parts.append(f'<break time="{self.TURN_BREAK}"/>')
+            parts.append(f'<mark name="t{i}"/>{escape_ssml(text)}<mark name="e{i}"/>')
+            spoken.append(i)
+        ssml = (f'<speak><prosody pitch="-8st" rate="70%">'
+                f'{"".join(parts)}</prosody></speak>')
+        return ssml, spoken
+
+    def _attach_turn_audio(self, segments):
+        """Synthesize the whole reply in one call and split it per segment.
+
+        Returns False when the caller should fall back to per-segment
+        synthesis (no v1beta1 client, missing marks or unparsable audio).
+        """
+        from google.cloud import texttospeech_v1beta1
+
+        if not self.tts_beta_client:
+            return False
+        ssml, spoken = self._turn_ssml(segments)
+        if not spoken:
+            return True
+
+        voice, audio_config = self._voice_config(texttospeech_v1beta1)
+        try:
+            audio, marks = synthesize_ssml_with_marks(
+                self.tts_beta_client, ssml, voice, audio_config
+            )
+        except Exception:
+            return True
+
+        try:
+            frames = mp3_frames(audio)
+            slices = {
+                i: slice_mp3(audio, marks[f"t{i}"], marks[f"e{i}"], frames)
+                for i in spoken
+            }
+        except (KeyError, ValueError):
+            return False
+        for i, audio_bytes in slices.items():
+            attach_audio(segments[i], audio_bytes)
+        return True
+
+    @staticmethod
+    def _voice_config(tts):
+        """Jeanne's voice and audio config, for either the v1 or v1beta1 API."""
+        voice = tts.VoiceSelectionParams(
+            language_code="fr-FR",
+            name="fr-FR-Neural2-E",
+            ssml_gender=tts.SsmlVoiceGender.FEMALE,
+        )
+        audio_config = tts.AudioConfig(audio_encoding=tts.AudioEncoding.MP3)
+        return voice, audio_config
 
     def _synthesize_bytes(self, text):
         """Synthesize text to MP3 bytes (no temp file)."""
@@ -210,23 +377,12 @@ Rappel : Parle naturellement comme Jeanne le ferait ! Uniquement du dialogue en
         if not text:
             return None
 
-        escaped = (text.replace("&", "&amp;").replace("<", "&lt;")
-                       .replace(">", "&gt;").replace('"', "&quot;"))
+        # SSML: lower pitch + slower rate to simulate an elderly voice
         ssml = (f'<speak><prosody pitch="-8st" rate="70%">'
-                f'{escaped}</prosody></speak>')
-
-        response = self.tts_client.synthesize_speech(
-            input=texttospeech.SynthesisInput(ssml=ssml),
-            voice=texttospeech.VoiceSelectionParams(
-                language_code="fr-FR",
-                name="fr-FR-Neural2-E",
-                ssml_gender=texttospeech.SsmlVoiceGender.FEMALE,
-            ),
-            audio_config=texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3
-            ),
-        )
-        return response.audio_content
+                f'{escape_ssml(text)}</prosody></speak>')
+
+        voice, audio_config = self._voice_config(texttospeech)
+        return synthesize_ssml(self.tts_client, ssml, voice, audio_config)
 
     @staticmethod
     def _clean_for_tts(text):
@@ -239,31 +395,13 @@ Rappel : Parle naturellement comme Jeanne le ferait ! Uniquement du dialogue en
     def _synthesize(self, text):
         """Synthesize text to a temporary MP3 file using Google TTS."""
         import tempfile
-        from google.cloud import texttospeech
 
-        text = self._clean_for_tts(text)
-        if not text:
+        audio_content = self._synthesize_bytes(text)
+        if not audio_content:
             return None
 
-        # SSML: lower pitch + slower rate to simulate an elderly voice
-        escaped = (text.replace("&", "&amp;").replace("<", "&lt;")
-                       .replace(">", "&gt;").replace('"', "&quot;"))
-        ssml = (f'<speak><prosody pitch="-8st" rate="70%">'
-                f'{escaped}</prosody></speak>')
-
-        response = self.tts_client.synthesize_speech(
-            input=texttospeech.SynthesisInput(ssml=ssml),
-            voice=texttospeech.VoiceSelectionParams(
-                language_code="fr-FR",
-                name="fr-FR-Neural2-E",
-                ssml_gender=texttospeech.SsmlVoiceGender.FEMALE,
-            ),
-            audio_config=texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3
-            ),
-        )
         with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
-            f.write(response.audio_content)
+            f.write(audio_content)
             return f.name
 
     def _play_audio(self, audio_path):
@@ -6,6 +6,9 @@ class ChatRequest(BaseModel):
     session_id: str
     user_input: str
     constraint: str = "Aucune"
+    inline_audio: bool = False  # also return audio base64-encoded in tts_audio
+    idempotency_key: Optional[str] = None  # a retry with the same key replays the response
+    pipelined: Optional[bool] = None  # run the director alongside the victim (default: DIRECTOR_PIPELINED)
 
 
 class Segment(BaseModel):
@@ -14,6 +17,7 @@ class Segment(BaseModel):
     sound_tag: Optional[str] = None
     sound_file: Optional[str] = None
     tts_audio: Optional[str] = None
+    tts_url: Optional[str] = None
     duration: Optional[float] = None
 
 
@@ -22,6 +26,9 @@ class DirectorInfo(BaseModel):
     stage: str
     stage_description: str
     objective_used: str
+    # Pipelined mode: the director's objective, applied from the next turn
+    next_objective: Optional[str] = None
+    pipelined: bool = False
 
 
 class ChatResponse(BaseModel):
@@ -46,6 +53,8 @@ class SessionInfoResponse(BaseModel):
 
 class AutoStartRequest(BaseModel):
     session_id: str
+    inline_audio: bool = False
+    idempotency_key: Optional[str] = None
 
 
 class AutoStartResponse(BaseModel):
@@ -57,6 +66,9 @@ class AutoStartResponse(BaseModel):
 class AutoNextRequest(BaseModel):
     session_id: str
     user_choice: Optional[str] = None  # "1"|"2"|"3"|"4"
+    inline_audio: bool = False
+    idempotency_key: Optional[str] = None
+    pipelined: Optional[bool] = None
 
 
 class InterventionRequired(BaseModel):
@@ -78,3 +90,19 @@ class AutoTurnResponse(BaseModel):
 
 class AutoStopRequest(BaseModel):
     session_id: str
+
+
+class StreamDone(BaseModel):
+    """Final event of the streaming turn endpoints."""
+    session_id: str
+    turn_number: int
+    victim_text: str
+    scammer_text: str = ""
+    is_complete: bool = False
+    intervention_required: Optional[InterventionRequired] = None
+
+
+class StreamError(BaseModel):
+    """Sent instead of ``done`` when a streamed turn cannot run."""
+    status_code: int
+    detail: str
@@ -1,40 +1,37 @@
-from fastapi import APIRouter, HTTPException, Request
+import asyncio
+import base64
+import re
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from app.api import turns
 from app.api.models import (
     ChatRequest, ChatResponse, DirectorInfo, Segment,
     SessionResponse, SessionInfoResponse,
     AutoStartRequest, AutoStartResponse,
     AutoNextRequest, AutoTurnResponse,
-    AutoStopRequest, InterventionRequired,
+    AutoStopRequest, StreamDone, StreamError,
 )
+from app.api.session_store import StaleSession
+from app.core.audio_store import audio_id_from_url, get_audio_store
+from app.core import budget, tracing
+from app.core.hedging import LLMTimeout
+from app.core.metrics import BUDGET_DEGRADED, TURNS, timed
+from app.core.tts import get_tts_breaker, get_tts_cache
 
 router = APIRouter(prefix="/api")
 
 
-# Constantes de mapping pour les interventions utilisateur
-INTERVENTION_CONSTRAINTS = {
-    "1": {
-        "constraint": "Tu dois maintenant raccrocher le téléphone poliment mais fermement. Dis au revoir et termine la conversation.",
-        "terminate": True
-    },
-    "2": {
-        "constraint": "Tu dois maintenant donner un faux numéro de carte bancaire de manière naturelle. Invente un numéro à 16 chiffres et fournis-le lentement comme si tu cherchais ta carte.",
-        "terminate": False
-    },
-    "3": {
-        "constraint": "Tu ressens une douleur thoracique soudaine. Tu dois manifester une détresse physique (respiration difficile, douleur), appeler à l'aide, mais reste en ligne.",
-        "terminate": False
-    },
-    "4": {
-        "constraint": "Aucune",
-        "terminate": False
-    }
-}
-
-
 def _get_session_manager(request: Request):
     return request.app.state.session_manager
 
 
+def _get_speculator(request: Request):
+    return request.app.state.speculator
+
+
 @router.post("/sessions", response_model=SessionResponse)
 async def create_session(request: Request):
     sm = _get_session_manager(request)
@@ -42,12 +39,23 @@ async def create_session(request: Request):
     return SessionResponse(session_id=session_id)
 
 
+@router.get("/stats")
+async def get_stats(request: Request):
+    sm = _get_session_manager(request)
+    return {
+        "sessions": sm.stats,
+        "speculation": _get_speculator(request).stats,
+        "budget": sm.budget.stats,
+        "tts_cache": get_tts_cache().stats,
+        "audio_store": get_audio_store().stats,
+        "tts_breaker": get_tts_breaker().stats,
+    }
+
+
 @router.get("/sessions/{session_id}", response_model=SessionInfoResponse)
 async def get_session(session_id: str, request: Request):
     sm = _get_session_manager(request)
-    state = sm.get_state(session_id)
-    if not state:
-        raise HTTPException(status_code=404, detail="Session not found")
+    state = _require_state(sm, session_id)
     return SessionInfoResponse(
         session_id=session_id,
         turn_count=state.turn_count,
@@ -61,202 +69,535 @@ async def get_session(session_id: str, request: Request):
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str, request: Request):
     sm = _get_session_manager(request)
+    _get_speculator(request).discard(session_id)
     if not sm.delete(session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     return {"detail": "Session deleted"}
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(body: ChatRequest, request: Request):
-    sm = _get_session_manager(request)
-    state = sm.get_state(body.session_id)
+def _require_state(sm, session_id: str):
+    state = sm.get_state(session_id)
     if not state:
+        if sm.is_evicted(session_id):
+            raise HTTPException(status_code=410, detail="Session expired")
         raise HTTPException(status_code=404, detail="Session not found")
+    return state
+
+
+def _start_turn(sm, state, session_id: str, turn: int) -> None:
+    """Attach tracing and budget metering to this turn, and degrade the
+    turn as the session's budget runs out (see app.core.budget). Raises
+    429 once it is exhausted."""
+    tracing.bind(session_id, turn)
+    policy = sm.budget
+    if not policy.enabled:
+        return
+    level = policy.level(state.usage)
+    if level != budget.NORMAL:
+        BUDGET_DEGRADED.inc(1, budget.LEVEL_NAMES[level])
+    if level == budget.EXHAUSTED:
+        state.is_active = False
+        sm.save(session_id, state)
+        raise HTTPException(status_code=429, detail="Budget exhausted")
+    # Text-only / fast director for this turn only: the agents read the level
+    budget.bind(state.usage, policy, level)
+
+
+def _director_info(state, objective_used: Optional[str] = None) -> DirectorInfo:
+    """``objective_used`` is given in pipelined mode, where the victim ran
+    on the objective the session had before this turn's director result."""
+    if objective_used is None:
+        return DirectorInfo(
+            scam_type=state.scam_type,
+            stage=state.stage,
+            stage_description=state.stage_description,
+            objective_used=state.current_objective,
+        )
+    return DirectorInfo(
+        scam_type=state.scam_type,
+        stage=state.stage,
+        stage_description=state.stage_description,
+        objective_used=objective_used,
+        next_objective=state.current_objective,
+        pipelined=True,
+    )
+
+
+def _pipelined(body) -> bool:
+    """Whether the director runs alongside the victim instead of before it."""
+    if body.pipelined is not None:
+        return body.pipelined
+    return turns.pipelined_default()
 
-    # 1. Get history summary from victim's memory
-    history_summary = state.victim.get_history_summary(max_turns=5)
 
-    # 2. Director analyzes and generates new objective
-    director_result = state.director.update_objective(
-        last_scammer=body.user_input,
-        history_summary=history_summary,
-        script_hint=state.script_hint,
+def _inline(seg: Segment) -> Segment:
+    """Embed a segment's stored audio as base64."""
+    if seg.tts_url and not seg.tts_audio:
+        audio = get_audio_store().get(audio_id_from_url(seg.tts_url))
+        if audio:
+            seg.tts_audio = base64.b64encode(audio).decode("ascii")
+    return seg
+
+
+def _to_segment(data: dict, inline_audio: bool = False) -> Segment:
+    """Build a Segment, embedding its stored audio as base64 on request."""
+    seg = Segment(**data)
+    return _inline(seg) if inline_audio else seg
+
+
+def _to_segments(segments_data, inline_audio: bool = False):
+    return [_to_segment(s, inline_audio) for s in segments_data]
+
+
+def _recall(state, kind: str, key, model):
+    """Response already served for this idempotency key, if any."""
+    payload = state.responses.get(f"{kind}:{key}") if key else None
+    return model.model_validate_json(payload) if payload else None
+
+
+def _remember(state, kind: str, key, response) -> None:
+    # Stored before inlining: audio stays behind its tts_url
+    if key:
+        state.remember_response(f"{kind}:{key}", response.model_dump_json(exclude_none=True))
+
+
+def _with_audio(segments, inline_audio: bool):
+    if inline_audio:
+        for seg in segments:
+            _inline(seg)
+    return segments
+
+
+def _json_response(response) -> Response:
+    """Encode the body in the handler, inside the caller's "serialize"
+    stage. Returned as a model, it would be validated and encoded by
+    FastAPI after the handler, where no timer sees it."""
+    return Response(response.model_dump_json(), media_type="application/json")
+
+
+def _sse(event: str, payload, event_id=None) -> str:
+    """Format one Server-Sent Event carrying a pydantic model as JSON data."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {payload.model_dump_json(exclude_none=True)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _event_stream(events):
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    # 3. Update session state
-    state.scam_type = director_result.get("scam_type", "autre")
-    state.stage = director_result.get("stage", "1")
-    state.stage_description = director_result.get("stage_description", "")
-    state.current_objective = director_result.get("new_objective", state.current_objective)
 
-    # 4. Victim responds with Director's objective
-    segments_data, clean_text = state.victim.respond_web(
-        user_input=body.user_input,
+async def _stream_victim(state, user_input: str, constraint: str, result: dict,
+                         inline_audio: bool = False):
+    """Yield victim segment events: all segments as text first, then each
+    segment again once its audio is synthesized."""
+    segments, clean_text = await state.victim.agenerate(
+        user_input=user_input,
         objective=state.current_objective,
-        constraint=body.constraint,
+        constraint=constraint,
     )
-    sm.increment_turn(body.session_id)
+    result["victim_text"] = clean_text
+    result["segments"] = segments
+    for i, seg in enumerate(segments):
+        yield _sse("segment", _to_segment(seg), i)
+    async for i in state.victim.aiter_audio(segments):
+        yield _sse("segment_audio", _to_segment(segments[i], inline_audio), i)
 
-    segments = [Segment(**s) for s in segments_data]
 
-    director_info = DirectorInfo(
-        scam_type=state.scam_type,
-        stage=state.stage,
-        stage_description=state.stage_description,
-        objective_used=state.current_objective,
-    )
+@router.post("/chat", response_model=ChatResponse)
+async def chat(body: ChatRequest, request: Request):
+    sm = _get_session_manager(request)
+    async with sm.lock(body.session_id):
+        state = _require_state(sm, body.session_id)
+        response = _recall(state, "chat", body.idempotency_key, ChatResponse)
+        if response is None:
+            response = await _chat_turn(sm, state, body)
+    with timed("serialize"):
+        _with_audio(response.segments, body.inline_audio)
+        return _json_response(response)
+
+
+async def _chat_turn(sm, state, body: ChatRequest) -> ChatResponse:
+    _start_turn(sm, state, body.session_id, state.turn_count + 1)
+    # Director analyzes the message, victim responds with the objective
+    with turns.all_or_nothing(state):
+        segments_data, clean_text, objective_used = await turns.victim_turn(
+            state, body.user_input, body.constraint, _pipelined(body)
+        )
+    state.turn_count += 1
+    TURNS.inc(1, "chat")
 
-    return ChatResponse(
+    response = ChatResponse(
         session_id=body.session_id,
-        segments=segments,
+        segments=_to_segments(segments_data),
         raw_text=clean_text,
-        director_info=director_info,
+        director_info=_director_info(state, objective_used),
     )
+    _remember(state, "chat", body.idempotency_key, response)
+    sm.save(body.session_id, state)
+    return response
+
+
+@router.post("/chat/stream")
+async def chat_stream(body: ChatRequest, request: Request):
+    """Streaming variant of /chat as Server-Sent Events.
+
+    Events: ``director`` (DirectorInfo), ``segment`` and ``segment_audio``
+    (Segment, with the segment index as event id) and finally ``done``.
+    In pipelined mode ``director`` comes after the victim segments. A
+    streaming director may send ``director`` again once its trailing
+    fields are in. A turn that fails (e.g. an LLM timeout, sent as an
+    ``error`` event) or is cut short by a client disconnect is rolled back.
+    """
+    sm = _get_session_manager(request)
+    _require_state(sm, body.session_id)
+
+    async def events():
+        async with sm.lock(body.session_id):
+            state = sm.get_state(body.session_id)
+            if state is None:
+                yield _sse("error", StreamError(status_code=404, detail="Session not found"))
+                return
+            cached = _recall(state, "chat", body.idempotency_key, ChatResponse)
+            if cached is not None:
+                yield _sse("director", cached.director_info)
+                for event in _replay_segments(cached.segments, body.inline_audio):
+                    yield event
+                yield _sse("done", StreamDone(
+                    session_id=body.session_id,
+                    turn_number=state.turn_count,
+                    victim_text=cached.raw_text,
+                ))
+                return
+
+            try:
+                _start_turn(sm, state, body.session_id, state.turn_count + 1)
+            except HTTPException as exc:
+                yield _sse("error", StreamError(status_code=exc.status_code, detail=exc.detail))
+                return
+            result = {}
+            try:
+                with turns.all_or_nothing(state):
+                    async for event in _stream_director_and_victim(
+                        state, body.user_input, body.constraint, result, body.inline_audio,
+                        _pipelined(body),
+                    ):
+                        yield event
+            except LLMTimeout as exc:
+                yield _sse("error", StreamError(status_code=504, detail=str(exc)))
+                return
+            objective_used = result["objective_used"]
+            state.turn_count += 1
+            TURNS.inc(1, "chat")
+            _remember(state, "chat", body.idempotency_key, ChatResponse(
+                session_id=body.session_id,
+                segments=_to_segments(result["segments"]),
+                raw_text=result["victim_text"],
+                director_info=_director_info(state, objective_used),
+            ))
+            try:
+                sm.save(body.session_id, state)
+            except StaleSession as exc:
+                yield _sse("error", StreamError(status_code=409, detail=str(exc)))
+                return
+
+        yield _sse("done", StreamDone(
+            session_id=body.session_id,
+            turn_number=state.turn_count,
+            victim_text=result["victim_text"],
+        ))
+
+    return _event_stream(events())
+
+
+async def _stream_director_and_victim(state, user_input: str, constraint: str, result: dict,
+                                     inline_audio: bool, pipelined: bool):
+    """Director event then victim events; in pipelined mode the victim
+    streams first and the director event follows once it is done."""
+    if not pipelined:
+        director = await turns.run_director(state, user_input)
+        result["objective_used"] = None
+        info = _director_info(state)
+        yield _sse("director", info)
+        try:
+            async for event in _stream_victim(state, user_input, constraint, result, inline_audio):
+                yield event
+            await turns.finish_director(state, director)
+        finally:
+            if director is not None:
+                director.cancel()
+        if _director_info(state) != info:
+            # Trailing fields of a streaming director (stage_description...)
+            yield _sse("director", _director_info(state))
+        return
+
+    objective_used = state.current_objective
+    director = asyncio.ensure_future(turns.start_director(state, user_input))
+    try:
+        async for event in _stream_victim(state, user_input, constraint, result, inline_audio):
+            yield event
+        turns.apply_director_result(state, await director)
+    finally:
+        director.cancel()
+    result["objective_used"] = objective_used
+    yield _sse("director", _director_info(state, objective_used))
+
+
+def _replay_segments(segments, inline_audio: bool, event: str = "segment"):
+    """Events of an already generated turn, audio included."""
+    for i, seg in enumerate(_with_audio(segments, inline_audio)):
+        yield _sse(event, seg, i)
+        if event == "segment":
+            yield _sse("segment_audio", seg, i)
 
 
 @router.post("/auto-conversation/start", response_model=AutoStartResponse)
 async def auto_start(body: AutoStartRequest, request: Request):
     sm = _get_session_manager(request)
-    state = sm.get_state(body.session_id)
-    if not state:
-        raise HTTPException(status_code=404, detail="Session not found")
+    async with sm.lock(body.session_id):
+        state = _require_state(sm, body.session_id)
+        response = _recall(state, "start", body.idempotency_key, AutoStartResponse)
+        if response is None:
+            response = await _auto_start(sm, state, body)
+    _with_audio(response.scammer_segments, body.inline_audio)
+    return response
+
 
+async def _auto_start(sm, state, body: AutoStartRequest) -> AutoStartResponse:
+    _start_turn(sm, state, body.session_id, 0)
     state.is_active = True
     state.turn_count = 0
 
     # Scammer generates opening message
-    scammer_segments_data, scammer_text = state.scammer.generate_opening()
-    scammer_segments = [Segment(**s) for s in scammer_segments_data]
-
-    return AutoStartResponse(
+    scammer_segments_data, scammer_text = await state.scammer.agenerate_opening()
+    response = AutoStartResponse(
         session_id=body.session_id,
-        scammer_segments=scammer_segments,
+        scammer_segments=_to_segments(scammer_segments_data),
         scammer_text=scammer_text,
     )
+    _remember(state, "start", body.idempotency_key, response)
+    sm.save(body.session_id, state)
+    return response
 
 
-@router.post("/auto-conversation/next", response_model=AutoTurnResponse)
-async def auto_next(body: AutoNextRequest, request: Request):
-    sm = _get_session_manager(request)
-    state = sm.get_state(body.session_id)
-    if not state:
-        raise HTTPException(status_code=404, detail="Session not found")
-
+def _check_auto_turn(state) -> None:
     if not state.is_active:
         raise HTTPException(status_code=400, detail="Conversation not active")
 
     if state.turn_count >= state.max_turns:
         raise HTTPException(status_code=400, detail="Max turns reached")
 
-    # Appliquer le choix utilisateur si présent
-    constraint = "Aucune"
-    should_terminate = False
-
-    if body.user_choice and body.user_choice in INTERVENTION_CONSTRAINTS:
-        intervention = INTERVENTION_CONSTRAINTS[body.user_choice]
-        constraint = intervention["constraint"]
-        should_terminate = intervention["terminate"]
-        state.pending_intervention = False
-
-    # Get last scammer message from scammer memory
-    scammer_messages = state.scammer.memory.chat_memory.messages
-    last_scammer_text = scammer_messages[-1].content if scammer_messages else ""
-
-    # 1. Director analyzes last scammer message
-    history_summary = state.victim.get_history_summary(max_turns=5)
-    director_result = state.director.update_objective(
-        last_scammer=last_scammer_text,
-        history_summary=history_summary,
-        script_hint=state.script_hint,
-    )
-
-    state.scam_type = director_result.get("scam_type", "autre")
-    state.stage = director_result.get("stage", "1")
-    state.stage_description = director_result.get("stage_description", "")
-    state.current_objective = director_result.get("new_objective", state.current_objective)
 
-    # 2. Victim responds with constraint applied
-    victim_segments_data, victim_text = state.victim.respond_web(
-        user_input=last_scammer_text,
-        objective=state.current_objective,
-        constraint=constraint,  # APPLICATION DE LA CONTRAINTE
-    )
-    victim_segments = [Segment(**s) for s in victim_segments_data]
+def _begin_auto_turn(sm, state, body: AutoNextRequest) -> None:
+    """Validate the turn and start metering it. The turn itself (from the
+    user choice on) runs under turns.all_or_nothing."""
+    _check_auto_turn(state)
+    _start_turn(sm, state, body.session_id, state.turn_count + 1)
 
-    state.turn_count += 1
 
-    # Si choix 1 (raccroche), terminer immédiatement
-    if should_terminate:
-        state.is_active = False
-        return AutoTurnResponse(
-            session_id=body.session_id,
-            turn_number=state.turn_count,
-            victim_segments=victim_segments,
-            victim_text=victim_text,
-            scammer_segments=[],
-            scammer_text="",
-            director_info=DirectorInfo(
-                scam_type=state.scam_type,
-                stage=state.stage,
-                stage_description=state.stage_description,
-                objective_used=state.current_objective,
-            ),
-            is_complete=True,
-            intervention_required=None,
+@router.post("/auto-conversation/next", response_model=AutoTurnResponse)
+async def auto_next(body: AutoNextRequest, request: Request):
+    sm = _get_session_manager(request)
+    async with sm.lock(body.session_id):
+        state = _require_state(sm, body.session_id)
+        response = _recall(state, "next", body.idempotency_key, AutoTurnResponse)
+        if response is None:
+            response = await _auto_turn(sm, _get_speculator(request), state, body)
+    with timed("serialize"):
+        _with_audio(response.victim_segments + response.scammer_segments, body.inline_audio)
+        return _json_response(response)
+
+
+async def _auto_turn(sm, speculator, state, body: AutoNextRequest) -> AutoTurnResponse:
+    _begin_auto_turn(sm, state, body)
+    with turns.all_or_nothing(state):
+        constraint, should_terminate = turns.apply_choice(state, body.user_choice)
+        turn = await turns.auto_turn(
+            state, constraint, should_terminate, turns.last_scammer_text(state), _pipelined(body),
+            user_choice=body.user_choice, speculator=speculator, session_id=body.session_id,
         )
 
-    # Vérifier si intervention requise APRÈS la réponse de Jeanne
-    intervention_required = None
-    if state.turn_count % 2 == 0 and state.turn_count < state.max_turns:
-        state.pending_intervention = True
-        intervention_required = InterventionRequired(
-            message=f"Tour {state.turn_count} : Que fait Jeanne maintenant ?",
-            choices=[
-                "Jeanne raccroche",
-                "Jeanne donne son numéro de carte bancaire",
-                "Jeanne fait un arrêt cardiaque",
-                "Continuer"
-            ],
-        )
+    TURNS.inc(1, "auto")
+    response = AutoTurnResponse(
+        session_id=body.session_id,
+        turn_number=state.turn_count,
+        victim_segments=_to_segments(turn.victim_segments),
+        victim_text=turn.victim_text,
+        scammer_segments=_to_segments(turn.scammer_segments),
+        scammer_text=turn.scammer_text,
+        director_info=_director_info(state, turn.objective_used),
+        is_complete=turn.is_complete,
+        intervention_required=turn.intervention_required,
+    )
+    _remember(state, "next", body.idempotency_key, response)
+    sm.save(body.session_id, state)
+    turns.speculate(speculator, body.session_id, state, turn.intervention_required)
+    return response
 
-    is_complete = state.turn_count >= state.max_turns
 
-    # 3. Scammer responds (sauf si intervention pending ou complet)
-    scammer_segments = []
-    scammer_text = ""
-    if not is_complete and not state.pending_intervention:
-        scammer_segments_data, scammer_text = state.scammer.respond_web(victim_text)
-        scammer_segments = [Segment(**s) for s in scammer_segments_data]
+@router.post("/auto-conversation/next/stream")
+async def auto_next_stream(body: AutoNextRequest, request: Request):
+    """Streaming variant of /auto-conversation/next as Server-Sent Events.
 
-    director_info = DirectorInfo(
-        scam_type=state.scam_type,
-        stage=state.stage,
-        stage_description=state.stage_description,
-        objective_used=state.current_objective,
+    Events: ``director``, victim ``segment``/``segment_audio``, then
+    ``scammer_segment`` (Segment with its index as event id) and ``done``.
+    A turn that becomes invalid while waiting for the session ends with
+    ``error`` instead.
+    """
+    sm = _get_session_manager(request)
+    speculator = _get_speculator(request)
+    state = _require_state(sm, body.session_id)
+    if _recall(state, "next", body.idempotency_key, AutoTurnResponse) is None:
+        _check_auto_turn(state)
+
+    async def events():
+        async with sm.lock(body.session_id):
+            state = sm.get_state(body.session_id)
+            if state is None:
+                yield _sse("error", StreamError(status_code=404, detail="Session not found"))
+                return
+            response = _recall(state, "next", body.idempotency_key, AutoTurnResponse)
+            if response is not None:
+                yield _sse("director", response.director_info)
+                for event in _replay_segments(response.victim_segments, body.inline_audio):
+                    yield event
+                for event in _replay_segments(
+                    response.scammer_segments, body.inline_audio, "scammer_segment"
+                ):
+                    yield event
+            else:
+                try:
+                    _begin_auto_turn(sm, state, body)
+                except HTTPException as exc:
+                    yield _sse("error", StreamError(status_code=exc.status_code, detail=exc.detail))
+                    return
+
+                result = {"objective_used": None}
+                try:
+                    with turns.all_or_nothing(state):
+                        async for event in _stream_auto_turn(state, body, speculator, result):
+                            yield event
+                except LLMTimeout as exc:
+                    yield _sse("error", StreamError(status_code=504, detail=str(exc)))
+                    return
+
+                TURNS.inc(1, "auto")
+                response = AutoTurnResponse(
+                    session_id=body.session_id,
+                    turn_number=state.turn_count,
+                    victim_segments=_to_segments(result["segments"]),
+                    victim_text=result["victim_text"],
+                    scammer_segments=_to_segments(result["scammer_segments"]),
+                    scammer_text=result["scammer_text"],
+                    director_info=_director_info(state, result["objective_used"]),
+                    is_complete=result["is_complete"],
+                    intervention_required=result["intervention_required"],
+                )
+                _remember(state, "next", body.idempotency_key, response)
+                try:
+                    sm.save(body.session_id, state)
+                except StaleSession as exc:
+                    yield _sse("error", StreamError(status_code=409, detail=str(exc)))
+                    return
+                turns.speculate(speculator, body.session_id, state, response.intervention_required)
+
+        yield _sse("done", StreamDone(
+            session_id=body.session_id,
+            turn_number=response.turn_number,
+            victim_text=response.victim_text,
+            scammer_text=response.scammer_text,
+            is_complete=response.is_complete,
+            intervention_required=response.intervention_required,
+        ))
+
+    return _event_stream(events())
+
+
+async def _stream_auto_turn(state, body: AutoNextRequest, speculator, result: dict):
+    """Events of a new auto turn; its outcome is left in ``result``."""
+    constraint, should_terminate = turns.apply_choice(state, body.user_choice)
+    last_scammer_text = turns.last_scammer_text(state)
+    branch = await turns.take_speculation(
+        speculator, body.session_id, state, body.user_choice, last_scammer_text
     )
-
-    if is_complete:
-        state.is_active = False
-
-    return AutoTurnResponse(
-        session_id=body.session_id,
-        turn_number=state.turn_count,
-        victim_segments=victim_segments,
-        victim_text=victim_text,
-        scammer_segments=scammer_segments,
-        scammer_text=scammer_text,
-        director_info=director_info,
-        is_complete=is_complete,
-        intervention_required=intervention_required,
+    if branch is not None:
+        yield _sse("director", _director_info(state))
+        result["segments"], result["victim_text"] = branch.segments, branch.text
+        for event in _replay_segments(_to_segments(branch.segments), body.inline_audio):
+            yield event
+    else:
+        async for event in _stream_director_and_victim(
+            state, last_scammer_text, constraint, result, body.inline_audio,
+            _pipelined(body),
+        ):
+            yield event
+
+    is_complete, intervention_required, scammer_should_respond = turns.end_auto_turn(
+        state, should_terminate
     )
+    result.update(is_complete=is_complete, intervention_required=intervention_required,
+                  scammer_segments=[], scammer_text="")
+    if scammer_should_respond:
+        result["scammer_segments"], result["scammer_text"] = await state.scammer.arespond_web(
+            result["victim_text"])
+        for i, seg in enumerate(result["scammer_segments"]):
+            yield _sse("scammer_segment", _to_segment(seg, body.inline_audio), i)
 
 
 @router.post("/auto-conversation/stop")
 async def auto_stop(body: AutoStopRequest, request: Request):
     sm = _get_session_manager(request)
-    state = sm.get_state(body.session_id)
-    if not state:
-        raise HTTPException(status_code=404, detail="Session not found")
-
-    state.is_active = False
+    async with sm.lock(body.session_id):
+        state = _require_state(sm, body.session_id)
+        state.is_active = False
+        sm.save(body.session_id, state)
+        _get_speculator(request).discard(body.session_id)
     return {"detail": "Conversation stopped"}
+
+
+_AUDIO_ID = re.compile(r"^[0-9a-f]{64}$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+@router.get("/audio/{audio_id}")
+async def get_audio(audio_id: str, request: Request):
+    """Serve synthesized speech by content hash (immutable, range-capable)."""
+    audio = get_audio_store().get(audio_id) if _AUDIO_ID.match(audio_id) else None
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    etag = f'"{audio_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    total = len(audio)
+    match = _RANGE.match(request.headers.get("range", "").strip())
+    if not match or match.groups() == ("", ""):
+        return Response(content=audio, media_type="audio/mpeg", headers=headers)
+
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), total - 1) if last else total - 1
+    else:
+        start, end = max(total - int(last), 0), total - 1
+    if start > end or start >= total:
+        headers["Content-Range"] = f"bytes */{total}"
+        return Response(status_code=416, headers=headers)
+
+    headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    return Response(
+        content=audio[start:end + 1],
+        status_code=206,
+        media_type="audio/mpeg",
+        headers=headers,
+    )
@@ -1,9 +1,24 @@
+import asyncio
+import os
+import time
 import uuid
+import weakref
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from typing import Dict, Optional
 from app.agents.victim_agent import VictimAgent
 from app.agents.director_agent import DirectorAgent
 from app.agents.scammer_agent import ScammerAgent
+from app.api.session_store import SessionStore, create_session_store
+from app.core.budget import BudgetPolicy, new_usage
+
+DEFAULT_IDLE_TTL = 30 * 60  # seconds
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_REAP_INTERVAL = 60  # seconds
+# How many evicted ids are remembered so they can be answered with 410
+EVICTED_MEMORY = 10_000
+# How many idempotent turn responses are kept per session
+IDEMPOTENCY_MEMORY = 8
 
 
 @dataclass
@@ -20,27 +35,104 @@ class SessionState:
     stage_description: str = ""
     script_hint: str = "banque"
     pending_intervention: bool = False  # Indique qu'une intervention est attendue
+    last_access: float = field(default_factory=time.time)
+    # Réponses déjà servies, par clé d'idempotence (JSON)
+    responses: Dict[str, str] = field(default_factory=dict)
+    # Tokens, caractères TTS et secondes consommés (budgets)
+    usage: Dict[str, float] = field(default_factory=new_usage)
+    # Version du snapshot chargé depuis le store (écritures concurrentes)
+    version: int = 0
+
+    def remember_response(self, key: str, payload: str) -> None:
+        self.responses[key] = payload
+        while len(self.responses) > IDEMPOTENCY_MEMORY:
+            del self.responses[next(iter(self.responses))]
 
 
 class SessionManager:
-    def __init__(self, api_key: str):
-        self._sessions: Dict[str, SessionState] = {}
+    """Session lifecycle (TTL, capacity, eviction) on top of a SessionStore.
+
+    The store is chosen with ``SESSION_STORE`` (``memory``, ``sqlite:///path``
+    or ``redis://host:port/db``, see ``create_session_store``). With an external store, routes must call
+    ``save`` after mutating a state so other workers see the change.
+    """
+
+    def __init__(self, api_key: str, idle_ttl: Optional[float] = None,
+                 max_sessions: Optional[int] = None, clock=time.time,
+                 store: Optional[SessionStore] = None, budget: Optional[BudgetPolicy] = None):
+        self._evicted: "OrderedDict[str, str]" = OrderedDict()
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
         self._api_key = api_key
+        self._clock = clock
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(
+            os.getenv("SESSION_IDLE_TTL", DEFAULT_IDLE_TTL))
+        self.max_sessions = max_sessions if max_sessions is not None else int(
+            os.getenv("SESSION_MAX", DEFAULT_MAX_SESSIONS))
+        if store is None:
+            store = create_session_store(
+                os.getenv("SESSION_STORE", "memory"),
+                self._new_state,
+                key_ttl=int(self.idle_ttl * 2),
+            )
+        elif store.state_factory is None:
+            store.state_factory = self._new_state
+        self.store = store
+        self.budget = budget if budget is not None else BudgetPolicy()
+        self._stats: Dict[str, int] = {
+            "created": 0,
+            "deleted": 0,
+            "evicted_idle": 0,
+            "evicted_capacity": 0,
+        }
 
-    def create_session(self) -> str:
-        session_id = str(uuid.uuid4())
-        self._sessions[session_id] = SessionState(
+    def _new_state(self) -> SessionState:
+        return SessionState(
             victim=VictimAgent(self._api_key),
             director=DirectorAgent(self._api_key),
             scammer=ScammerAgent(self._api_key),
+            last_access=self._clock(),
         )
+
+    def create_session(self) -> str:
+        while self.store.count() >= self.max_sessions:
+            oldest = self.store.oldest()
+            if oldest is None:
+                break
+            self._evict(oldest, "capacity")
+
+        session_id = str(uuid.uuid4())
+        self.store.save(session_id, self._new_state())
+        self._stats["created"] += 1
         return session_id
 
     def get_state(self, session_id: str) -> Optional[SessionState]:
-        return self._sessions.get(session_id)
+        state = self.store.load(session_id)
+        if state is None:
+            return None
+        now = self._clock()
+        if now - state.last_access > self.idle_ttl:
+            self._evict(session_id, "idle")
+            return None
+        state.last_access = now
+        self.store.touch(session_id, now)
+        return state
+
+    def save(self, session_id: str, state: SessionState) -> None:
+        """Write a mutated state back to the store. Raises ``StaleSession``
+        if another worker saved the session since it was loaded."""
+        self.store.save(session_id, state)
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Lock serializing the turns of one session within this process.
+        Across workers, ``save`` refuses stale writes instead."""
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[session_id] = lock
+        return lock
 
     def get_victim(self, session_id: str) -> Optional[VictimAgent]:
-        state = self._sessions.get(session_id)
+        state = self.get_state(session_id)
         return state.victim if state else None
 
     # Keep backward compat
@@ -48,19 +140,50 @@ class SessionManager:
         return self.get_victim(session_id)
 
     def increment_turn(self, session_id: str) -> None:
-        state = self._sessions.get(session_id)
+        state = self.store.load(session_id)
         if state:
             state.turn_count += 1
+            self.store.save(session_id, state)
 
     def get_turn_count(self, session_id: str) -> int:
-        state = self._sessions.get(session_id)
+        state = self.store.load(session_id)
         return state.turn_count if state else 0
 
     def delete(self, session_id: str) -> bool:
-        if session_id in self._sessions:
-            del self._sessions[session_id]
+        if self.store.delete(session_id):
+            self._stats["deleted"] += 1
             return True
         return False
 
     def exists(self, session_id: str) -> bool:
-        return session_id in self._sessions
+        return self.store.exists(session_id)
+
+    def is_evicted(self, session_id: str) -> bool:
+        """True if this process dropped the session for idleness or capacity."""
+        return session_id in self._evicted
+
+    def reap_expired(self) -> int:
+        """Evict every session idle for longer than the TTL. Returns the count."""
+        idle = self.store.idle_since(self._clock() - self.idle_ttl)
+        for session_id in idle:
+            self._evict(session_id, "idle")
+        return len(idle)
+
+    async def run_reaper(self, interval: Optional[float] = None) -> None:
+        """Periodically reap idle sessions; run as a background task."""
+        interval = interval if interval is not None else float(
+            os.getenv("SESSION_REAP_INTERVAL", DEFAULT_REAP_INTERVAL))
+        while True:
+            await asyncio.sleep(interval)
+            self.reap_expired()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "active": self.store.count()}
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        self.store.delete(session_id)
+        self._stats[f"evicted_{reason}"] += 1
+        self._evicted[session_id] = reason
+        while len(self._evicted) > EVICTED_MEMORY:
+            self._evicted.popitem(last=False)
@@ -0,0 +1,394 @@
+"""Session storage backends.
+
+``InMemorySessionStore`` keeps live ``SessionState`` objects in this process.
+``SQLiteSessionStore`` and ``RedisSessionStore`` keep a compact serialized
+snapshot instead, so any uvicorn worker can load a session, run a turn and
+write it back.
+
+The per-session ``asyncio.Lock`` only serializes turns within one worker.
+Across workers, these stores number each snapshot: ``save`` only replaces
+the version the state was loaded at, so of two overlapping turns the second
+to finish gets ``StaleSession`` (HTTP 409) instead of silently overwriting
+the first.
+"""
+
+import json
+import socket
+import sqlite3
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from urllib.parse import urlparse
+
+SNAPSHOT_VERSION = 1
+
+# Plain SessionState fields copied as-is into snapshots
+_STATE_FIELDS = (
+    "turn_count", "max_turns", "is_active", "current_objective", "scam_type",
+    "stage", "stage_description", "script_hint", "pending_intervention", "responses", "usage",
+)
+
+
+class StaleSession(RuntimeError):
+    """The session was saved by another worker since this state was loaded."""
+
+    def __init__(self, session_id: str):
+        super().__init__(f"Session {session_id} was modified by a concurrent request")
+        self.session_id = session_id
+
+
+def serialize_state(state) -> bytes:
+    snapshot = {name: getattr(state, name) for name in _STATE_FIELDS}
+    snapshot["v"] = SNAPSHOT_VERSION
+    snapshot["victim"] = state.victim.dump_memory()
+    snapshot["scammer"] = state.scammer.dump_memory()
+    return zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+
+
+def deserialize_state(blob: bytes, state):
+    """Restore a snapshot into ``state``, a freshly built SessionState."""
+    snapshot = json.loads(zlib.decompress(blob))
+    for name in _STATE_FIELDS:
+        if name in snapshot:
+            setattr(state, name, snapshot[name])
+    state.victim.load_memory(snapshot.get("victim", {}))
+    state.scammer.load_memory(snapshot.get("scammer", {}))
+    return state
+
+
+class SessionStore(ABC):
+    """Where SessionManager keeps sessions.
+
+    ``state_factory`` builds an empty SessionState (with its agents); stores
+    that serialize use it to rehydrate snapshots.
+    """
+
+    state_factory: Optional[Callable] = None
+
+    @abstractmethod
+    def load(self, session_id: str):
+        """Return the SessionState (with ``last_access`` set) or None."""
+
+    @abstractmethod
+    def save(self, session_id: str, state) -> None:
+        """Create or overwrite a session, recording ``state.last_access``.
+
+        Serializing stores only overwrite the version ``state`` was loaded
+        at (``state.version``, then incremented) and raise ``StaleSession``
+        otherwise."""
+
+    @abstractmethod
+    def touch(self, session_id: str, now: float) -> None:
+        """Record an access without rewriting the session."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def exists(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def oldest(self) -> Optional[str]:
+        """Id of the least recently accessed session."""
+
+    @abstractmethod
+    def idle_since(self, cutoff: float) -> List[str]:
+        """Ids of sessions last accessed before ``cutoff``."""
+
+    def _rehydrate(self, blob: bytes, last_access: float, version: int = 0):
+        state = deserialize_state(blob, self.state_factory())
+        state.last_access = last_access
+        state.version = version
+        return state
+
+
+class InMemorySessionStore(SessionStore):
+    """Live SessionState objects in a per-process LRU-ordered dict."""
+
+    def __init__(self):
+        self._sessions: "OrderedDict[str, object]" = OrderedDict()
+
+    def load(self, session_id):
+        return self._sessions.get(session_id)
+
+    def save(self, session_id, state):
+        self._sessions[session_id] = state
+
+    def touch(self, session_id, now):
+        state = self._sessions.get(session_id)
+        if state is not None:
+            state.last_access = now
+            self._sessions.move_to_end(session_id)
+
+    def delete(self, session_id):
+        return self._sessions.pop(session_id, None) is not None
+
+    def exists(self, session_id):
+        return session_id in self._sessions
+
+    def count(self):
+        return len(self._sessions)
+
+    def oldest(self):
+        return next(iter(self._sessions), None)
+
+    def idle_since(self, cutoff):
+        idle = []
+        # LRU order: stop at the first session accessed after the cutoff
+        for session_id, state in self._sessions.items():
+            if state.last_access >= cutoff:
+                break
+            idle.append(session_id)
+        return idle
+
+
+class SQLiteSessionStore(SessionStore):
+    """Snapshots in a SQLite table; share the file between workers (WAL)."""
+
+    def __init__(self, path: str, state_factory: Optional[Callable] = None):
+        self.state_factory = state_factory
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, data BLOB NOT NULL, last_access REAL NOT NULL, "
+            "version INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(sessions)")]
+        if "version" not in columns:  # file created before versioned saves
+            self._db.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)"
+        )
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def load(self, session_id):
+        rows = self._query(
+            "SELECT data, last_access, version FROM sessions WHERE id = ?", (session_id,)
+        )
+        return self._rehydrate(*rows[0]) if rows else None
+
+    def save(self, session_id, state):
+        data = serialize_state(state)
+        with self._lock:
+            # Compare-and-set on the version the state was loaded at
+            saved = self._db.execute(
+                "UPDATE sessions SET data = ?, last_access = ?, version = version + 1 "
+                "WHERE id = ? AND version = ?",
+                (data, state.last_access, session_id, state.version),
+            ).rowcount
+            if not saved:
+                saved = self._db.execute(
+                    "INSERT OR IGNORE INTO sessions (id, data, last_access, version) "
+                    "VALUES (?, ?, ?, ?)",
+                    (session_id, data, state.last_access, state.version + 1),
+                ).rowcount
+        if not saved:
+            raise StaleSession(session_id)
+        state.version += 1
+
+    def touch(self, session_id, now):
+        self._query("UPDATE sessions SET last_access = ? WHERE id = ?", (now, session_id))
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+    def exists(self, session_id):
+        return bool(self._query("SELECT 1 FROM sessions WHERE id = ?", (session_id,)))
+
+    def count(self):
+        return self._query("SELECT COUNT(*) FROM sessions")[0][0]
+
+    def oldest(self):
+        rows = self._query("SELECT id FROM sessions ORDER BY last_access LIMIT 1")
+        return rows[0][0] if rows else None
+
+    def idle_since(self, cutoff):
+        rows = self._query("SELECT id FROM sessions WHERE last_access < ? ORDER BY last_access", (cutoff,))
+        return [row[0] for row in rows]
+
+
+class RedisClient:
+    """Minimal blocking RESP2 client: one connection, one command at a time."""
+
+    def __init__(self, host="localhost", port=6379, db=0, timeout=5.0):
+        self._address = (host, port)
+        self._db = db
+        self._timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection(self._address, timeout=self._timeout)
+        self._reader = self._sock.makefile("rb")
+        if self._db:
+            self._send(("SELECT", self._db))
+
+    def execute(self, *args):
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._send(args)
+            except OSError:
+                self.close()
+                raise
+
+    def _send(self, args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RuntimeError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            size = int(payload)
+            if size < 0:
+                return None
+            data = self._reader.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(payload)
+            return None if size < 0 else [self._read_reply() for _ in range(size)]
+        raise ConnectionError(f"Unexpected Redis reply: {line!r}")
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._reader = None
+
+
+# KEYS: session hash, index; ARGV: expected version, data, last_access, id
+_SAVE_SCRIPT = """
+local version = redis.call('HGET', KEYS[1], 'version')
+if version and version ~= ARGV[1] then return 0 end
+redis.call('HSET', KEYS[1], 'data', ARGV[2], 'last_access', ARGV[3],
+           'version', tostring(tonumber(ARGV[1]) + 1))
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[4])
+return 1
+"""
+
+
+class RedisSessionStore(SessionStore):
+    """Snapshots in Redis hashes, indexed by last access in a sorted set.
+
+    Keys also get a native expiry of ``key_ttl`` seconds as a safety net for
+    sessions the reaper never sees. ``save`` is a Lua script, so the version
+    check and the write are atomic.
+    """
+
+    def __init__(self, client: RedisClient, state_factory: Optional[Callable] = None,
+                 prefix: str = "session:", key_ttl: Optional[int] = None):
+        self.state_factory = state_factory
+        self._redis = client
+        self._prefix = prefix
+        self._index = f"{prefix}index"
+        self._key_ttl = key_ttl
+
+    def _key(self, session_id):
+        return f"{self._prefix}{session_id}"
+
+    def _expire(self, session_id):
+        if self._key_ttl:
+            self._redis.execute("EXPIRE", self._key(session_id), self._key_ttl)
+
+    def load(self, session_id):
+        data, last_access, version = self._redis.execute(
+            "HMGET", self._key(session_id), "data", "last_access", "version"
+        )
+        if data is None:
+            return None
+        return self._rehydrate(data, float(last_access), int(version or 0))
+
+    def save(self, session_id, state):
+        saved = self._redis.execute(
+            "EVAL", _SAVE_SCRIPT, 2, self._key(session_id), self._index,
+            state.version, serialize_state(state), repr(state.last_access), session_id,
+        )
+        if not saved:
+            raise StaleSession(session_id)
+        state.version += 1
+        self._expire(session_id)
+
+    def touch(self, session_id, now):
+        self._redis.execute("HSET", self._key(session_id), "last_access", repr(now))
+        self._redis.execute("ZADD", self._index, repr(now), session_id)
+        self._expire(session_id)
+
+    def delete(self, session_id):
+        self._redis.execute("ZREM", self._index, session_id)
+        return self._redis.execute("DEL", self._key(session_id)) > 0
+
+    def exists(self, session_id):
+        return self._redis.execute("EXISTS", self._key(session_id)) > 0
+
+    def count(self):
+        return self._redis.execute("ZCARD", self._index)
+
+    def oldest(self):
+        ids = self._redis.execute("ZRANGE", self._index, 0, 0)
+        return ids[0].decode() if ids else None
+
+    def idle_since(self, cutoff):
+        ids = self._redis.execute("ZRANGEBYSCORE", self._index, "-inf", f"({cutoff!r}")
+        return [session_id.decode() for session_id in ids]
+
+
+def _sqlite_path(url: str) -> str:
+    # As in SQLAlchemy: three slashes then the path, so an absolute one has four
+    path = url[len("sqlite:"):]
+    if path.startswith("///"):
+        return path[3:] or ":memory:"
+    if path.strip("/"):
+        raise ValueError(f"Unsupported SESSION_STORE: {url} (use sqlite:///path.db)")
+    return ":memory:"
+
+
+def create_session_store(url: str, state_factory: Callable,
+                         key_ttl: Optional[int] = None) -> SessionStore:
+    """Build a store from a URL: ``memory``, ``sqlite:///path.db`` or
+    ``redis://host:port/db``.
+
+    SQLite URLs follow the SQLAlchemy convention: ``sqlite:///sessions.db``
+    is relative to the working directory, ``sqlite:////data/sessions.db``
+    absolute."""
+    if not url or url == "memory":
+        return InMemorySessionStore()
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return SQLiteSessionStore(_sqlite_path(url), state_factory)
+    if parsed.scheme == "redis":
+        db = int(parsed.path.lstrip("/") or 0)
+        client = RedisClient(parsed.hostname or "localhost", parsed.port or 6379, db)
+        return RedisSessionStore(client, state_factory, key_ttl=key_ttl)
+    raise ValueError(f"Unsupported SESSION_STORE: {url}")
@@ -0,0 +1,177 @@
+"""Speculative victim replies for pending interventions.
+
+When a turn offers the intervention choices, the next turn's inputs are
+already known except for the choice itself. The director runs once and the
+victim answers every choice concurrently on forked memories. The chosen
+branch is committed and the others are cancelled.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+DEFAULT_MAX_INFLIGHT = 16  # branches running at once, all sessions
+DEFAULT_BUDGET_PER_MINUTE = 60  # branches started per rolling minute
+DEFAULT_TTL = 300  # seconds before an unused speculation is dropped
+
+
+@dataclass
+class Branch:
+    """A speculated victim turn, ready to be committed."""
+    director_result: dict
+    memory: dict
+    segments: list
+    text: str
+
+
+@dataclass
+class _Speculation:
+    turn_count: int
+    last_scammer_text: str
+    started: float
+    director: Optional[asyncio.Task] = None
+    branches: Dict[str, asyncio.Task] = field(default_factory=dict)
+
+    def cancel(self, keep: Optional[str] = None) -> int:
+        if keep is None and self.director is not None:
+            self.director.cancel()
+        cancelled = 0
+        for choice, task in self.branches.items():
+            if choice != keep and not task.done():
+                task.cancel()
+                cancelled += 1
+        return cancelled
+
+
+class Speculator:
+    def __init__(self, enabled: Optional[bool] = None, max_inflight: Optional[int] = None,
+                 budget_per_minute: Optional[int] = None, ttl: Optional[float] = None,
+                 clock=time.monotonic):
+        self.enabled = enabled if enabled is not None else (
+            os.getenv("SPECULATION", "0").lower() in ("1", "true", "yes"))
+        self.max_inflight = max_inflight if max_inflight is not None else int(
+            os.getenv("SPECULATION_MAX_INFLIGHT", DEFAULT_MAX_INFLIGHT))
+        self.budget_per_minute = budget_per_minute if budget_per_minute is not None else int(
+            os.getenv("SPECULATION_BUDGET_PER_MINUTE", DEFAULT_BUDGET_PER_MINUTE))
+        self.ttl = ttl if ttl is not None else float(os.getenv("SPECULATION_TTL", DEFAULT_TTL))
+        self._clock = clock
+        self._pending: Dict[str, _Speculation] = {}
+        self._recent = deque()  # start times of recent branches
+        self._inflight = 0
+        self._stats = {
+            "started": 0,
+            "branches": 0,
+            "skipped_budget": 0,
+            "hits": 0,
+            "hits_ready": 0,
+            "misses": 0,
+            "cancelled": 0,
+            "errors": 0,
+            "hit_wait_seconds": 0.0,
+        }
+
+    def start(self, session_id: str, state, last_scammer_text: str, constraints: dict) -> bool:
+        """Speculate the victim reply for every choice in ``constraints``
+        ({choice: constraint}). Returns False when disabled or over budget."""
+        if not self.enabled:
+            return False
+        self.discard(session_id)
+        self._prune()
+        if (self._inflight + len(constraints) > self.max_inflight
+                or len(self._recent) + len(constraints) > self.budget_per_minute):
+            self._stats["skipped_budget"] += 1
+            return False
+
+        now = self._clock()
+        spec = _Speculation(state.turn_count, last_scammer_text, now)
+        spec.director = asyncio.ensure_future(state.director.aupdate_objective(
+            last_scammer=last_scammer_text,
+            history_summary=state.victim.get_history_summary(max_turns=5),
+            script_hint=state.script_hint,
+            scam_type=state.scam_type,
+        ))
+        for choice, constraint in constraints.items():
+            task = asyncio.ensure_future(self._run_branch(
+                spec.director, state.victim.fork(), state.current_objective,
+                last_scammer_text, constraint,
+            ))
+            task.add_done_callback(self._branch_done)
+            spec.branches[choice] = task
+            self._recent.append(now)
+        self._inflight += len(constraints)
+        self._pending[session_id] = spec
+        self._stats["started"] += 1
+        self._stats["branches"] += len(constraints)
+        return True
+
+    @staticmethod
+    async def _run_branch(director, victim, objective, user_input, constraint) -> Branch:
+        # shield: cancelling one branch must not cancel the shared director
+        director_result = await asyncio.shield(director)
+        segments, text = await victim.arespond_web(
+            user_input=user_input,
+            objective=director_result.get("new_objective", objective),
+            constraint=constraint,
+        )
+        return Branch(director_result, victim.dump_memory(), segments, text)
+
+    def _branch_done(self, task: asyncio.Task) -> None:
+        self._inflight -= 1
+        if not task.cancelled() and task.exception() is not None:
+            self._stats["errors"] += 1
+
+    async def take(self, session_id: str, state, choice: Optional[str],
+                   last_scammer_text: str) -> Optional[Branch]:
+        """Return the speculated branch for ``choice`` (waiting for it if
+        still running) and cancel the others. None on a miss."""
+        spec = self._pending.pop(session_id, None)
+        if spec is None:
+            return None
+        task = spec.branches.get(choice)
+        stale = (spec.turn_count != state.turn_count
+                 or spec.last_scammer_text != last_scammer_text
+                 or self._clock() - spec.started > self.ttl)
+        hit = task is not None and not stale
+        self._stats["cancelled"] += spec.cancel(keep=choice if hit else None)
+        if not hit:
+            self._stats["misses"] += 1
+            return None
+
+        ready = task.done()
+        start = time.perf_counter()
+        try:
+            branch = await task
+        except Exception as e:
+            print(f"⚠ Speculative branch failed: {e}")
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        self._stats["hits_ready"] += ready
+        self._stats["hit_wait_seconds"] += time.perf_counter() - start
+        return branch
+
+    def discard(self, session_id: str) -> None:
+        spec = self._pending.pop(session_id, None)
+        if spec is not None:
+            self._stats["cancelled"] += spec.cancel()
+
+    def _prune(self) -> None:
+        now = self._clock()
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
+        for session_id, spec in list(self._pending.items()):
+            if now - spec.started > self.ttl:
+                self.discard(session_id)
+
+    @property
+    def stats(self) -> dict:
+        hits = self._stats["hits"]
+        return {
+            **self._stats,
+            "pending": len(self._pending),
+            "inflight": self._inflight,
+            "hit_wait_avg": self._stats["hit_wait_seconds"] / hits if hits else 0.0,
+        }
@@ -0,0 +1,275 @@
+"""Turn logic shared by the HTTP routes and the batch simulator.
+
+These functions run the director, victim and scammer for one turn and
+update the SessionState in place. Locking, budgets, idempotency, persistence
+and response models stay in ``routes.py``.
+"""
+
+import asyncio
+import contextlib
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.api.models import InterventionRequired
+from app.core.metrics import timed
+
+# Constantes de mapping pour les interventions utilisateur
+INTERVENTION_CONSTRAINTS = {
+    "1": {
+        "constraint": "Tu dois maintenant raccrocher le téléphone poliment mais fermement. Dis au revoir et termine la conversation.",
+        "terminate": True
+    },
+    "2": {
+        "constraint": "Tu dois maintenant donner un faux numéro de carte bancaire de manière naturelle. Invente un numéro à 16 chiffres et fournis-le lentement comme si tu cherchais ta carte.",
+        "terminate": False
+    },
+    "3": {
+        "constraint": "Tu ressens une douleur thoracique soudaine. Tu dois manifester une détresse physique (respiration difficile, douleur), appeler à l'aide, mais reste en ligne.",
+        "terminate": False
+    },
+    "4": {
+        "constraint": "Aucune",
+        "terminate": False
+    }
+}
+
+
+# SessionState fields a turn may change (usage stays charged: it was spent)
+_TURN_FIELDS = (
+    "turn_count", "is_active", "pending_intervention", "current_objective",
+    "scam_type", "stage", "stage_description",
+)
+
+
+@contextlib.contextmanager
+def all_or_nothing(state):
+    """Undo the turn's changes to ``state`` (fields and both agents'
+    memories) if the block fails, e.g. on a scammer LLMTimeout after the
+    victim has answered, so a retry replays a clean turn."""
+    saved = {name: getattr(state, name) for name in _TURN_FIELDS}
+    victim_memory = state.victim.dump_memory()
+    scammer_memory = state.scammer.dump_memory()
+    try:
+        yield
+    except BaseException:
+        for name, value in saved.items():
+            setattr(state, name, value)
+        state.victim.load_memory(victim_memory)
+        state.scammer.load_memory(scammer_memory)
+        raise
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def pipelined_default() -> bool:
+    """DIRECTOR_PIPELINED: run the director alongside the victim."""
+    return os.getenv("DIRECTOR_PIPELINED", "0").lower() in ("1", "true", "yes")
+
+
+def apply_director_result(state, director_result: dict) -> None:
+    state.scam_type = director_result.get("scam_type", "autre")
+    state.stage = director_result.get("stage", "1")
+    state.stage_description = director_result.get("stage_description", "")
+    state.current_objective = director_result.get("new_objective", state.current_objective)
+
+
+def start_director(state, last_scammer: str, on_objective=None):
+    # The summary is taken now, before the victim's reply lands in memory
+    history_summary = state.victim.get_history_summary(max_turns=5)
+    return state.director.aupdate_objective(
+        last_scammer=last_scammer,
+        history_summary=history_summary,
+        script_hint=state.script_hint,
+        scam_type=state.scam_type,
+        on_objective=on_objective,
+    )
+
+
+async def run_director(state, last_scammer: str):
+    """Director analyzes the last scammer message and updates the session.
+
+    A streaming director updates the session as soon as the new objective
+    is parsed. The task still generating the trailing fields is returned
+    (None if the director is done) for finish_director.
+    """
+    early = asyncio.get_running_loop().create_future()
+
+    def on_objective(result):
+        if not early.done():
+            early.set_result(result)
+
+    task = asyncio.ensure_future(start_director(state, last_scammer, on_objective))
+    try:
+        with timed("director_wait"):
+            await asyncio.wait([early, task], return_when=asyncio.FIRST_COMPLETED)
+    except BaseException:
+        task.cancel()
+        raise
+    if task.done():
+        apply_director_result(state, task.result())
+        return None
+    apply_director_result(state, early.result())
+    return task
+
+
+async def finish_director(state, task) -> None:
+    if task is not None:
+        apply_director_result(state, await task)
+
+
+async def victim_turn(state, user_input: str, constraint: str, pipelined: bool,
+                      timings: Optional[Dict[str, float]] = None):
+    """Director + victim for one turn.
+
+    Returns (segments_data, clean_text, objective_used); objective_used is
+    None unless pipelined. Stage durations (ms) go to ``timings``:
+    ``director_ms`` (sequential mode only) and ``victim_ms``."""
+    timings = timings if timings is not None else {}
+    if not pipelined:
+        start = time.perf_counter()
+        director = await run_director(state, user_input)
+        timings["director_ms"] = _ms(start)
+        start = time.perf_counter()
+        try:
+            segments_data, clean_text = await state.victim.arespond_web(
+                user_input=user_input,
+                objective=state.current_objective,
+                constraint=constraint,
+            )
+            await finish_director(state, director)
+        finally:
+            if director is not None:
+                director.cancel()
+        timings["victim_ms"] = _ms(start)
+        return segments_data, clean_text, None
+
+    start = time.perf_counter()
+    objective_used = state.current_objective
+    director_result, (segments_data, clean_text) = await asyncio.gather(
+        start_director(state, user_input),
+        state.victim.arespond_web(
+            user_input=user_input,
+            objective=objective_used,
+            constraint=constraint,
+        ),
+    )
+    apply_director_result(state, director_result)
+    timings["victim_ms"] = _ms(start)
+    return segments_data, clean_text, objective_used
+
+
+def apply_choice(state, user_choice: Optional[str]):
+    """Apply the user's intervention choice. Returns (constraint, should_terminate)."""
+    if user_choice and user_choice in INTERVENTION_CONSTRAINTS:
+        intervention = INTERVENTION_CONSTRAINTS[user_choice]
+        state.pending_intervention = False
+        return intervention["constraint"], intervention["terminate"]
+    return "Aucune", False
+
+
+def last_scammer_text(state) -> str:
+    # Get last scammer message from scammer memory
+    scammer_messages = state.scammer.memory.chat_memory.messages
+    return scammer_messages[-1].content if scammer_messages else ""
+
+
+async def take_speculation(speculator, session_id: str, state, user_choice: Optional[str],
+                           last_scammer: str):
+    """Commit the speculated victim reply for the user's choice, if any."""
+    if speculator is None or not user_choice:
+        return None
+    branch = await speculator.take(session_id, state, user_choice, last_scammer)
+    if branch is not None:
+        apply_director_result(state, branch.director_result)
+        state.victim.load_memory(branch.memory)
+    return branch
+
+
+def speculate(speculator, session_id: str, state, intervention_required) -> None:
+    """Pre-generate the victim reply for every choice being offered."""
+    if speculator is not None and intervention_required is not None:
+        speculator.start(session_id, state, last_scammer_text(state), {
+            choice: intervention["constraint"]
+            for choice, intervention in INTERVENTION_CONSTRAINTS.items()
+        })
+
+
+def end_auto_turn(state, should_terminate: bool):
+    """Count the turn and decide what happens next.
+
+    Returns (is_complete, intervention_required, scammer_should_respond)."""
+    state.turn_count += 1
+
+    # Si choix 1 (raccroche), terminer immédiatement
+    if should_terminate:
+        state.is_active = False
+        return True, None, False
+
+    # Vérifier si intervention requise APRÈS la réponse de Jeanne
+    intervention_required = None
+    if state.turn_count % 2 == 0 and state.turn_count < state.max_turns:
+        state.pending_intervention = True
+        intervention_required = InterventionRequired(
+            message=f"Tour {state.turn_count} : Que fait Jeanne maintenant ?",
+            choices=[
+                "Jeanne raccroche",
+                "Jeanne donne son numéro de carte bancaire",
+                "Jeanne fait un arrêt cardiaque",
+                "Continuer"
+            ],
+        )
+
+    is_complete = state.turn_count >= state.max_turns
+    if is_complete:
+        state.is_active = False
+
+    # 3. Scammer responds (sauf si intervention pending ou complet)
+    scammer_should_respond = not is_complete and not state.pending_intervention
+    return is_complete, intervention_required, scammer_should_respond
+
+
+@dataclass
+class AutoTurn:
+    """Outcome of one auto-conversation turn."""
+    victim_segments: List[dict]
+    victim_text: str
+    objective_used: Optional[str]
+    is_complete: bool
+    intervention_required: Optional[InterventionRequired]
+    scammer_segments: List[dict] = field(default_factory=list)
+    scammer_text: str = ""
+    timings: Dict[str, float] = field(default_factory=dict)  # ms per stage
+
+
+async def auto_turn(state, constraint: str, should_terminate: bool, last_scammer: str,
+                    pipelined: bool, user_choice: Optional[str] = None,
+                    speculator=None, session_id: Optional[str] = None) -> AutoTurn:
+    """Victim (speculated or generated), turn bookkeeping, then the scammer's
+    reply. ``constraint``/``should_terminate`` come from ``apply_choice``."""
+    timings: Dict[str, float] = {}
+    objective_used = None
+    start = time.perf_counter()
+    branch = await take_speculation(speculator, session_id, state, user_choice, last_scammer)
+    if branch is not None:
+        victim_segments, victim_text = branch.segments, branch.text
+        timings["victim_ms"] = _ms(start)
+    else:
+        # Director analyzes last scammer message, victim responds with constraint applied
+        victim_segments, victim_text, objective_used = await victim_turn(
+            state, last_scammer, constraint, pipelined, timings
+        )
+
+    is_complete, intervention_required, scammer_should_respond = end_auto_turn(
+        state, should_terminate
+    )
+    turn = AutoTurn(victim_segments, victim_text, objective_used, is_complete,
+                    intervention_required, timings=timings)
+    if scammer_should_respond:
+        start = time.perf_counter()
+        turn.scammer_segments, turn.scammer_text = await state.scammer.arespond_web(victim_text)
+        timings["scammer_ms"] = _ms(start)
+    return turn
@@ -0,0 +1,76 @@
+"""Minimal MPEG audio (Layer III) frame parsing used to cut MP3 at timepoints."""
+
+from typing import List, Tuple
+
+# Bitrates in kbps indexed by the 4-bit header field, for Layer III.
+_BITRATES_V1 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+_BITRATES_V2 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+
+# Sample rates indexed by the 2-bit version field (0=2.5, 2=2, 3=1).
+_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+
+def _skip_id3(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _parse_header(data: bytes, pos: int):
+    """Return (frame_length, frame_seconds) for a Layer III header at pos, or None."""
+    if pos + 4 > len(data):
+        return None
+    b1, b2 = data[pos + 1], data[pos + 2]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    bitrates = _BITRATES_V1 if version == 3 else _BITRATES_V2
+    samples = 1152 if version == 3 else 576
+    padding = (b2 >> 1) & 0x01
+    length = (samples // 8) * bitrates[bitrate_index] * 1000 // sample_rate + padding
+    return length, samples / sample_rate
+
+
+def mp3_frames(data: bytes) -> List[Tuple[int, int, float]]:
+    """List the (offset, length, start_seconds) of every Layer III frame.
+
+    Raises ValueError when no frame can be found.
+    """
+    frames = []
+    pos = _skip_id3(data)
+    elapsed = 0.0
+    while pos < len(data):
+        header = _parse_header(data, pos)
+        if header is None:
+            pos += 1
+            continue
+        length, seconds = header
+        frames.append((pos, length, elapsed))
+        elapsed += seconds
+        pos += length
+    if not frames:
+        raise ValueError("No MPEG Layer III frame found")
+    return frames
+
+
+def slice_mp3(data: bytes, start: float, end: float, frames=None) -> bytes:
+    """Return the frames of ``data`` that start within [start, end) seconds."""
+    frames = frames if frames is not None else mp3_frames(data)
+    return b"".join(
+        data[offset:offset + length]
+        for offset, length, at in frames
+        if start <= at < end
+    )
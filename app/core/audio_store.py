@@ -0,0 +1,75 @@
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from app.core.blob_cache import DEFAULT_DISK_MAX_BYTES, BlobCache
+
+DEFAULT_STORE_MAX_BYTES = 64 * 1024 * 1024
+AUDIO_URL_PREFIX = "/api/audio/"
+
+
+class AudioStore:
+    """Content-addressed store of synthesized speech served by GET /api/audio.
+
+    Audio is kept in a byte-bounded memory LRU and spilled to ``disk_dir`` on
+    eviction so URLs handed to clients stay valid until the disk LRU drops them.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_STORE_MAX_BYTES, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = DEFAULT_DISK_MAX_BYTES):
+        self._blobs = BlobCache(max_bytes, disk_dir, disk_max_bytes)
+
+    @staticmethod
+    def audio_id(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def add(self, data: bytes) -> str:
+        audio_id = self.audio_id(data)
+        self._blobs.put(audio_id, data)
+        return audio_id
+
+    def get(self, audio_id: str) -> Optional[bytes]:
+        return self._blobs.get(audio_id)
+
+    def flush(self) -> None:
+        self._blobs.flush()
+
+    def clear(self) -> None:
+        self._blobs.clear()
+
+    @property
+    def stats(self) -> dict:
+        return self._blobs.stats
+
+
+_store: Optional[AudioStore] = None
+_store_lock = threading.Lock()
+
+
+def get_audio_store() -> AudioStore:
+    """Return the process-wide audio store, configured from the environment."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AudioStore(
+                    max_bytes=int(os.getenv("AUDIO_STORE_MAX_BYTES", DEFAULT_STORE_MAX_BYTES)),
+                    disk_dir=os.getenv("AUDIO_STORE_DIR")
+                    or os.path.join(tempfile.gettempdir(), "scamming_protector_audio"),
+                    disk_max_bytes=int(os.getenv("AUDIO_STORE_DISK_MAX_BYTES",
+                                                 DEFAULT_DISK_MAX_BYTES)),
+                )
+    return _store
+
+
+def attach_audio(seg: dict, audio_bytes: Optional[bytes]) -> None:
+    """Store synthesized audio and point the segment at its URL. May write
+    to disk: call it from a worker thread, not the event loop."""
+    if audio_bytes:
+        seg["tts_url"] = AUDIO_URL_PREFIX + get_audio_store().add(audio_bytes)
+
+
+def audio_id_from_url(url: str) -> str:
+    return url[len(AUDIO_URL_PREFIX):]
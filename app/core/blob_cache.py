@@ -0,0 +1,187 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+DEFAULT_DISK_MAX_BYTES = 512 * 1024 * 1024
+
+
+class BlobCache:
+    """Byte-bounded LRU of binary blobs, with an optional on-disk tier.
+
+    When ``disk_dir`` is set, entries evicted from memory are written to disk
+    (``flush`` writes the rest, e.g. at shutdown) and a disk hit is promoted
+    back to memory. The disk tier is an LRU too, capped at ``disk_max_bytes``.
+    Disk writes happen in the thread calling ``put``: keep it off the event loop.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = DEFAULT_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        # key -> size of the files in disk_dir, least recently used first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "disk_evictions": 0,
+        }
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return data
+
+        # Not only indexed keys: another worker may share the directory
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            else:
+                self._disk[key] = len(data)
+                self._disk_size += len(data)
+            evicted = self._store(key, data)
+        self._spill(evicted)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        with self._lock:
+            evicted = self._store(key, data)
+        self._spill(evicted)
+
+    def flush(self) -> None:
+        """Write every memory entry to the disk tier."""
+        with self._lock:
+            entries = list(self._entries.items())
+        self._spill(entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            for name in self._stats:
+                self._stats[name] = type(self._stats[name])()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._size
+            stats["disk_entries"] = len(self._disk)
+            stats["disk_bytes"] = self._disk_size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _store(self, key, data) -> List[Tuple[str, bytes]]:
+        """Insert into the memory tier and evict LRU entries; return the
+        evicted entries, for the disk tier. Caller holds the lock."""
+        if len(data) > self.max_bytes:
+            return [(key, data)]
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = data
+        self._size += len(data)
+        evicted = []
+        while self._size > self.max_bytes:
+            item = self._entries.popitem(last=False)
+            self._size -= len(item[1])
+            self._stats["evictions"] += 1
+            evicted.append(item)
+        return evicted
+
+    # -- disk tier ----------------------------------------------------------
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.bin")
+
+    def _load_disk_index(self):
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".bin"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                files.append((st.st_mtime, name[:-len(".bin")], st.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_size += size
+        self._remove_files(self._trim_disk())
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _spill(self, entries):
+        if not self.disk_dir:
+            return
+        for key, data in entries:
+            with self._lock:
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                    continue
+            if len(data) > self.disk_max_bytes or not self._write_disk(key, data):
+                continue
+            with self._lock:
+                self._disk[key] = len(data)
+                self._disk_size += len(data)
+                removed = self._trim_disk()
+            self._remove_files(removed)
+
+    def _trim_disk(self) -> List[str]:
+        """Drop LRU disk entries over the cap from the index; return their
+        keys. Caller holds the lock (or owns the cache)."""
+        removed = []
+        while self._disk_size > self.disk_max_bytes:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            self._stats["disk_evictions"] += 1
+            removed.append(key)
+        return removed
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _write_disk(self, key, data) -> bool:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return False
+        return True
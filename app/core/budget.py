@@ -0,0 +1,166 @@
+"""Per-session and process-wide budgets for LLM tokens, TTS characters and
+time spent in LLM/TTS calls.
+
+Usage is charged where it happens (the chat model callback, the TTS
+synthesis functions) to the session bound with ``bind`` for the current
+turn, and to the process-wide window of the ``BudgetPolicy``. Before each
+turn the routes ask the policy for a level and bind it to the turn; the
+agents read it with ``text_only()`` / ``fast_director()``, so it only
+applies to that turn:
+
+    NORMAL         nothing to do
+    TEXT_ONLY      no more TTS (also as soon as the TTS budget alone runs out)
+    FAST_DIRECTOR  text only, and no director LLM call: keyword fast path,
+                   DEFAULT_RESULT when it is ambiguous
+    EXHAUSTED      the turn is refused (HTTP 429)
+
+Limits come from the environment, 0 or unset meaning unlimited::
+
+    SESSION_BUDGET_TOKENS, SESSION_BUDGET_TTS_CHARS, SESSION_BUDGET_SECONDS
+    GLOBAL_BUDGET_TOKENS, GLOBAL_BUDGET_TTS_CHARS, GLOBAL_BUDGET_SECONDS
+    GLOBAL_BUDGET_WINDOW  (seconds, default one day)
+    BUDGET_TEXT_ONLY_AT, BUDGET_FAST_DIRECTOR_AT  (fractions, default 0.8 / 0.9)
+
+Global budgets are per process: with several uvicorn workers each one
+enforces them on its own.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+NORMAL, TEXT_ONLY, FAST_DIRECTOR, EXHAUSTED = range(4)
+LEVEL_NAMES = ("normal", "text_only", "fast_director", "exhausted")
+
+DEFAULT_WINDOW = 24 * 3600
+DEFAULT_TEXT_ONLY_AT = 0.8
+DEFAULT_FAST_DIRECTOR_AT = 0.9
+
+_lock = threading.Lock()
+# (session usage dict, policy) of the turn being served
+_bound: contextvars.ContextVar[Optional[tuple]] = contextvars.ContextVar("budget", default=None)
+# Degradation level of the turn being served
+_level: contextvars.ContextVar[int] = contextvars.ContextVar("budget_level", default=NORMAL)
+
+
+def new_usage() -> Dict[str, float]:
+    """Zeroed usage counters, as stored on SessionState."""
+    return {"tokens": 0, "tts_characters": 0, "seconds": 0.0}
+
+
+def _limits(prefix: str) -> Dict[str, float]:
+    return {
+        "tokens": float(os.getenv(f"{prefix}_TOKENS", 0)),
+        "tts_characters": float(os.getenv(f"{prefix}_TTS_CHARS", 0)),
+        "seconds": float(os.getenv(f"{prefix}_SECONDS", 0)),
+    }
+
+
+def enabled() -> bool:
+    """Whether any budget is configured (usage is only metered then)."""
+    return any(_limits("SESSION_BUDGET").values()) or any(_limits("GLOBAL_BUDGET").values())
+
+
+class BudgetPolicy:
+    def __init__(self, session_limits: Optional[Dict[str, float]] = None,
+                 global_limits: Optional[Dict[str, float]] = None,
+                 window: Optional[float] = None, text_only_at: Optional[float] = None,
+                 fast_director_at: Optional[float] = None, clock=time.monotonic):
+        self.session_limits = session_limits if session_limits is not None else _limits("SESSION_BUDGET")
+        self.global_limits = global_limits if global_limits is not None else _limits("GLOBAL_BUDGET")
+        self.window = window if window is not None else float(
+            os.getenv("GLOBAL_BUDGET_WINDOW", DEFAULT_WINDOW))
+        self.text_only_at = text_only_at if text_only_at is not None else float(
+            os.getenv("BUDGET_TEXT_ONLY_AT", DEFAULT_TEXT_ONLY_AT))
+        self.fast_director_at = fast_director_at if fast_director_at is not None else float(
+            os.getenv("BUDGET_FAST_DIRECTOR_AT", DEFAULT_FAST_DIRECTOR_AT))
+        self._clock = clock
+        self._window_start = clock()
+        self.global_usage = new_usage()
+
+    @property
+    def enabled(self) -> bool:
+        return any(self.session_limits.values()) or any(self.global_limits.values())
+
+    def _roll_window(self) -> None:
+        now = self._clock()
+        if now - self._window_start >= self.window:
+            self._window_start = now
+            self.global_usage = new_usage()
+
+    def _level(self, usage: Dict[str, float], limits: Dict[str, float]) -> int:
+        level = NORMAL
+        for name, limit in limits.items():
+            if limit <= 0:
+                continue
+            ratio = usage.get(name, 0) / limit
+            if ratio >= self.text_only_at:
+                level = max(level, TEXT_ONLY)
+            # Running out of TTS characters only ever costs the audio
+            if name == "tts_characters":
+                continue
+            if ratio >= 1.0:
+                return EXHAUSTED
+            if ratio >= self.fast_director_at:
+                level = max(level, FAST_DIRECTOR)
+        return level
+
+    def level(self, usage: Dict[str, float]) -> int:
+        """Degradation level for a session with this usage, taking the
+        global window into account."""
+        with _lock:
+            self._roll_window()
+            return max(self._level(usage, self.session_limits),
+                       self._level(self.global_usage, self.global_limits))
+
+    def charge(self, usage: Dict[str, float], **amounts) -> None:
+        with _lock:
+            self._roll_window()
+            for name, amount in amounts.items():
+                usage[name] = usage.get(name, 0) + amount
+                self.global_usage[name] += amount
+
+    @property
+    def stats(self) -> dict:
+        with _lock:
+            self._roll_window()
+            return {
+                "session_limits": dict(self.session_limits),
+                "global_limits": dict(self.global_limits),
+                "global_usage": dict(self.global_usage),
+            }
+
+
+def bind(usage: Dict[str, float], policy: BudgetPolicy, level: int = NORMAL) -> None:
+    """Charge usage from this context (and tasks it starts) to ``usage``,
+    and serve it at ``level``."""
+    _bound.set((usage, policy))
+    _level.set(level)
+
+
+def current_level() -> int:
+    return _level.get()
+
+
+def text_only() -> bool:
+    """Whether the current turn must skip TTS."""
+    return _level.get() >= TEXT_ONLY
+
+
+def fast_director() -> bool:
+    """Whether the current turn must use the director's keyword fast path."""
+    return _level.get() >= FAST_DIRECTOR
+
+
+def metering() -> bool:
+    return _bound.get() is not None
+
+
+def charge(tokens: int = 0, tts_characters: int = 0, seconds: float = 0.0) -> None:
+    """Add to the bound session's usage; a no-op outside a metered turn."""
+    bound = _bound.get()
+    if bound is not None:
+        usage, policy = bound
+        policy.charge(usage, tokens=tokens, tts_characters=tts_characters, seconds=seconds)
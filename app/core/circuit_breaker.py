@@ -0,0 +1,145 @@
+"""Circuit breaker for a flaky remote service (Google TTS).
+
+``CLOSED``: calls go through. After ``failures`` consecutive failed or
+slow (over ``slow_seconds``) calls the breaker opens.
+``OPEN``: calls are refused at once with ``CircuitOpen`` until
+``cooldown`` seconds have passed.
+``HALF_OPEN``: one probe call is let through; it closes the breaker if it
+succeeds in time, and reopens it otherwise. Other calls are refused while
+the probe runs.
+
+Calls still in flight when the breaker opens are ignored when they finish:
+only the probe decides when it closes.
+"""
+
+import threading
+import time
+from typing import Optional
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # for the /metrics gauge
+
+
+class CircuitOpen(RuntimeError):
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit open, retrying in {retry_in:.1f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int = 3, slow_seconds: Optional[float] = None,
+                 cooldown: float = 15.0, clock=time.monotonic, on_open=None, on_reject=None):
+        self.name = name
+        self.failures = failures  # 0 disables the breaker
+        self.slow_seconds = slow_seconds
+        self.cooldown = cooldown
+        self._clock = clock
+        self._on_open = on_open
+        self._on_reject = on_reject
+        self._state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "slow": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self) -> Optional[str]:
+        """Raise ``CircuitOpen`` unless a call may go through now. Returns
+        the state the call starts in, for ``after_call``."""
+        if self.failures <= 0:
+            return None
+        with self._lock:
+            if self._state == OPEN:
+                retry_in = self._opened_at + self.cooldown - self._clock()
+                if retry_in > 0:
+                    self._reject(retry_in)
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    self._reject(0.0)
+                self._probing = True
+            self._stats["calls"] += 1
+            return self._state
+
+    def _reject(self, retry_in: float) -> None:
+        self._stats["rejected"] += 1
+        if self._on_reject:
+            self._on_reject()
+        raise CircuitOpen(self.name, retry_in)
+
+    def after_call(self, started_in: Optional[str], seconds: float,
+                   error: Optional[BaseException] = None) -> None:
+        """Record a call's outcome. Only the half-open probe can close the
+        breaker; calls started while it was closed no longer count once it
+        has opened (a late success must not close it, nor a late failure
+        push the cooldown back)."""
+        if started_in is None:
+            return
+        failed = error is not None
+        slow = not failed and self.slow_seconds is not None and seconds > self.slow_seconds
+        with self._lock:
+            if started_in == HALF_OPEN:
+                self._probing = False
+                if failed or slow:
+                    self._count_failure(failed)
+                    self._open()
+                else:
+                    self._state = CLOSED
+                    self._consecutive = 0
+                return
+            if self._state != CLOSED:
+                return
+            if not (failed or slow):
+                self._consecutive = 0
+                return
+            self._count_failure(failed)
+            self._consecutive += 1
+            if self._consecutive >= self.failures:
+                self._open()
+
+    def _count_failure(self, failed: bool) -> None:
+        self._stats["failures" if failed else "slow"] += 1
+
+    def _open(self) -> None:
+        """Caller holds the lock."""
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._consecutive = 0
+        self._stats["opened"] += 1
+        if self._on_open:
+            self._on_open()
+
+    def guard(self) -> "_Guarded":
+        """Context manager around one call: refused while open, its outcome
+        and duration recorded on exit."""
+        return _Guarded(self)
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        return {**stats, "state": self.state}
+
+
+class _Guarded:
+    __slots__ = ("breaker", "started_in", "start")
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+
+    def __enter__(self):
+        self.started_in = self.breaker.before_call()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.breaker.after_call(self.started_in, time.perf_counter() - self.start, exc)
+        return False
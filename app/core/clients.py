@@ -0,0 +1,148 @@
+"""Process-wide LLM and TTS clients shared by every session's agents.
+
+Agents are per-session state (memory, objectives); the expensive pieces
+(HTTP connection pools, gRPC channels) are created once here and borrowed.
+"""
+
+import os
+import threading
+
+import httpx
+from langchain_groq import ChatGroq
+
+from app.core import hedging, scheduler
+from app.core.tracing import tracing_callbacks
+
+MODEL_NAME = "llama-3.1-8b-instant"
+
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+_lock = threading.Lock()
+_chat_models = {}
+_http_clients = {}
+_tts_clients = {}
+
+
+def _shared_http_clients():
+    """One keep-alive connection pool (sync + async) for every Groq call."""
+    if not _http_clients:
+        _http_clients["sync"] = httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+        _http_clients["async"] = httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT)
+    return _http_clients["sync"], _http_clients["async"]
+
+
+def _prompt_tokens(messages) -> int:
+    from app.agents.memory import count_tokens
+    return sum(count_tokens(str(m.content)) for m in messages)
+
+
+class ScheduledChatGroq(ChatGroq):
+    """ChatGroq whose calls wait their turn in the process-wide
+    GroqScheduler, which also retries rate limits (see app.core.scheduler)."""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super(ScheduledChatGroq, self)._generate
+        return scheduler.get_scheduler().run(
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+            _prompt_tokens(messages))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super(ScheduledChatGroq, self)._agenerate
+        return await scheduler.get_scheduler().arun(
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+            _prompt_tokens(messages))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super(ScheduledChatGroq, self)._stream
+        yield from scheduler.get_scheduler().stream(
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+            _prompt_tokens(messages))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super(ScheduledChatGroq, self)._astream
+        async for chunk in scheduler.get_scheduler().astream(
+                lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs),
+                _prompt_tokens(messages)):
+            yield chunk
+
+
+class HedgedChatGroq(hedging.HedgedCalls, ChatGroq):
+    """ChatGroq with per-stage timeouts and hedging (app.core.hedging)."""
+
+
+class HedgedScheduledChatGroq(hedging.HedgedCalls, ScheduledChatGroq):
+    """Hedged outside the scheduler: a hedge waits its turn like any call."""
+
+
+# (scheduled, hedged) -> model class
+_MODEL_CLASSES = {
+    (False, False): ChatGroq,
+    (True, False): ScheduledChatGroq,
+    (False, True): HedgedChatGroq,
+    (True, True): HedgedScheduledChatGroq,
+}
+
+
+def get_chat_model(api_key: str, temperature: float) -> ChatGroq:
+    """Return the shared ChatGroq for this key and temperature. It is
+    scheduled when GROQ_RPM or GROQ_TPM is set, and hedged / time-limited
+    with LLM_HEDGE or LLM_TIMEOUTS."""
+    key = (api_key, temperature)
+    with _lock:
+        model = _chat_models.get(key)
+        if model is None:
+            http_client, http_async_client = _shared_http_clients()
+            scheduled = scheduler.enabled()
+            model = _MODEL_CLASSES[scheduled, hedging.enabled()](
+                api_key=api_key,
+                model=MODEL_NAME,
+                temperature=temperature,
+                streaming=False,
+                http_client=http_client,
+                http_async_client=http_async_client,
+                callbacks=tracing_callbacks(),
+                # The scheduler does the retrying, paced with the other calls
+                max_retries=0 if scheduled else 2,
+            )
+            _chat_models[key] = model
+    return model
+
+
+def _get_tts_client(version: str):
+    if not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+        return None
+    with _lock:
+        if version not in _tts_clients:
+            _tts_clients[version] = None
+            try:
+                from google.cloud import texttospeech, texttospeech_v1beta1
+                from langchain_google_community._utils import get_client_info
+                module = texttospeech if version == "v1" else texttospeech_v1beta1
+                _tts_clients[version] = module.TextToSpeechClient(
+                    client_info=get_client_info(module="text-to-speech")
+                )
+                print(f"✓ Google TTS client initialized ({version})")
+            except Exception as e:
+                print(f"⚠ TTS client initialization failed: {e}")
+        return _tts_clients[version]
+
+
+def get_tts_client():
+    """Return the shared Google TTS client, or None without credentials."""
+    return _get_tts_client("v1")
+
+
+def get_tts_beta_client():
+    """Return the shared v1beta1 TTS client (needed for <mark> timepoints)."""
+    return _get_tts_client("v1beta1")
+
+
+def reset_clients() -> None:
+    """Forget every shared client (tests, credential changes)."""
+    with _lock:
+        _chat_models.clear()
+        _http_clients.clear()
+        _tts_clients.clear()
+    scheduler.reset_scheduler()
+    hedging.reset_guard()
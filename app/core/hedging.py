@@ -0,0 +1,281 @@
+"""Hard timeouts and hedged requests for LLM calls.
+
+Each call is identified by its stage (``metrics.timed`` around it:
+``director_llm``, ``victim_llm``...).
+
+- ``LLM_TIMEOUTS=1`` gives every stage a hard timeout, its latency SLO
+  (``DEFAULT_TIMEOUTS``, overridden with ``LLM_TIMEOUT_<STAGE>=seconds``,
+  e.g. ``LLM_TIMEOUT_DIRECTOR_LLM=3``). A call over it raises ``LLMTimeout``.
+- ``LLM_HEDGE=1`` sends a duplicate of a call still running after the
+  ``LLM_HEDGE_PERCENTILE`` (default 0.95) of its stage's recent latencies;
+  the first answer wins and the other call is cancelled. Hedges are paid
+  from a credit of ``LLM_HEDGE_BUDGET`` (default 0.05) per call, so they
+  never exceed that fraction of the calls.
+
+For streams, the hedge races the first chunk and the timeout covers the
+whole stream. Only async calls are guarded (the server never uses the sync
+ones).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from app.core.metrics import LLM_HEDGES, LLM_TIMEOUTS, current_stage
+
+DEFAULT_TIMEOUTS = {
+    "director_llm": 4.0,
+    "victim_llm": 8.0,
+    "scammer_llm": 8.0,
+    "moderator_llm": 8.0,
+    "memory_summary": 10.0,
+    "llm": 10.0,  # calls outside any stage
+}
+DEFAULT_PERCENTILE = 0.95
+DEFAULT_BUDGET = 0.05
+MIN_SAMPLES = 20  # no hedging before a stage has this many latencies
+WINDOW = 200  # recent latencies kept per stage
+MAX_CREDIT = 5.0  # hedges that can be saved up for a burst
+
+_END = object()
+
+
+def _flag(name: str) -> bool:
+    return os.getenv(name, "0").lower() in ("1", "true", "yes")
+
+
+def enabled() -> bool:
+    return _flag("LLM_TIMEOUTS") or _flag("LLM_HEDGE")
+
+
+class LLMTimeout(TimeoutError):
+    def __init__(self, stage: str, seconds: float):
+        super().__init__(f"{stage} took more than {seconds:g}s")
+        self.stage = stage
+        self.seconds = seconds
+
+
+class _Latencies:
+    """Recent latencies of one stage, with a cached percentile."""
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self._cached: Optional[float] = None
+        self._stale = 0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._stale += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        if self._cached is None or self._stale >= 10:
+            ordered = sorted(self.samples)
+            self._cached = ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+            self._stale = 0
+        return self._cached
+
+
+async def _next(iterator):
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+async def _close(task: asyncio.Task, stream=None) -> None:
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+    if stream is not None:
+        await stream.aclose()
+
+
+class LatencyGuard:
+    def __init__(self, timeouts: Optional[Dict[str, float]] = None, hedge: bool = False,
+                 percentile: float = DEFAULT_PERCENTILE, budget: float = DEFAULT_BUDGET):
+        self.timeouts = timeouts or {}
+        self.hedge = hedge
+        self.percentile = percentile
+        self.budget = budget
+        self._latencies: Dict[str, _Latencies] = {}
+        self._credit = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0}
+
+    def _hedge_delay(self, key: str) -> Optional[float]:
+        if not self.hedge:
+            return None
+        latencies = self._latencies.get(key)
+        return latencies.percentile(self.percentile) if latencies else None
+
+    def _start(self) -> None:
+        with self._lock:
+            self.stats["calls"] += 1
+            self._credit = min(MAX_CREDIT, self._credit + self.budget)
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0 - 1e-9:  # 20 x 0.05 must add up to a hedge
+                return False
+            self._credit -= 1.0
+            self.stats["hedged"] += 1
+            return True
+
+    def _observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(key, _Latencies()).add(seconds)
+
+    def _timeout(self, stage: str) -> Optional[float]:
+        return self.timeouts.get(stage, self.timeouts.get("llm"))
+
+    def _timeout_error(self, stage: str) -> LLMTimeout:
+        self.stats["timeouts"] += 1
+        LLM_TIMEOUTS.inc(1, stage)
+        return LLMTimeout(stage, self._timeout(stage))
+
+    async def _race(self, stage: str, key: str, start_call):
+        """Run ``start_call()`` (returning a task), hedged once it is slower
+        than usual. Returns (winning task, its index, every task started);
+        the caller disposes of the others."""
+        self._start()
+        start = time.perf_counter()
+        tasks = [start_call()]
+        try:
+            delay = self._hedge_delay(key)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._take_hedge():
+                    LLM_HEDGES.inc(1, stage, "fired")
+                    tasks.append(start_call())
+            pending = list(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if t.exception() is None), None)
+                if winner is not None or not pending:
+                    break
+            if winner is None:
+                winner = done.pop()  # every call failed: raise its error
+            index = tasks.index(winner)
+            if index:
+                self.stats["hedge_wins"] += 1
+                LLM_HEDGES.inc(1, stage, "won")
+            if winner.exception() is None:
+                self._observe(key, time.perf_counter() - start)
+            return winner, index, tasks
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def arun(self, call):
+        """Await ``call()`` (a coroutine factory) under the current stage's
+        timeout and hedging."""
+        stage = current_stage() or "llm"
+
+        async def race():
+            winner, _, tasks = await self._race(stage, stage, lambda: asyncio.ensure_future(call()))
+            for task in tasks:
+                if task is not winner:
+                    task.cancel()
+            return winner.result()
+
+        timeout = self._timeout(stage)
+        if timeout is None:
+            return await race()
+        try:
+            return await asyncio.wait_for(race(), timeout)
+        except asyncio.TimeoutError:
+            raise self._timeout_error(stage) from None
+
+    async def astream(self, call):
+        """Iterate ``call()`` (an async iterator factory): the first chunk is
+        raced like ``arun``, the whole stream is under the timeout."""
+        stage = current_stage() or "llm"
+        timeout = self._timeout(stage)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        started = []  # (stream, task reading its first chunk)
+
+        def start_stream():
+            stream = call()
+            started.append((stream, asyncio.ensure_future(_next(stream))))
+            return started[-1][1]
+
+        try:
+            winner, index, _ = await asyncio.wait_for(
+                self._race(stage, f"{stage}:first_chunk", start_stream), timeout)
+        except asyncio.TimeoutError:
+            for stream, task in started:
+                await _close(task, stream)
+            raise self._timeout_error(stage) from None
+        for i, (stream, task) in enumerate(started):
+            if i != index:
+                await _close(task, stream)
+
+        stream = started[index][0]
+        try:
+            chunk = winner.result()
+            while chunk is not _END:
+                yield chunk
+                if deadline is None:
+                    chunk = await _next(stream)
+                    continue
+                try:
+                    chunk = await asyncio.wait_for(_next(stream), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    raise self._timeout_error(stage) from None
+        finally:
+            await stream.aclose()
+
+
+class HedgedCalls:
+    """Chat model mixin (listed before the model class): async generation
+    and streaming go through the process-wide LatencyGuard."""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super()._agenerate
+        return await get_guard().arun(
+            lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        parent = super()._astream
+        async for chunk in get_guard().astream(
+                lambda: parent(messages, stop=stop, run_manager=run_manager, **kwargs)):
+            yield chunk
+
+
+def _timeouts_from_env() -> Dict[str, float]:
+    timeouts = dict(DEFAULT_TIMEOUTS) if _flag("LLM_TIMEOUTS") else {}
+    for name, value in os.environ.items():
+        if name.startswith("LLM_TIMEOUT_") and float(value) > 0:
+            timeouts[name[len("LLM_TIMEOUT_"):].lower()] = float(value)
+    return timeouts
+
+
+_guard: Optional[LatencyGuard] = None
+_guard_lock = threading.Lock()
+
+
+def get_guard() -> LatencyGuard:
+    global _guard
+    with _guard_lock:
+        if _guard is None:
+            _guard = LatencyGuard(
+                timeouts=_timeouts_from_env(),
+                hedge=_flag("LLM_HEDGE"),
+                percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", DEFAULT_PERCENTILE)),
+                budget=float(os.getenv("LLM_HEDGE_BUDGET", DEFAULT_BUDGET)),
+            )
+        return _guard
+
+
+def reset_guard() -> None:
+    global _guard
+    with _guard_lock:
+        _guard = None
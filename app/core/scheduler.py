@@ -0,0 +1,319 @@
+"""Process-wide scheduler for Groq calls.
+
+Every agent shares one API key, so its request and token rate limits are
+shared too. With ``GROQ_RPM`` and/or ``GROQ_TPM`` set, the chat models
+from ``clients.get_chat_model`` go through one ``GroqScheduler``:
+
+- two token buckets model the limits (requests and tokens per minute; a
+  call reserves its estimated prompt plus ``COMPLETION_RESERVE`` tokens,
+  corrected with Groq's usage once it returns);
+- waiting calls are served by priority (the short director calls first,
+  memory summaries last), then round-robin across sessions so one busy
+  session cannot starve the others;
+- a 429 pauses every call until its ``retry-after`` (or a jittered
+  exponential backoff) and the call is retried, up to ``GROQ_MAX_RETRIES``
+  times. Transient 5xx and connection errors are retried the same way,
+  without the global pause.
+
+Time spent queued is recorded as the ``groq_queue`` stage; queue depth and
+429 counts are in ``stats`` (and /metrics).
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional
+
+import groq
+
+from app.core.metrics import GROQ_RETRIES, current_stage, record
+from app.core.tracing import current_context
+
+PRIORITIES = {"director_llm": 0, "memory_summary": 2}
+DEFAULT_PRIORITY = 1
+COMPLETION_RESERVE = 256  # tokens reserved for the completion until usage is known
+DEFAULT_MAX_RETRIES = 5
+BASE_BACKOFF = 0.5  # seconds
+MAX_BACKOFF = 30.0
+
+_RETRYABLE = (groq.RateLimitError, groq.InternalServerError, groq.APIConnectionError)
+
+
+class TokenBucket:
+    """``per_minute`` units, refilled continuously; 0 means unlimited."""
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken (a call larger than the
+        whole bucket waits for a full one)."""
+        if self.capacity <= 0:
+            return 0.0
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        if self.capacity > 0:
+            self.level -= amount
+
+
+class _Waiter:
+    __slots__ = ("session", "priority", "tokens", "granted", "notify")
+
+    def __init__(self, session, priority: int, tokens: int, notify: Callable[[], None]):
+        self.session = session
+        self.priority = priority
+        self.tokens = tokens
+        self.granted = False
+        self.notify = notify
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class GroqScheduler:
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_retries: int = DEFAULT_MAX_RETRIES,
+                 clock=time.monotonic, rng: Optional[random.Random] = None):
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self.max_retries = max_retries
+        self.requests = TokenBucket(rpm, clock())
+        self.tokens = TokenBucket(tpm, clock())
+        self._queues = [OrderedDict() for _ in range(max(PRIORITIES.values()) + 1)]
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "granted": 0, "rate_limited": 0, "retries": 0, "wait_seconds": 0.0,
+        }
+
+    # -- queue (under self._lock) -------------------------------------------
+
+    def _enqueue(self, tokens: int, notify) -> _Waiter:
+        waiter = _Waiter(current_context().get("session_id"),
+                         PRIORITIES.get(current_stage(), DEFAULT_PRIORITY), tokens, notify)
+        self._queues[waiter.priority].setdefault(waiter.session, deque()).append(waiter)
+        return waiter
+
+    def _head(self) -> Optional[_Waiter]:
+        for queue in self._queues:
+            if queue:
+                return next(iter(queue.values()))[0]
+        return None
+
+    def _remove(self, waiter: _Waiter, served: bool = False) -> None:
+        queue = self._queues[waiter.priority]
+        waiters = queue.get(waiter.session)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del queue[waiter.session]
+        elif served:
+            # Served sessions go to the back: round-robin across sessions
+            queue.move_to_end(waiter.session)
+
+    def _grant(self) -> float:
+        """Grant every call that fits now; return the delay before the next one."""
+        now = self._clock()
+        while True:
+            waiter = self._head()
+            if waiter is None:
+                return 0.0
+            delay = max(self._blocked_until - now, self.requests.delay(1, now),
+                        self.tokens.delay(waiter.tokens, now))
+            if delay > 0:
+                return delay
+            self.requests.take(1)
+            self.tokens.take(waiter.tokens)
+            self._remove(waiter, served=True)
+            waiter.granted = True
+            self._stats["granted"] += 1
+            waiter.notify()
+
+    # -- acquiring ----------------------------------------------------------
+
+    async def acquire(self, tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        start = time.perf_counter()
+        with self._lock:
+            waiter = self._enqueue(tokens, lambda: loop.call_soon_threadsafe(wakeup.set))
+        try:
+            while True:
+                with self._lock:
+                    delay = 0.0 if waiter.granted else self._grant()
+                if waiter.granted:
+                    break
+                try:
+                    await asyncio.wait_for(wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                self._remove(waiter)
+            raise
+        self._waited(time.perf_counter() - start)
+
+    def acquire_sync(self, tokens: int) -> None:
+        wakeup = threading.Event()
+        start = time.perf_counter()
+        with self._lock:
+            waiter = self._enqueue(tokens, wakeup.set)
+        while True:
+            with self._lock:
+                delay = 0.0 if waiter.granted else self._grant()
+            if waiter.granted:
+                break
+            wakeup.wait(delay)
+        self._waited(time.perf_counter() - start)
+
+    def _waited(self, seconds: float) -> None:
+        self._stats["wait_seconds"] += seconds
+        record("groq_queue", seconds)
+
+    def settle(self, reserved: int, used: Optional[int]) -> None:
+        """Correct the token bucket once the actual usage is known."""
+        if used is not None:
+            with self._lock:
+                self.tokens.take(used - reserved)
+
+    def _backoff(self, error: Exception, attempt: int) -> float:
+        """Seconds to sleep before retrying. A 429 instead pauses every
+        call until it is lifted (the retry waits in the queue)."""
+        delay = self._rng.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+        self._stats["retries"] += 1
+        if isinstance(error, groq.RateLimitError):
+            GROQ_RETRIES.inc(1, "rate_limited")
+            self._stats["rate_limited"] += 1
+            delay = max(delay, _retry_after(error) or 0.0)
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, self._clock() + delay)
+                self.requests.level = min(self.requests.level, 0.0)
+            return 0.0
+        GROQ_RETRIES.inc(1, type(error).__name__)
+        return delay
+
+    # -- running calls ------------------------------------------------------
+
+    async def arun(self, call, prompt_tokens: int):
+        """Await ``call()`` (a coroutine factory) once scheduled, retrying
+        rate limits and transient errors."""
+        reserved = prompt_tokens + COMPLETION_RESERVE
+        attempt = 0
+        while True:
+            await self.acquire(reserved)
+            try:
+                result = await call()
+            except _RETRYABLE as e:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(e, attempt))
+                attempt += 1
+                continue
+            self.settle(reserved, _total_tokens(result))
+            return result
+
+    def run(self, call, prompt_tokens: int):
+        reserved = prompt_tokens + COMPLETION_RESERVE
+        attempt = 0
+        while True:
+            self.acquire_sync(reserved)
+            try:
+                result = call()
+            except _RETRYABLE as e:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(e, attempt))
+                attempt += 1
+                continue
+            self.settle(reserved, _total_tokens(result))
+            return result
+
+    async def astream(self, call, prompt_tokens: int):
+        """Scheduled async iteration of ``call()``; only failures before the
+        first chunk are retried."""
+        reserved = prompt_tokens + COMPLETION_RESERVE
+        attempt = 0
+        while True:
+            await self.acquire(reserved)
+            started = False
+            try:
+                async for chunk in call():
+                    started = True
+                    yield chunk
+                return
+            except _RETRYABLE as e:
+                if started or attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(e, attempt))
+                attempt += 1
+
+    def stream(self, call, prompt_tokens: int):
+        reserved = prompt_tokens + COMPLETION_RESERVE
+        attempt = 0
+        while True:
+            self.acquire_sync(reserved)
+            started = False
+            try:
+                for chunk in call():
+                    started = True
+                    yield chunk
+                return
+            except _RETRYABLE as e:
+                if started or attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(e, attempt))
+                attempt += 1
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            queued = sum(len(w) for queue in self._queues for w in queue.values())
+        return {**self._stats, "queued": queued}
+
+
+def _total_tokens(result) -> Optional[int]:
+    usage = (getattr(result, "llm_output", None) or {}).get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+_scheduler: Optional[GroqScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(float(os.getenv("GROQ_RPM", 0)) or float(os.getenv("GROQ_TPM", 0)))
+
+
+def get_scheduler() -> GroqScheduler:
+    """The process-wide scheduler, configured from the environment."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = GroqScheduler(
+                rpm=float(os.getenv("GROQ_RPM", 0)),
+                tpm=float(os.getenv("GROQ_TPM", 0)),
+                max_retries=int(os.getenv("GROQ_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+            )
+        return _scheduler
+
+
+def reset_scheduler() -> None:
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = None
@@ -0,0 +1,345 @@
+"""Per-call trace spans (LLM and TTS) written to rotating JSONL files.
+
+Enabled by ``TRACE_DIR``. Every LLM call made through the shared chat
+models and every TTS synthesis becomes one span::
+
+    {"ts", "kind": "llm"|"tts", "stage", "session_id", "turn", "model",
+     "prompt_tokens", "completion_tokens", "tokens_estimated",
+     "characters", "wall_ms", "error"}
+
+The stage comes from the enclosing ``metrics.timed`` block, the session
+and turn from ``bind``. Spans are put on a bounded in-process queue
+(never blocking: spans are dropped and counted when it is full) and a
+daemon thread writes them in batches. Aggregate the files with::
+
+    python -m app.core.tracing report TRACE_DIR [--json]
+"""
+
+import argparse
+import atexit
+import contextvars
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.core import budget
+from app.core.metrics import current_stage
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_QUEUE = 10_000
+
+# USD per million tokens (input, output) and per million TTS characters
+LLM_PRICES = {"llama-3.1-8b-instant": (0.05, 0.08)}
+TTS_PRICE_PER_MILLION_CHARS = 16.0  # Neural2 voices
+
+_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("trace_context", default={})
+
+
+def bind(session_id: str, turn: int) -> None:
+    """Attach the session and turn to spans emitted from this context
+    (and from tasks it starts)."""
+    _context.set({"session_id": session_id, "turn": turn})
+
+
+def current_context() -> Dict[str, Any]:
+    return _context.get()
+
+
+class TraceWriter:
+    """Bounded queue drained by a daemon thread into rotating JSONL files
+    (``spans-<start time>-<pid>.jsonl``, a new file past ``max_bytes``)."""
+
+    def __init__(self, directory: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, max_queue: int = DEFAULT_MAX_QUEUE):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self.written = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._file_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, span: dict) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush what is queued and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _open(self):
+        if self._file is not None:
+            self._file.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"spans-{stamp}-{os.getpid()}.jsonl")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"spans-{stamp}-{os.getpid()}-{suffix}.jsonl")
+            suffix += 1
+        self._file = open(path, "a", encoding="utf-8")
+        self._file_bytes = 0
+
+    def _write(self, batch: list) -> None:
+        data = "".join(json.dumps(span, ensure_ascii=False) + "\n" for span in batch)
+        if self._file is None or self._file_bytes + len(data) > self.max_bytes:
+            self._open()
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self.written += len(batch)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stop = True
+                    break
+                batch.append(span)
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    print(f"⚠ Trace write failed: {e}")
+        if self._file is not None:
+            self._file.close()
+
+
+_writer: Optional[TraceWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> Optional[TraceWriter]:
+    """The process-wide writer, or None when TRACE_DIR is not set."""
+    global _writer
+    if _writer is None and os.getenv("TRACE_DIR"):
+        with _writer_lock:
+            if _writer is None:
+                _writer = TraceWriter(
+                    os.environ["TRACE_DIR"],
+                    max_bytes=int(os.getenv("TRACE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                )
+                atexit.register(_writer.close)
+    return _writer
+
+
+def shutdown() -> None:
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+
+
+def emit(kind: str, stage: Optional[str] = None, **fields) -> None:
+    """Queue one span if tracing is enabled."""
+    writer = get_writer()
+    if writer is None:
+        return
+    span = {"ts": round(time.time(), 3), "kind": kind, "stage": stage or current_stage()}
+    span.update(_context.get())
+    span.update(fields)
+    writer.emit(span)
+
+
+class span:
+    """``with span("tts", characters=n):`` emits one span timing the block,
+    with the exception type if it raised. A no-op without TRACE_DIR."""
+
+    __slots__ = ("kind", "fields", "start")
+
+    def __init__(self, kind: str, **fields):
+        self.kind = kind
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if get_writer() is not None:
+            fields = dict(self.fields, wall_ms=round((time.perf_counter() - self.start) * 1000, 1))
+            if exc_type is not None:
+                fields["error"] = exc_type.__name__
+            emit(self.kind, **fields)
+        return False
+
+
+def _estimate_tokens(text: str) -> int:
+    from app.agents.memory import count_tokens
+    return count_tokens(text)
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """LangChain callbacks turning each chat model call into a span, and
+    charging its tokens to the session budget being metered. Token counts
+    come from Groq's usage metadata, or are estimated when absent
+    (streamed calls)."""
+
+    run_inline = True  # no executor hop: the handler only queues a dict
+
+    def __init__(self):
+        self._runs: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or params.get("_type")
+        self._runs[run_id] = (time.perf_counter(), model, messages, current_stage(), _context.get())
+
+    def _finish(self, run_id: UUID, **fields) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, model, messages, stage, context = run
+        wall = time.perf_counter() - start
+        writer = get_writer()
+        metering = budget.metering()
+        if writer is None and not metering:
+            return
+        span = {"ts": round(time.time(), 3), "kind": "llm", "stage": stage, **context,
+                "model": model, "wall_ms": round(wall * 1000, 1)}
+        if "completion" in fields:
+            completion = fields.pop("completion")
+            usage = fields.pop("usage") or {}
+            if usage.get("prompt_tokens") is not None:
+                span["prompt_tokens"] = usage["prompt_tokens"]
+                span["completion_tokens"] = usage.get("completion_tokens", 0)
+            else:
+                span["prompt_tokens"] = sum(_estimate_tokens(str(m.content)) for batch in messages
+                                            for m in batch)
+                span["completion_tokens"] = _estimate_tokens(completion)
+                span["tokens_estimated"] = True
+        span.update(fields)
+        if metering:
+            budget.charge(tokens=span.get("prompt_tokens", 0) + span.get("completion_tokens", 0),
+                          seconds=wall)
+        if writer is not None:
+            writer.emit(span)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        llm_output = response.llm_output or {}
+        text = "".join(g.text for gens in response.generations for g in gens)
+        self._finish(run_id, completion=text, usage=llm_output.get("token_usage"))
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs) -> None:
+        self._finish(run_id, error=type(error).__name__)
+
+
+TRACE_HANDLER = TraceCallbackHandler()
+
+
+def tracing_callbacks() -> Optional[list]:
+    """Callbacks for a new chat model: the trace handler if TRACE_DIR or a
+    budget is set."""
+    return [TRACE_HANDLER] if os.getenv("TRACE_DIR") or budget.enabled() else None
+
+
+# ---------------------------------------------------------------------------
+# Analysis
+
+
+def load_spans(directory: str):
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def span_cost(span: dict) -> float:
+    if span.get("kind") == "tts":
+        return span.get("characters", 0) * TTS_PRICE_PER_MILLION_CHARS / 1e6
+    prices = LLM_PRICES.get(span.get("model"))
+    if not prices:
+        return 0.0
+    return (span.get("prompt_tokens", 0) * prices[0]
+            + span.get("completion_tokens", 0) * prices[1]) / 1e6
+
+
+def aggregate(spans) -> dict:
+    """Calls, errors, latency percentiles, tokens, characters and cost per
+    stage, plus per-session totals."""
+    stages: Dict[str, dict] = {}
+    sessions: Dict[str, float] = {}
+    for span in spans:
+        stage = span.get("stage") or span.get("kind", "unknown")
+        agg = stages.setdefault(stage, {"calls": 0, "errors": 0, "wall_ms": [], "prompt_tokens": 0,
+                                        "completion_tokens": 0, "characters": 0, "cost_usd": 0.0})
+        agg["calls"] += 1
+        agg["errors"] += "error" in span
+        agg["wall_ms"].append(span.get("wall_ms", 0.0))
+        agg["prompt_tokens"] += span.get("prompt_tokens", 0)
+        agg["completion_tokens"] += span.get("completion_tokens", 0)
+        agg["characters"] += span.get("characters", 0)
+        cost = span_cost(span)
+        agg["cost_usd"] += cost
+        if span.get("session_id"):
+            sessions[span["session_id"]] = sessions.get(span["session_id"], 0.0) + cost
+
+    for agg in stages.values():
+        samples = sorted(agg.pop("wall_ms"))
+        agg["p50_ms"] = samples[len(samples) // 2]
+        agg["p95_ms"] = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        agg["cost_usd"] = round(agg["cost_usd"], 6)
+    total = sum(agg["cost_usd"] for agg in stages.values())
+    return {
+        "stages": stages,
+        "total_cost_usd": round(total, 6),
+        "sessions": len(sessions),
+        "cost_per_session_usd": round(sum(sessions.values()) / len(sessions), 6) if sessions else 0.0,
+    }
+
+
+def _print_table(report: dict) -> None:
+    print(f"{'stage':<16}{'calls':>7}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'prompt tok':>12}{'compl tok':>11}{'tts chars':>11}{'cost $':>11}")
+    for stage, agg in sorted(report["stages"].items()):
+        print(f"{stage:<16}{agg['calls']:>7}{agg['errors']:>5}{agg['p50_ms']:>9.0f}{agg['p95_ms']:>9.0f}"
+              f"{agg['prompt_tokens']:>12}{agg['completion_tokens']:>11}{agg['characters']:>11}"
+              f"{agg['cost_usd']:>11.4f}")
+    print(f"\nTotal: ${report['total_cost_usd']:.4f} over {report['sessions']} sessions "
+          f"(${report['cost_per_session_usd']:.4f} per session)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trace span analysis.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="cost and latency per stage")
+    report.add_argument("directory")
+    report.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args(argv)
+
+    result = aggregate(load_spans(args.directory))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        _print_table(result)
+
+
+if __name__ == "__main__":
+    main()
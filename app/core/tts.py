@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+from app.core import budget
+from app.core.blob_cache import DEFAULT_DISK_MAX_BYTES, BlobCache
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.metrics import TTS_BREAKER, TTS_CHARACTERS, timed
+from app.core.tracing import span
+
+DEFAULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_BREAKER_FAILURES = 3
+DEFAULT_BREAKER_SLOW_SECONDS = 5.0
+DEFAULT_BREAKER_COOLDOWN = 15.0
+
+
+class TTSCache(BlobCache):
+    """Content-addressed cache for synthesized audio, keyed on a hash of
+    (SSML, voice, audio config). Also tracks the TTS spend it saves."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MAX_BYTES, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = DEFAULT_DISK_MAX_BYTES):
+        super().__init__(max_bytes, disk_dir, disk_max_bytes)
+        self._stats["saved_chars"] = 0
+        self._stats["synthesis_seconds"] = 0.0
+
+    @staticmethod
+    def make_key(ssml: str, voice, audio_config, variant: str = "") -> str:
+        digest = hashlib.sha256()
+        digest.update(variant.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(ssml.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(type(voice).serialize(voice))
+        digest.update(b"\0")
+        digest.update(type(audio_config).serialize(audio_config))
+        return digest.hexdigest()
+
+    def record_saving(self, chars: int) -> None:
+        with self._lock:
+            self._stats["saved_chars"] += chars
+
+    def record_synthesis(self, seconds: float) -> None:
+        with self._lock:
+            self._stats["synthesis_seconds"] += seconds
+
+    @property
+    def stats(self) -> dict:
+        stats = super().stats
+        avg = stats["synthesis_seconds"] / stats["misses"] if stats["misses"] else 0.0
+        stats["saved_seconds"] = avg * stats["hits"]
+        return stats
+
+
+_cache: Optional[TTSCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSCache:
+    """Return the process-wide TTS cache, configured from the environment."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTSCache(
+                    max_bytes=int(os.getenv("TTS_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES)),
+                    disk_dir=os.getenv("TTS_CACHE_DIR") or None,
+                    disk_max_bytes=int(os.getenv("TTS_CACHE_DISK_MAX_BYTES",
+                                                 DEFAULT_DISK_MAX_BYTES)),
+                )
+    return _cache
+
+
+_breaker: Optional[CircuitBreaker] = None
+
+
+def get_tts_breaker() -> CircuitBreaker:
+    """Return the process-wide Google TTS circuit breaker.
+
+    While it is open, synthesis raises ``CircuitOpen`` at once and the agents
+    fall back to text-only segments instead of waiting on every segment.
+    ``TTS_BREAKER_FAILURES=0`` disables it.
+    """
+    global _breaker
+    if _breaker is None:
+        with _cache_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    "tts",
+                    failures=int(os.getenv("TTS_BREAKER_FAILURES", DEFAULT_BREAKER_FAILURES)),
+                    slow_seconds=float(os.getenv("TTS_BREAKER_SLOW_SECONDS",
+                                                 DEFAULT_BREAKER_SLOW_SECONDS)),
+                    cooldown=float(os.getenv("TTS_BREAKER_COOLDOWN", DEFAULT_BREAKER_COOLDOWN)),
+                    on_open=lambda: TTS_BREAKER.inc(1, "opened"),
+                    on_reject=lambda: TTS_BREAKER.inc(1, "short_circuited"),
+                )
+    return _breaker
+
+
+def reset_tts_breaker() -> None:
+    global _breaker
+    with _cache_lock:
+        _breaker = None
+
+
+def _call_options() -> dict:
+    """Per-call gRPC deadline (``TTS_TIMEOUT`` seconds), if configured."""
+    timeout = float(os.getenv("TTS_TIMEOUT", 0))
+    return {"timeout": timeout} if timeout > 0 else {}
+
+
+def escape_ssml(text: str) -> str:
+    return (text.replace("&", "&amp;").replace("<", "&lt;")
+                .replace(">", "&gt;").replace('"', "&quot;"))
+
+
+def synthesize_ssml(client, ssml: str, voice, audio_config) -> bytes:
+    """Synthesize SSML to audio bytes, going through the shared TTS cache."""
+    from google.cloud import texttospeech
+
+    cache = get_tts_cache()
+    key = cache.make_key(ssml, voice, audio_config)
+    audio = cache.get(key)
+    if audio is not None:
+        cache.record_saving(len(ssml))
+        return audio
+
+    with get_tts_breaker().guard():
+        start = time.perf_counter()
+        TTS_CHARACTERS.inc(len(ssml))
+        with timed("tts"), span("tts", characters=len(ssml)):
+            response = client.synthesize_speech(
+                input=texttospeech.SynthesisInput(ssml=ssml),
+                voice=voice,
+                audio_config=audio_config,
+                **_call_options(),
+            )
+    elapsed = time.perf_counter() - start
+    cache.record_synthesis(elapsed)
+    budget.charge(tts_characters=len(ssml), seconds=elapsed)
+    audio = response.audio_content
+    if audio:
+        cache.put(key, audio)
+    return audio
+
+
+def _pack_timed(audio: bytes, marks: dict) -> bytes:
+    meta = json.dumps(marks).encode("utf-8")
+    return struct.pack(">I", len(meta)) + meta + audio
+
+
+def _unpack_timed(packed: bytes):
+    (size,) = struct.unpack(">I", packed[:4])
+    return packed[4 + size:], json.loads(packed[4:4 + size])
+
+
+def synthesize_ssml_with_marks(client, ssml: str, voice, audio_config):
+    """Synthesize SSML and return (audio bytes, {mark name: seconds}).
+
+    Requires a ``texttospeech_v1beta1`` client and message types, the only API
+    version that reports ``<mark>`` timepoints.
+    """
+    from google.cloud import texttospeech_v1beta1
+
+    cache = get_tts_cache()
+    key = cache.make_key(ssml, voice, audio_config, variant="marks")
+    packed = cache.get(key)
+    if packed is not None:
+        cache.record_saving(len(ssml))
+        return _unpack_timed(packed)
+
+    with get_tts_breaker().guard():
+        start = time.perf_counter()
+        TTS_CHARACTERS.inc(len(ssml))
+        with timed("tts"), span("tts", characters=len(ssml)):
+            response = client.synthesize_speech(
+                request=texttospeech_v1beta1.SynthesizeSpeechRequest(
+                    input=texttospeech_v1beta1.SynthesisInput(ssml=ssml),
+                    voice=voice,
+                    audio_config=audio_config,
+                    enable_time_pointing=[
+                        texttospeech_v1beta1.SynthesizeSpeechRequest.TimepointType.SSML_MARK
+                    ],
+                ),
+                **_call_options(),
+            )
+    elapsed = time.perf_counter() - start
+    cache.record_synthesis(elapsed)
+    budget.charge(tts_characters=len(ssml), seconds=elapsed)
+    audio = response.audio_content
+    marks = {tp.mark_name: tp.time_seconds for tp in response.timepoints}
+    if audio:
+        cache.put(key, _pack_timed(audio, marks))
+    return audio, marks
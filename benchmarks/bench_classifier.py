@@ -0,0 +1,97 @@
+"""Compare the director's keyword fast path with the LLM on recorded turns.
+
+Usage:
+    python -m benchmarks.bench_classifier [--transcripts PATH] [--llm]
+
+Each line of the transcripts file is a labelled turn:
+``{"history", "last_scammer", "scam_type", "stage"}``. Without ``--llm`` only
+the fast path is measured (no network); with it, every turn is also sent to
+the director LLM (GROQ_API_KEY required) and the fast-path-then-LLM
+combination is scored.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from app.agents.director_agent import CLASSIFIER, DirectorAgent, _scammer_lines
+
+DEFAULT_TRANSCRIPTS = os.path.join(os.path.dirname(__file__), "data", "director_transcripts.jsonl")
+
+
+def load_transcripts(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _latency(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[int(len(samples) * 0.95)] * 1000,
+        "mean_ms": statistics.mean(samples) * 1000,
+    }
+
+
+def _correct(result: dict, turn: dict) -> bool:
+    return result["scam_type"] == turn["scam_type"] and str(result["stage"]) == turn["stage"]
+
+
+def run(transcripts: list, llm: bool = False) -> dict:
+    fast_results, fast_times = [], []
+    for turn in transcripts:
+        start = time.perf_counter()
+        fast_results.append(CLASSIFIER.classify(turn["last_scammer"], _scammer_lines(turn["history"])))
+        fast_times.append(time.perf_counter() - start)
+
+    answered = [(r, t) for r, t in zip(fast_results, transcripts) if r is not None]
+    report = {
+        "turns": len(transcripts),
+        "fast_path": {
+            "coverage": len(answered) / len(transcripts),
+            "precision": sum(_correct(r, t) for r, t in answered) / len(answered) if answered else 0.0,
+            "type_precision": sum(r["scam_type"] == t["scam_type"] for r, t in answered) / len(answered)
+            if answered else 0.0,
+            "latency": _latency(fast_times),
+        },
+    }
+    if not llm:
+        return report
+
+    director = DirectorAgent(os.environ["GROQ_API_KEY"], fast_path=False)
+    llm_results, llm_times = [], []
+    for turn in transcripts:
+        start = time.perf_counter()
+        llm_results.append(director.update_objective(turn["last_scammer"], turn["history"]))
+        llm_times.append(time.perf_counter() - start)
+
+    combined = [f if f is not None else l for f, l in zip(fast_results, llm_results)]
+    combined_times = [ft if f is not None else ft + lt
+                      for f, ft, lt in zip(fast_results, fast_times, llm_times)]
+    report["llm"] = {
+        "accuracy": sum(_correct(r, t) for r, t in zip(llm_results, transcripts)) / len(transcripts),
+        "latency": _latency(llm_times),
+    }
+    report["fast_path_then_llm"] = {
+        "accuracy": sum(_correct(r, t) for r, t in zip(combined, transcripts)) / len(transcripts),
+        "agreement_with_llm": sum(
+            _correct(f, {"scam_type": l["scam_type"], "stage": str(l["stage"])})
+            for f, l in zip(fast_results, llm_results) if f is not None
+        ) / len(answered) if answered else 0.0,
+        "latency": _latency(combined_times),
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transcripts", default=DEFAULT_TRANSCRIPTS)
+    parser.add_argument("--llm", action="store_true", help="also query the director LLM")
+    args = parser.parse_args()
+    print(json.dumps(run(load_transcripts(args.transcripts), args.llm), indent=2))
+
+
+if __name__ == "__main__":
+    main()
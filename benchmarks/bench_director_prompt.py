@@ -0,0 +1,111 @@
+"""Measure director prompt size (and optionally latency), full catalogue vs
+focused scripts.
+
+Usage:
+    python -m benchmarks.bench_director_prompt [--transcripts PATH] [--llm]
+
+Turns come from the labelled transcripts of ``bench_classifier``. A turn
+with history is treated as having its label already detected (the
+session's ``scam_type``); first turns have no detected type. Tokens are
+counted with tiktoken's cl100k_base when available, else estimated at four
+characters per token. ``--llm`` also times real director calls with each
+prompt (GROQ_API_KEY required).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from app.agents.director_agent import (
+    DIRECTOR_PROMPT, FULL_CATALOGUE, SCAM_SCRIPTS, DirectorAgent,
+    _format_scam_scripts, _render_script, _script_focus,
+)
+from benchmarks.bench_classifier import DEFAULT_TRANSCRIPTS, load_transcripts
+
+
+def _token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return (lambda text: len(encoding.encode(text))), "cl100k_base"
+    except Exception:
+        return (lambda text: len(text) // 4), "chars/4"
+
+
+def _prompt_text(turn: dict, scripts: str) -> str:
+    messages = DIRECTOR_PROMPT.format_messages(
+        last_scammer=turn["last_scammer"],
+        history_summary=turn["history"],
+        script_hint="banque",
+        scam_scripts=scripts,
+    )
+    return "\n".join(m.content for m in messages)
+
+
+def _render_full_each_time() -> str:
+    # What every director call used to do
+    return "\n".join(_render_script(t, s) for t, s in SCAM_SCRIPTS.items())
+
+
+def run(transcripts: list, llm: bool = False) -> dict:
+    count, tokenizer = _token_counter()
+    before, after, focused = [], [], 0
+    for turn in transcripts:
+        scam_type = turn["scam_type"] if turn["history"] else ""
+        focus = _script_focus(turn["last_scammer"], turn["history"], "banque", scam_type)
+        focused += focus is not None
+        before.append(count(_prompt_text(turn, FULL_CATALOGUE)))
+        after.append(count(_prompt_text(turn, _format_scam_scripts(focus))))
+
+    n = 2000
+    start = time.perf_counter()
+    for _ in range(n):
+        _render_full_each_time()
+    render_before = (time.perf_counter() - start) / n
+    start = time.perf_counter()
+    for _ in range(n):
+        _format_scam_scripts(_script_focus(transcripts[0]["last_scammer"], "", "banque", "banque"))
+    render_after = (time.perf_counter() - start) / n
+
+    report = {
+        "turns": len(transcripts),
+        "tokenizer": tokenizer,
+        "focused_share": focused / len(transcripts),
+        "prompt_tokens_before": statistics.mean(before),
+        "prompt_tokens_after": statistics.mean(after),
+        "prompt_token_reduction": 1 - sum(after) / sum(before),
+        "prompt_prep_us_before": render_before * 1e6,
+        "prompt_prep_us_after": render_after * 1e6,
+    }
+    if llm:
+        director = DirectorAgent(os.environ["GROQ_API_KEY"], fast_path=False)
+        timings = {"full": [], "focused": []}
+        for turn in transcripts:
+            scam_type = turn["scam_type"] if turn["history"] else ""
+            focus = _script_focus(turn["last_scammer"], turn["history"], "banque", scam_type)
+            for name, scripts in (("full", FULL_CATALOGUE), ("focused", _format_scam_scripts(focus))):
+                start = time.perf_counter()
+                director.chain.invoke({
+                    "last_scammer": turn["last_scammer"],
+                    "history_summary": turn["history"],
+                    "script_hint": "banque",
+                    "scam_scripts": scripts,
+                })
+                timings[name].append(time.perf_counter() - start)
+        report["director_ms_before"] = statistics.median(timings["full"]) * 1000
+        report["director_ms_after"] = statistics.median(timings["focused"]) * 1000
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transcripts", default=DEFAULT_TRANSCRIPTS)
+    parser.add_argument("--llm", action="store_true", help="also time real director calls")
+    args = parser.parse_args()
+    print(json.dumps(run(load_transcripts(args.transcripts), args.llm), indent=2))
+
+
+if __name__ == "__main__":
+    main()
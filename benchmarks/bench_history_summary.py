@@ -0,0 +1,67 @@
+"""Time VictimAgent.get_history_summary as the conversation grows.
+
+Usage:
+    python -m benchmarks.bench_history_summary [--turns 10,100,500]
+
+Compares the ring buffer of pre-formatted lines with the former approach
+(strip tags and truncate the last messages on every call). No network
+access is needed: the memory budget is disabled so nothing is summarized.
+"""
+
+import argparse
+import json
+import os
+import time
+
+from app.agents.victim_agent import VictimAgent
+
+REPLY = ("Ah, mon compte... [COUGHING_FIT] ...excusez-moi. Attendez, je cherche mes "
+         "lunettes [DOG_BARK] Poupoune, tais-toi ! [PAUSE] Vous disiez, jeune homme ?")
+
+
+def _rescan_summary(agent: VictimAgent, max_turns: int = 5) -> str:
+    # What get_history_summary used to do on every call
+    messages = agent.memory.chat_memory.messages
+    lines = []
+    for msg in messages[-(max_turns * 2):]:
+        role = "Arnaqueur" if msg.type == "human" else "Jeanne"
+        content = agent._TAG_PATTERN.sub("", msg.content).strip()
+        if len(content) > 100:
+            content = content[:100] + "..."
+        lines.append(f"{role}: {content}")
+    return "\n".join(lines)
+
+
+def _per_call_us(fn, n: int = 2000) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def run(turn_counts: list) -> dict:
+    os.environ["MEMORY_TOKEN_BUDGET"] = "0"
+    report = {}
+    for turns in turn_counts:
+        agent = VictimAgent("fake-groq-key")
+        for i in range(turns):
+            agent.memory.save_context({"input": f"Message {i} : donnez-moi votre code."},
+                                      {"output": REPLY})
+        assert agent.get_history_summary() == _rescan_summary(agent)
+        report[str(turns)] = {
+            "rescan_us": _per_call_us(lambda: _rescan_summary(agent)),
+            "ring_buffer_us": _per_call_us(agent.get_history_summary),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", default="10,100,500",
+                        help="comma-separated conversation lengths")
+    args = parser.parse_args()
+    print(json.dumps(run([int(t) for t in args.turns.split(",")]), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark SessionManager.create_session latency and per-session memory.
+
+Usage:
+    python -m benchmarks.bench_session_creation [--sessions 200]
+
+No network access is needed: the LLM clients are constructed with a fake
+key and never called. Set GOOGLE_APPLICATION_CREDENTIALS to include the
+TTS client construction in the measurement.
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+
+from app.api.session_manager import SessionManager
+
+
+def run(n_sessions: int) -> dict:
+    sm = SessionManager("fake-groq-key")
+    sm.create_session()  # warm up imports and any process-wide clients
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    latencies = []
+    session_ids = []
+    for _ in range(n_sessions):
+        start = time.perf_counter()
+        session_ids.append(sm.create_session())
+        latencies.append(time.perf_counter() - start)
+
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    states = [sm.get_state(sid) for sid in session_ids]
+    llm_clients = {
+        id(agent.llm.client)
+        for state in states
+        for agent in (state.victim, state.director, state.scammer)
+    }
+    latencies.sort()
+    return {
+        "sessions": n_sessions,
+        "create_ms_mean": statistics.mean(latencies) * 1000,
+        "create_ms_p50": latencies[len(latencies) // 2] * 1000,
+        "create_ms_p95": latencies[int(len(latencies) * 0.95)] * 1000,
+        "memory_kib_per_session": (after - before) / n_sessions / 1024,
+        "distinct_llm_clients": len(llm_clients),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.sessions), indent=2))
+
+
+if __name__ == "__main__":
+    main()
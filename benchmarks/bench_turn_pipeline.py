@@ -0,0 +1,257 @@
+"""Offline load benchmark of the turn pipeline, plus hot-helper microbenchmarks.
+
+Usage:
+    python -m benchmarks.bench_turn_pipeline [--concurrency 1,4,16] [--requests 40]
+        [--llm-latency 0.2] [--llm-jitter 0.05] [--llm-tail-prob 0.05 --llm-tail-latency 2]
+        [--tts-latency 0.1] [--no-tts]
+        [--output results.json] [--compare baseline.json]
+
+Groq and Google TTS are replaced by the deterministic fakes of
+``benchmarks.fakes``; requests go through the real FastAPI app in process
+(httpx ASGI transport). For each concurrency level, ``--requests`` calls
+are measured on ``/api/chat``, ``/api/auto-conversation/start`` and
+``/api/auto-conversation/next`` (session setup is not timed). Results are
+written as JSON with the commit and the feature flags in effect, so two
+runs can be compared with ``--compare``.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.core import hedging
+from app.core.tts import get_tts_breaker
+from benchmarks.fakes import install_fakes
+
+FLAGS = ["VICTIM_LEAN", "VICTIM_TTS_MODE", "DIRECTOR_STREAMING", "DIRECTOR_PIPELINED",
+         "DIRECTOR_FAST_PATH", "MEMORY_TOKEN_BUDGET", "SESSION_STORE", "SPECULATION",
+         "LLM_HEDGE", "LLM_HEDGE_PERCENTILE", "LLM_HEDGE_BUDGET", "LLM_TIMEOUTS",
+         "TTS_TIMEOUT", "TTS_BREAKER_FAILURES", "TTS_BREAKER_SLOW_SECONDS", "TTS_BREAKER_COOLDOWN"]
+SCAMMER_LINE = "Bonjour madame, ici le service sécurité de votre banque. Donnez-moi le code reçu par SMS."
+
+
+def _app() -> FastAPI:
+    from app.api.routes import router
+    from app.api.session_manager import SessionManager
+    from app.api.speculation import Speculator
+
+    app = FastAPI()
+    app.include_router(router)
+    app.state.session_manager = SessionManager("fake-groq-key")
+    app.state.speculator = Speculator()
+    return app
+
+
+def _percentiles(samples: list) -> dict:
+    samples = sorted(samples)
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 2)
+
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 2)}
+
+
+class _Worker:
+    """One simulated client: owns a session and issues the timed calls."""
+
+    def __init__(self, client: httpx.AsyncClient, endpoint: str):
+        self.client = client
+        self.endpoint = endpoint
+        self.session_id = None
+        self.choice = None
+
+    async def _new_session(self, start: bool = False):
+        self.session_id = (await self.client.post("/api/sessions")).json()["session_id"]
+        self.choice = None
+        if start:
+            await self.client.post("/api/auto-conversation/start", json={"session_id": self.session_id})
+
+    async def request(self) -> httpx.Response:
+        """Prepare untimed state, then return the coroutine to time."""
+        if self.endpoint == "chat":
+            if self.session_id is None:
+                await self._new_session()
+            return self.client.post("/api/chat", json={
+                "session_id": self.session_id, "user_input": SCAMMER_LINE,
+            })
+        if self.endpoint == "auto_start":
+            await self._new_session()
+            return self.client.post("/api/auto-conversation/start", json={"session_id": self.session_id})
+        if self.session_id is None:
+            await self._new_session(start=True)
+        body = {"session_id": self.session_id}
+        if self.choice:
+            body["user_choice"] = self.choice
+        return self.client.post("/api/auto-conversation/next", json=body)
+
+    def after(self, response: httpx.Response) -> None:
+        if self.endpoint != "auto_next" or response.status_code != 200:
+            return
+        data = response.json()
+        self.choice = "4" if data.get("intervention_required") else None
+        if data.get("is_complete"):
+            self.session_id = None
+
+
+async def _load(client, endpoint: str, concurrency: int, requests: int) -> dict:
+    remaining = iter(range(requests))
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        w = _Worker(client, endpoint)
+        for _ in remaining:
+            call = await w.request()
+            start = time.perf_counter()
+            response = await call
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+            w.after(response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    result = _percentiles(latencies)
+    result.update(requests=requests, errors=errors, throughput_rps=round(requests / wall, 2))
+    return result
+
+
+async def run_load(concurrency_levels: list, requests: int) -> dict:
+    results = {"chat": {}, "auto_start": {}, "auto_next": {}}
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for endpoint in results:
+            for c in concurrency_levels:
+                results[endpoint][str(c)] = await _load(client, endpoint, c, requests)
+                print(f"  {endpoint:<10} c={c:<3} {results[endpoint][str(c)]}", file=sys.stderr)
+    return results
+
+
+def _per_op_us(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return round((time.perf_counter() - start) / n * 1e6, 3)
+
+
+def run_micro(n: int = 5000) -> dict:
+    from app.agents.director_agent import DirectorAgent
+    from app.agents.json_stream import JSONObjectStream
+    from app.agents.victim_agent import VictimAgent
+    from benchmarks.fakes import fake_reply
+    from langchain_core.messages import SystemMessage
+
+    victim_reply = fake_reply([SystemMessage(content="Jeanne Dubois")], 1)
+    director_reply = "Voici : " + fake_reply([SystemMessage(content="Directeur de Scénario")], 1)
+    victim = VictimAgent("fake-groq-key", lean=True)
+    for i in range(50):
+        victim.memory.save_context({"input": f"{SCAMMER_LINE} ({i})"}, {"output": victim_reply})
+
+    def stream_parse():
+        parser = JSONObjectStream()
+        for piece in re.findall(r"\S+\s*", director_reply):
+            parser.feed(piece)
+
+    return {
+        "tag_split_us": _per_op_us(lambda: VictimAgent._TAG_PATTERN.split(victim_reply), n),
+        "build_segments_us": _per_op_us(lambda: victim._build_segments(victim_reply), n),
+        "parse_response_us": _per_op_us(lambda: DirectorAgent._parse_response(director_reply), n),
+        "json_stream_parse_us": _per_op_us(stream_parse, n),
+        "history_summary_us": _per_op_us(victim.get_history_summary, n),
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current: dict, baseline: dict) -> list:
+    """Lines 'metric: baseline -> current (ratio)' for every shared metric."""
+    lines = []
+
+    def walk(cur, base, path):
+        for key, value in cur.items():
+            if key not in base:
+                continue
+            if isinstance(value, dict):
+                walk(value, base[key], f"{path}{key}.")
+            elif isinstance(value, (int, float)) and base[key]:
+                lines.append(f"{path}{key}: {base[key]} -> {value} (x{value / base[key]:.2f})")
+
+    walk({k: current[k] for k in ("endpoints", "micro") if k in current}, baseline, "")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=40, help="timed calls per endpoint and level")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-jitter", type=float, default=0.05)
+    parser.add_argument("--llm-tail-prob", type=float, default=0.0,
+                        help="fraction of LLM calls delayed by --llm-tail-latency")
+    parser.add_argument("--llm-tail-latency", type=float, default=0.0)
+    parser.add_argument("--tts-latency", type=float, default=0.1)
+    parser.add_argument("--tts-jitter", type=float, default=0.02)
+    parser.add_argument("--no-tts", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--micro-iterations", type=int, default=5000)
+    parser.add_argument("--skip-load", action="store_true", help="microbenchmarks only")
+    parser.add_argument("--output", "-o", help="JSON file (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON result to compare with")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "fake-groq-key")
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+            "flags": {name: os.getenv(name) for name in FLAGS if os.getenv(name) is not None},
+        },
+    }
+    with install_fakes(args.llm_latency, args.llm_jitter,
+                       None if args.no_tts else args.tts_latency, args.tts_jitter, args.seed,
+                       args.llm_tail_prob, args.llm_tail_latency), \
+            contextlib.redirect_stdout(io.StringIO()):  # executor verbose logging
+        report["micro"] = run_micro(args.micro_iterations)
+        if not args.skip_load:
+            levels = [int(c) for c in args.concurrency.split(",")]
+            report["endpoints"] = asyncio.run(run_load(levels, args.requests))
+        if hedging.enabled():
+            report["hedging"] = dict(hedging.get_guard().stats)
+        if not args.no_tts:
+            report["tts_breaker"] = get_tts_breaker().stats
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare(report, json.load(f))), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Per-turn overhead of the victim's AgentExecutor path vs the lean chain.
+
+Usage:
+    python -m benchmarks.bench_victim_overhead [--turns 50]
+
+The LLM is a stub answering instantly, so the timings are pure framework
+overhead: prompt formatting, agent plumbing, callbacks and memory. TTS is
+disabled. Stdout from the executor's verbose logging is discarded but its
+cost is included.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.agents.victim_agent import VictimAgent
+
+REPLY = "Ah, mon compte... [COUGHING_FIT] ...excusez-moi. [PAUSE] Vous disiez, jeune homme ?"
+
+
+def _agent(lean: bool) -> VictimAgent:
+    llm = FakeListChatModel(responses=[REPLY])
+    with patch("app.agents.victim_agent.get_chat_model", return_value=llm), \
+         patch("app.agents.victim_agent.get_tts_client", return_value=None):
+        return VictimAgent("fake-groq-key", lean=lean)
+
+
+def _time_turns(lean: bool, turns: int) -> list:
+    agent = _agent(lean)
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(turns):
+            start = time.perf_counter()
+            agent.respond_web(f"Message {i} : donnez-moi votre code.", "Gagner du temps", "None")
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _stats(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "mean_ms": statistics.mean(samples) * 1000,
+    }
+
+
+def run(turns: int) -> dict:
+    os.environ.setdefault("MEMORY_TOKEN_BUDGET", "0")  # no summarizer calls
+    _time_turns(True, 3)  # warm up imports
+    executor = _stats(_time_turns(False, turns))
+    lean = _stats(_time_turns(True, turns))
+    return {
+        "turns": turns,
+        "executor": executor,
+        "lean": lean,
+        "overhead_reduction": 1 - lean["mean_ms"] / executor["mean_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.turns), indent=2))
+
+
+if __name__ == "__main__":
+    main()
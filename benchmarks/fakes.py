@@ -0,0 +1,190 @@
+"""Deterministic stand-ins for Groq and Google TTS, with simulated latency.
+
+``install_fakes`` patches the agents' client getters, so sessions created
+afterwards talk to ``FakeChatModel`` and ``FakeTTSClient`` instead of the
+network. Latencies are drawn from a seeded normal distribution
+(``latency`` ± ``jitter`` seconds, never negative), plus ``tail_latency``
+for a ``tail_prob`` fraction of the LLM calls (a slow replica). With
+LLM_HEDGE or LLM_TIMEOUTS set, the fake models are guarded like ChatGroq.
+"""
+
+import asyncio
+import contextlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from unittest.mock import patch
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+
+from app.core import hedging
+from app.core.hedging import HedgedCalls
+
+STAGES = ["1", "2", "3", "4"]
+
+
+class _Latency:
+    def __init__(self, latency: float, jitter: float, seed: int,
+                 tail_prob: float = 0.0, tail_latency: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_prob = tail_prob
+        self.tail_latency = tail_latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> float:
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter))
+            if self.tail_prob and self._rng.random() < self.tail_prob:
+                delay += self.tail_latency
+            return delay
+
+
+def fake_reply(messages: List[BaseMessage], n: int) -> str:
+    """Canned completion for the agent whose system prompt is in ``messages``."""
+    system = messages[0].content if messages and messages[0].type == "system" else ""
+    if "Directeur de Scénario" in system:
+        stage = STAGES[n % len(STAGES)]
+        return json.dumps({
+            "scam_type": "banque",
+            "stage": stage,
+            "new_objective": f"Gagner du temps, diversion n°{n}.",
+            "stage_description": f"stade {stage}",
+        }, ensure_ascii=False)
+    if "Jeanne Dubois" in system:
+        return (f"Ah, mon compte... [COUGHING_FIT] ...excusez-moi. Attendez [DOG_BARK] "
+                f"Poupoune, tais-toi ! [PAUSE] Vous disiez, jeune homme ? ({n})")
+    if "Tu résumes" in system:
+        return f"Un faux conseiller bancaire réclame des codes ({n})."
+    return f"Madame, c'est urgent, votre compte va être bloqué. Donnez-moi le code reçu (réf. {n})."
+
+
+class FakeChatModel(BaseChatModel):
+    """ChatGroq stand-in answering like the director, victim, scammer or
+    memory summarizer depending on the system prompt."""
+
+    latency: float = 0.3
+    jitter: float = 0.05
+    tail_prob: float = 0.0
+    tail_latency: float = 0.0
+    seed: int = 0
+    _latency: Any = PrivateAttr()
+    _counter: Any = PrivateAttr()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._latency = _Latency(self.latency, self.jitter, self.seed,
+                                 self.tail_prob, self.tail_latency)
+        self._counter = itertools.count()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-groq"
+
+    def _reply(self, messages) -> str:
+        return fake_reply(messages, next(self._counter))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._latency.draw())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._latency.draw())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    @staticmethod
+    def _pieces(text: str) -> List[str]:
+        return re.findall(r"\S+\s*", text) or [text]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        # Half the latency before the first token, the rest spread over the tokens
+        delay = self._latency.draw()
+        pieces = self._pieces(self._reply(messages))
+        time.sleep(delay / 2)
+        for piece in pieces:
+            time.sleep(delay / 2 / len(pieces))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(self, messages, stop=None, run_manager=None,
+                       **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        delay = self._latency.draw()
+        pieces = self._pieces(self._reply(messages))
+        await asyncio.sleep(delay / 2)
+        for piece in pieces:
+            await asyncio.sleep(delay / 2 / len(pieces))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+
+class GuardedFakeChatModel(HedgedCalls, FakeChatModel):
+    """FakeChatModel with the timeouts and hedging of app.core.hedging."""
+
+
+# One MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, no padding (417 bytes, ~26 ms)
+_MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+_FRAME_SECONDS = 1152 / 44100
+_MARK = re.compile(r'<mark name="([^"]+)"/>')
+_TAGS = re.compile(r"<[^>]+>")
+
+
+class FakeTTSClient:
+    """TextToSpeechClient stand-in (v1 and v1beta1) returning silent MP3
+    frames, about 60 ms of audio per character, and evenly spaced
+    ``<mark>`` timepoints. Blocks like the real client (it runs in threads)."""
+
+    def __init__(self, latency: float = 0.15, jitter: float = 0.03, seed: int = 0):
+        self._latency = _Latency(latency, jitter, seed)
+        self.calls = 0
+
+    def synthesize_speech(self, request=None, input=None, voice=None, audio_config=None, timeout=None):
+        self.calls += 1
+        ssml = (request.input if request is not None else input).ssml
+        time.sleep(self._latency.draw())
+        text = _TAGS.sub("", ssml)
+        frames = max(1, int(len(text) * 0.06 / _FRAME_SECONDS))
+        marks = _MARK.findall(ssml)
+        duration = frames * _FRAME_SECONDS
+        timepoints = [SimpleNamespace(mark_name=name, time_seconds=duration * i / max(1, len(marks) - 1))
+                      for i, name in enumerate(marks)]
+        return SimpleNamespace(audio_content=_MP3_FRAME * frames, timepoints=timepoints)
+
+
+@contextlib.contextmanager
+def install_fakes(llm_latency: float = 0.3, llm_jitter: float = 0.05,
+                  tts_latency: Optional[float] = 0.15, tts_jitter: float = 0.03, seed: int = 0,
+                  llm_tail_prob: float = 0.0, llm_tail_latency: float = 0.0):
+    """Route every agent created inside the block to the fakes.
+
+    One fake model per temperature, like the shared ChatGroq clients.
+    ``tts_latency=None`` disables TTS (no client, as without credentials).
+    Yields ``{"models": {...}, "tts": FakeTTSClient or None}``.
+    """
+    models = {}
+    lock = threading.Lock()
+    model_class = GuardedFakeChatModel if hedging.enabled() else FakeChatModel
+
+    def get_chat_model(api_key, temperature):
+        with lock:
+            if temperature not in models:
+                models[temperature] = model_class(
+                    latency=llm_latency, jitter=llm_jitter, seed=seed + len(models),
+                    tail_prob=llm_tail_prob, tail_latency=llm_tail_latency)
+            return models[temperature]
+
+    tts = FakeTTSClient(tts_latency, tts_jitter, seed) if tts_latency is not None else None
+    targets = ["app.agents.victim_agent", "app.agents.director_agent", "app.agents.scammer_agent"]
+    with contextlib.ExitStack() as stack:
+        for module in targets:
+            stack.enter_context(patch(f"{module}.get_chat_model", get_chat_model))
+        for module in ("app.agents.victim_agent", "app.agents.scammer_agent"):
+            stack.enter_context(patch(f"{module}.get_tts_client", lambda: tts))
+        stack.enter_context(patch("app.agents.victim_agent.get_tts_beta_client", lambda: tts))
+        yield {"models": models, "tts": tts}
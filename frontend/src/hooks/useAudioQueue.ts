@@ -26,6 +26,8 @@ export function useAudioQueue() {
         await new Promise((r) => setTimeout(r, (seg.duration ?? 1.5) * 1000));
       } else if (seg.type === "sound" && seg.sound_file) {
         await playUrl(`http://localhost:8000${seg.sound_file}`);
+      } else if (seg.type === "text" && seg.tts_url) {
+        await playUrl(`http://localhost:8000${seg.tts_url}`);
       } else if (seg.type === "text" && seg.tts_audio) {
         const blob = base64ToBlob(seg.tts_audio);
         const url = URL.createObjectURL(blob);
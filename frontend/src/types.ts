@@ -4,6 +4,7 @@ export interface Segment {
   sound_tag?: string;
   sound_file?: string;
   tts_audio?: string;
+  tts_url?: string;
   duration?: number;
 }
 
@@ -31,6 +32,8 @@ export interface DirectorInfo {
   stage: string;
   stage_description: string;
   objective_used: string;
+  next_objective?: string;
+  pipelined?: boolean;
 }
 
 export interface InterventionRequired {
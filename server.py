@@ -1,15 +1,41 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from app.api.routes import router
 from app.api.session_manager import SessionManager
+from app.api.session_store import StaleSession
+from app.api.speculation import Speculator
+from app.core import metrics, scheduler, tracing
+from app.core.circuit_breaker import STATE_VALUES
+from app.core.hedging import LLMTimeout
+from app.core.audio_store import get_audio_store
+from app.core.tts import get_tts_breaker, get_tts_cache
 from app.core.config import load_config
 
 api_key = load_config()
 
-app = FastAPI(title="Langchain Scamming Protector")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background reaper for idle sessions
+    reaper = asyncio.create_task(app.state.session_manager.run_reaper())
+    yield
+    reaper.cancel()
+    # Flush queued trace spans (TRACE_DIR)
+    await asyncio.to_thread(tracing.shutdown)
+    # Keep the in-memory audio on disk across restarts
+    await asyncio.to_thread(get_audio_store().flush)
+    await asyncio.to_thread(get_tts_cache().flush)
+
+
+app = FastAPI(title="Langchain Scamming Protector", lifespan=lifespan)
+
+# Per-request stage durations in a Server-Timing header
+app.add_middleware(metrics.ServerTimingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
@@ -22,5 +48,34 @@ app.mount("/static/sounds", StaticFiles(directory=sounds_dir), name="sounds")
 
 session_manager = SessionManager(api_key)
 app.state.session_manager = session_manager
+app.state.speculator = Speculator()
 
 app.include_router(router)
+
+
+@app.exception_handler(LLMTimeout)
+async def llm_timeout(request, exc: LLMTimeout):
+    """A victim or scammer call over its hard timeout (LLM_TIMEOUTS)."""
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.exception_handler(StaleSession)
+async def stale_session(request, exc: StaleSession):
+    """Another worker finished a turn of this session first: retry."""
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    gauges = {
+        "scam_sessions_active": app.state.session_manager.stats["active"],
+        "scam_speculation_inflight": app.state.speculator.stats["inflight"],
+    }
+    if scheduler.enabled():
+        gauges["scam_groq_queue_depth"] = scheduler.get_scheduler().stats["queued"]
+    gauges["scam_tts_breaker_state"] = STATE_VALUES[get_tts_breaker().state]
+    writer = tracing.get_writer()
+    if writer is not None:
+        gauges["scam_trace_spans_dropped"] = writer.dropped
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,194 @@
+"""Headless batch of scammer-vs-Jeanne auto-conversations.
+
+Usage:
+    python simulate.py --conversations 100 [--concurrency 10] [--max-turns 15]
+                       [--choices random|4,2,1] [--seed 0] [--tts]
+                       [--output transcripts.jsonl]
+
+Each conversation runs like /auto-conversation: the scammer's opening,
+then director, victim and scammer turns up to ``--max-turns``. When an
+intervention is due the choice is either random (seeded per conversation)
+or taken in turn from a scripted list (``1`` hang up, ``2`` fake card
+number, ``3`` heart attack, ``4`` continue). Finished transcripts are
+written as one JSON line each, with per-stage timings, as soon as they
+complete; a summary goes to stderr. TTS is off unless ``--tts`` is given.
+The victim runs on its lean path, without the executor's verbose logging,
+and the agents' diagnostics go to stderr: stdout only carries the JSONL.
+Each conversation gets its own session id for tracing and for the
+scheduler's per-session fair queuing.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+# pygame (sound tools) prints its banner to stdout on import
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from app.agents.director_agent import DirectorAgent
+from app.agents.scammer_agent import ScammerAgent
+from app.agents.victim_agent import VictimAgent
+from app.api import turns
+from app.api.turns import INTERVENTION_CONSTRAINTS
+from app.api.session_manager import SessionState
+from app.core import tracing
+from app.core.config import load_config
+
+
+def choice_picker(choices: str, seed: int):
+    """Function returning the next intervention choice of a conversation."""
+    if choices == "random":
+        rng = random.Random(seed)
+        options = sorted(INTERVENTION_CONSTRAINTS)
+        return lambda: rng.choice(options)
+    script = choices.split(",")
+    unknown = set(script) - set(INTERVENTION_CONSTRAINTS)
+    if unknown:
+        raise ValueError(f"Unknown intervention choice(s): {', '.join(sorted(unknown))}")
+    script = itertools.cycle(script)
+    return lambda: next(script)
+
+
+def new_state(api_key: str, max_turns: int, tts: bool = False) -> SessionState:
+    state = SessionState(
+        victim=VictimAgent(api_key, lean=True),
+        director=DirectorAgent(api_key),
+        scammer=ScammerAgent(api_key),
+        max_turns=max_turns,
+    )
+    if not tts:
+        state.victim.tts_client = None
+        state.victim.tts_beta_client = None
+        state.scammer.tts_client = None
+    return state
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+async def simulate_conversation(state: SessionState, pick_choice, pipelined=None,
+                                session_id: str = "simulate") -> dict:
+    """Run one conversation to its end. Returns the transcript.
+
+    Turns go through ``app.api.turns.auto_turn`` like /auto-conversation/next;
+    ``pipelined`` defaults to DIRECTOR_PIPELINED. Spans are bound to
+    ``session_id`` and the turn, as the routes do."""
+    if pipelined is None:
+        pipelined = turns.pipelined_default()
+    started = time.perf_counter()
+    state.is_active = True
+    tracing.bind(session_id, 0)
+    start = time.perf_counter()
+    _, opening = await state.scammer.agenerate_opening()
+    transcript = {"opening": opening, "opening_ms": _ms(start), "turns": []}
+    last_scammer = opening
+
+    while state.is_active and state.turn_count < state.max_turns:
+        turn = {"turn": state.turn_count + 1, "scammer": last_scammer}
+        tracing.bind(session_id, turn["turn"])
+        choice = pick_choice() if state.pending_intervention else None
+        if choice is not None:
+            turn["choice"] = choice
+        constraint, should_terminate = turns.apply_choice(state, choice)
+
+        result = await turns.auto_turn(state, constraint, should_terminate, last_scammer,
+                                       pipelined, user_choice=choice)
+        turn["director"] = {
+            "scam_type": state.scam_type,
+            "stage": state.stage,
+            "stage_description": state.stage_description,
+            "objective": state.current_objective,
+        }
+        turn["victim"] = result.victim_text
+        turn["timings"] = result.timings
+        if "scammer_ms" in result.timings:
+            last_scammer = result.scammer_text
+            turn["next_scammer"] = last_scammer
+        transcript["turns"].append(turn)
+
+    transcript["hung_up"] = any(t.get("choice") == "1" for t in transcript["turns"])
+    transcript["total_ms"] = _ms(started)
+    return transcript
+
+
+async def run(n: int, make_state, make_picker, out, concurrency: int = 10) -> dict:
+    """Run ``n`` conversations, at most ``concurrency`` at a time, writing
+    each transcript to ``out`` as it finishes. Returns a summary."""
+    semaphore = asyncio.Semaphore(concurrency)
+    stages = {"opening_ms": [], "director_ms": [], "victim_ms": [], "scammer_ms": []}
+    summary = {"conversations": n, "errors": 0, "turns": 0}
+
+    async def one(i: int):
+        async with semaphore:
+            record = {"id": i, "session_id": str(uuid.uuid4())}
+            try:
+                record.update(await simulate_conversation(
+                    make_state(), make_picker(i), session_id=record["session_id"]
+                ))
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                summary["errors"] += 1
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        if "error" in record:
+            return
+        stages["opening_ms"].append(record["opening_ms"])
+        summary["turns"] += len(record["turns"])
+        for turn in record["turns"]:
+            for stage, ms in turn["timings"].items():
+                stages.setdefault(stage, []).append(ms)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    summary["wall_s"] = round(time.perf_counter() - start, 2)
+    for stage, samples in stages.items():
+        if samples:
+            samples.sort()
+            summary[stage] = {
+                "p50": samples[len(samples) // 2],
+                "p95": samples[int(len(samples) * 0.95)],
+            }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", "-n", type=int, default=10)
+    parser.add_argument("--concurrency", "-c", type=int, default=10)
+    parser.add_argument("--max-turns", type=int, default=15)
+    parser.add_argument("--choices", default="random",
+                        help="'random' or a comma-separated script of choices (1-4)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tts", action="store_true", help="also synthesize audio")
+    parser.add_argument("--output", "-o", help="JSONL file (default: stdout)")
+    args = parser.parse_args()
+
+    api_key = load_config()
+    choice_picker(args.choices, args.seed)  # validate before starting
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        # Agents print diagnostics (TTS init, memory warnings): keep them off the JSONL
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = asyncio.run(run(
+                args.conversations,
+                lambda: new_state(api_key, args.max_turns, args.tts),
+                lambda i: choice_picker(args.choices, args.seed + i),
+                out,
+                concurrency=args.concurrency,
+            ))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
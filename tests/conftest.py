@@ -32,3 +32,31 @@ def mock_no_google_credentials(monkeypatch):
     """Ensure no Google credentials are set."""
     monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS", raising=False)
     monkeypatch.delenv("GOOGLE_CREDENTIALS", raising=False)
+
+
+@pytest.fixture(autouse=True)
+def reset_tts_cache():
+    """Start every test with an empty process-wide TTS cache and a closed
+    TTS circuit breaker."""
+    from app.core.tts import get_tts_cache, reset_tts_breaker
+    get_tts_cache().clear()
+    reset_tts_breaker()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def audio_store(monkeypatch):
+    """Give every test a fresh, memory-only audio store."""
+    from app.core import audio_store as audio_store_module
+    store = audio_store_module.AudioStore(disk_dir=None)
+    monkeypatch.setattr(audio_store_module, "_store", store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_clients():
+    """Drop the process-wide LLM/TTS clients so patches and env apply."""
+    from app.core.clients import reset_clients
+    reset_clients()
+    yield
+    reset_clients()
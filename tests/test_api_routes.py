@@ -1,7 +1,16 @@
-from unittest.mock import patch, MagicMock
+import asyncio
+import json
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 
+from app.core import budget
+from app.core.budget import BudgetPolicy, new_usage
+from app.core.hedging import LLMTimeout
+
 
 def _make_mock_state():
     """Create a mock SessionState with victim and director."""
@@ -14,13 +23,17 @@ def _make_mock_state():
     state.stage = "1"
     state.stage_description = ""
     state.script_hint = "banque"
+    state.responses = {}
+    state.usage = new_usage()
+    state.remember_response.side_effect = state.responses.__setitem__
+    state.victim.arespond_web = AsyncMock()
     # Director returns valid result by default
-    state.director.update_objective.return_value = {
+    state.director.aupdate_objective = AsyncMock(return_value={
         "scam_type": "banque",
         "stage": "1",
         "stage_description": "approche",
         "new_objective": "Poser des questions.",
-    }
+    })
     # Victim history summary
     state.victim.get_history_summary.return_value = "Aucun historique"
     return state
@@ -72,6 +85,11 @@ def client():
         mock_sm.delete.side_effect = delete
         mock_sm.get_turn_count.side_effect = get_turn_count
         mock_sm.increment_turn.side_effect = lambda sid: None
+        mock_sm.is_evicted.side_effect = lambda sid: sid == "evicted-session"
+        mock_sm.stats = {"active": len(states)}
+        mock_sm.budget = BudgetPolicy(session_limits={}, global_limits={})
+        locks = {}
+        mock_sm.lock.side_effect = lambda sid: locks.setdefault(sid, asyncio.Lock())
 
         from server import app
         app.state.session_manager = mock_sm
@@ -111,13 +129,29 @@ class TestSessionEndpoints:
         assert res.status_code == 404
 
 
+    def test_get_evicted_session_returns_410(self, client):
+        c, _ = client
+        res = c.get("/api/sessions/evicted-session")
+        assert res.status_code == 410
+
+    def test_stats(self, client):
+        c, _ = client
+        res = c.get("/api/stats")
+        assert res.status_code == 200
+        body = res.json()
+        assert "sessions" in body
+        for name in ("hits", "misses", "evictions", "hit_ratio"):
+            assert name in body["tts_cache"]
+            assert name in body["audio_store"]
+
+
 class TestChatEndpoint:
     def test_chat_success(self, client):
         c, states = client
         c.post("/api/sessions")
 
         state = states["test-session-123"]
-        state.victim.respond_web.return_value = (
+        state.victim.arespond_web.return_value = (
             [{"type": "text", "content": "Bonjour mon petit"}],
             "Bonjour mon petit",
         )
@@ -143,12 +177,20 @@ class TestChatEndpoint:
         })
         assert res.status_code == 404
 
+    def test_chat_evicted_session(self, client):
+        c, _ = client
+        res = c.post("/api/chat", json={
+            "session_id": "evicted-session",
+            "user_input": "Hello",
+        })
+        assert res.status_code == 410
+
     def test_chat_calls_director_before_victim(self, client):
         c, states = client
         c.post("/api/sessions")
 
         state = states["test-session-123"]
-        state.victim.respond_web.return_value = (
+        state.victim.arespond_web.return_value = (
             [{"type": "text", "content": "Oui ?"}],
             "Oui ?",
         )
@@ -159,8 +201,806 @@ class TestChatEndpoint:
         })
 
         # Director was called
-        state.director.update_objective.assert_called_once()
+        state.director.aupdate_objective.assert_awaited_once()
         # Victim was called with director's objective
-        state.victim.respond_web.assert_called_once()
-        call_kwargs = state.victim.respond_web.call_args
+        state.victim.arespond_web.assert_awaited_once()
+        call_kwargs = state.victim.arespond_web.call_args
         assert call_kwargs[1]["objective"] == "Poser des questions."
+
+
+class TestConcurrency:
+    def test_get_session_stays_fast_while_turn_runs(self, client):
+        c, states = client
+        c.post("/api/sessions")
+
+        state = states["test-session-123"]
+
+        async def slow_respond(**kwargs):
+            await asyncio.sleep(0.5)
+            return [{"type": "text", "content": "Oui ?"}], "Oui ?"
+
+        state.victim.arespond_web.side_effect = slow_respond
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=c.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                turn = asyncio.create_task(ac.post("/api/chat", json={
+                    "session_id": "test-session-123",
+                    "user_input": "Bonjour Jeanne",
+                }))
+                await asyncio.sleep(0.05)
+                start = time.perf_counter()
+                info = await ac.get("/api/sessions/test-session-123")
+                elapsed = time.perf_counter() - start
+                turn_running = not turn.done()
+                turn_res = await turn
+            return info, elapsed, turn_running, turn_res
+
+        info, elapsed, turn_running, turn_res = asyncio.run(scenario())
+        assert info.status_code == 200
+        assert turn_running
+        assert elapsed < 0.2
+        assert turn_res.status_code == 200
+
+
+class TestScammerTimeout:
+    def _session(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        state.is_active = True
+        state.max_turns = 15
+        state.turn_count = 2
+        state.pending_intervention = True
+        state.scammer.memory.chat_memory.messages = []
+        state.victim.arespond_web.return_value = ([], "Oui ?")
+        state.victim.agenerate = AsyncMock(return_value=([], "Oui ?"))
+        state.victim.aiter_audio = MagicMock(return_value=_no_audio())
+        state.scammer.arespond_web = AsyncMock(side_effect=LLMTimeout("scammer_llm", 8))
+        return c, state
+
+    def _assert_rolled_back(self, state):
+        assert state.turn_count == 2
+        assert state.pending_intervention is True
+        assert state.responses == {}
+        state.victim.load_memory.assert_called_with(state.victim.dump_memory.return_value)
+        state.scammer.load_memory.assert_called_with(state.scammer.dump_memory.return_value)
+
+    def test_timeout_leaves_no_half_applied_turn(self, client):
+        c, state = self._session(client)
+        payload = {"session_id": "test-session-123", "user_choice": "4", "idempotency_key": "t3"}
+        res = c.post("/api/auto-conversation/next", json=payload)
+        assert res.status_code == 504
+        self._assert_rolled_back(state)
+
+        state.scammer.arespond_web = AsyncMock(return_value=([], "Votre code ?"))
+        res = c.post("/api/auto-conversation/next", json=payload)
+        assert res.json()["turn_number"] == 3
+        assert res.json()["scammer_text"] == "Votre code ?"
+
+    def test_stream_reports_timeout_and_rolls_back(self, client):
+        c, state = self._session(client)
+        res = c.post("/api/auto-conversation/next/stream",
+                     json={"session_id": "test-session-123", "user_choice": "4"})
+        events = _parse_sse(res.text)
+        assert events[-1][0] == "error"
+        assert events[-1][2]["status_code"] == 504
+        self._assert_rolled_back(state)
+
+    def test_chat_stream_reports_victim_timeout_and_rolls_back(self, client):
+        c, state = self._session(client)
+        state.victim.agenerate = AsyncMock(side_effect=LLMTimeout("victim_llm", 8))
+        res = c.post("/api/chat/stream",
+                     json={"session_id": "test-session-123", "user_input": "Allô ?"})
+        events = _parse_sse(res.text)
+        assert [e[0] for e in events] == ["director", "error"]
+        assert events[-1][2]["status_code"] == 504
+        assert state.scam_type == "inconnu"
+        assert state.current_objective == "Répondre lentement."
+        self._assert_rolled_back(state)
+
+
+async def _no_audio():
+    return
+    yield
+
+
+class TestTurnSerialization:
+    def _slow_victim(self, state):
+        running = {"now": 0, "max": 0}
+
+        async def slow_respond(**kwargs):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.1)
+            running["now"] -= 1
+            return [{"type": "text", "content": "Oui ?"}], "Oui ?"
+
+        state.victim.arespond_web.side_effect = slow_respond
+        return running
+
+    def _post_twice(self, c, url, payload):
+        async def scenario():
+            transport = httpx.ASGITransport(app=c.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                return await asyncio.gather(ac.post(url, json=payload), ac.post(url, json=payload))
+
+        return asyncio.run(scenario())
+
+    def test_overlapping_turns_run_one_at_a_time(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        running = self._slow_victim(state)
+
+        first, second = self._post_twice(c, "/api/chat", {
+            "session_id": "test-session-123", "user_input": "Bonjour",
+        })
+        assert first.status_code == second.status_code == 200
+        assert running["max"] == 1
+        assert state.turn_count == 2
+
+    def test_retry_with_same_key_replays_the_response(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        self._slow_victim(state)
+
+        first, second = self._post_twice(c, "/api/chat", {
+            "session_id": "test-session-123", "user_input": "Bonjour", "idempotency_key": "k1",
+        })
+        assert first.json() == second.json()
+        assert state.victim.arespond_web.await_count == 1
+        assert state.director.aupdate_objective.await_count == 1
+        assert state.turn_count == 1
+
+    def test_auto_next_retry_does_not_count_a_second_turn(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        state.is_active = True
+        state.max_turns = 15
+        state.pending_intervention = False
+        state.scammer.memory.chat_memory.messages = []
+        state.scammer.arespond_web = AsyncMock(return_value=([], "Allô ?"))
+        self._slow_victim(state)
+
+        first, second = self._post_twice(c, "/api/auto-conversation/next", {
+            "session_id": "test-session-123", "idempotency_key": "turn-1",
+        })
+        assert first.json() == second.json()
+        assert first.json()["turn_number"] == 1
+        assert state.turn_count == 1
+        assert state.scammer.arespond_web.await_count == 1
+
+    def test_double_start_with_same_key_opens_once(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        opened = {"count": 0}
+
+        async def slow_opening():
+            opened["count"] += 1
+            await asyncio.sleep(0.05)
+            return [{"type": "text", "content": "Allô madame ?"}], "Allô madame ?"
+
+        state.scammer.agenerate_opening = AsyncMock(side_effect=slow_opening)
+        first, second = self._post_twice(c, "/api/auto-conversation/start", {
+            "session_id": "test-session-123", "idempotency_key": "start-1",
+        })
+        assert first.json() == second.json()
+        assert opened["count"] == 1
+
+    def test_stop_waits_for_the_running_turn(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        state.is_active = True
+        state.max_turns = 15
+        state.pending_intervention = False
+        state.scammer.memory.chat_memory.messages = []
+        state.scammer.arespond_web = AsyncMock(return_value=([], "Allô ?"))
+        self._slow_victim(state)
+        from server import app
+        saves = []
+        app.state.session_manager.save.side_effect = (
+            lambda sid, st: saves.append((st.is_active, st.turn_count)))
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=c.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                async def stop_later():
+                    await asyncio.sleep(0.02)
+                    return await ac.post("/api/auto-conversation/stop",
+                                         json={"session_id": "test-session-123"})
+                return await asyncio.gather(
+                    ac.post("/api/auto-conversation/next", json={"session_id": "test-session-123"}),
+                    stop_later())
+
+        turn, stop = asyncio.run(scenario())
+        assert turn.status_code == stop.status_code == 200
+        assert (False, 0) not in saves
+        assert saves[-1] == (False, 1)
+
+    def test_turn_overtaken_by_another_worker_gets_409(self, client):
+        from app.api.session_store import StaleSession
+        from server import app
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        state.victim.arespond_web.return_value = ([], "Oui ?")
+        _stream_victim(state, [], "Oui ?")
+        app.state.session_manager.save.side_effect = StaleSession("test-session-123")
+
+        payload = {"session_id": "test-session-123", "user_input": "Allô"}
+        assert c.post("/api/chat", json=payload).status_code == 409
+        events = _parse_sse(c.post("/api/chat/stream", json=payload).text)
+        assert events[-1][0] == "error"
+        assert events[-1][2]["status_code"] == 409
+
+    def test_stream_retry_replays_cached_turn(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        _stream_victim(state, [{"type": "text", "content": "Oui ?"}], "Oui ?")
+        payload = {"session_id": "test-session-123", "user_input": "Bonjour",
+                   "idempotency_key": "k1"}
+
+        first = _parse_sse(c.post("/api/chat/stream", json=payload).text)
+        second = _parse_sse(c.post("/api/chat/stream", json=payload).text)
+
+        assert state.victim.agenerate.await_count == 1
+        assert [e[0] for e in second] == ["director", "segment", "segment_audio", "done"]
+        assert second[-1][2]["victim_text"] == first[-1][2]["victim_text"] == "Oui ?"
+        assert second[-1][2]["turn_number"] == 1
+
+    def test_plain_chat_retry_is_not_cached_under_another_key(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        self._slow_victim(state)
+        for key in ("a", "b"):
+            c.post("/api/chat", json={
+                "session_id": "test-session-123", "user_input": "Bonjour", "idempotency_key": key,
+            })
+        assert state.victim.arespond_web.await_count == 2
+        assert set(state.responses) == {"chat:a", "chat:b"}
+
+
+class TestSpeculation:
+    def test_intervention_choice_commits_speculated_reply(self, client):
+        from app.api.speculation import Speculator
+
+        c, states = client
+        c.app.state.speculator = speculator = Speculator(enabled=True)
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        state.is_active = True
+        state.max_turns = 15
+        state.turn_count = 1
+        state.pending_intervention = False
+        scammer_msg = MagicMock(content="Donnez-moi votre code.")
+        state.scammer.memory.chat_memory.messages = [scammer_msg]
+        state.victim.arespond_web = AsyncMock(return_value=([], "Euh..."))
+        state.scammer.arespond_web = AsyncMock(return_value=([], "Merci madame."))
+
+        fork = MagicMock()
+        fork.arespond_web = AsyncMock(return_value=([{"type": "text", "content": "4970..."}], "4970..."))
+        fork.dump_memory.return_value = {"messages": []}
+        state.victim.fork.return_value = fork
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=c.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                offered = await ac.post("/api/auto-conversation/next", json={
+                    "session_id": "test-session-123",
+                })
+                chosen = await ac.post("/api/auto-conversation/next", json={
+                    "session_id": "test-session-123", "user_choice": "2",
+                })
+            return offered, chosen
+
+        try:
+            offered, chosen = asyncio.run(scenario())
+        finally:
+            c.app.state.speculator = Speculator(enabled=False)
+
+        assert offered.json()["intervention_required"] is not None
+        assert chosen.json()["victim_text"] == "4970..."
+        assert state.victim.arespond_web.await_count == 1  # only the first turn
+        state.victim.load_memory.assert_called_once_with({"messages": []})
+        assert speculator.stats["hits"] == 1
+        assert speculator.stats["branches"] == 4
+
+
+class TestPipelinedDirector:
+    def _slow_turn(self, state, delay=0.2):
+        async def slow_director(**kwargs):
+            await asyncio.sleep(delay)
+            return {"scam_type": "banque", "stage": "3", "stage_description": "code",
+                    "new_objective": "Confondre avec le digicode."}
+
+        async def slow_respond(**kwargs):
+            await asyncio.sleep(delay)
+            return [{"type": "text", "content": "Oui ?"}], "Oui ?"
+
+        state.director.aupdate_objective = AsyncMock(side_effect=slow_director)
+        state.victim.arespond_web = AsyncMock(side_effect=slow_respond)
+
+    def test_chat_runs_director_alongside_victim(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        self._slow_turn(state)
+
+        start = time.perf_counter()
+        res = c.post("/api/chat", json={
+            "session_id": "test-session-123", "user_input": "Votre code ?", "pipelined": True,
+        })
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.35
+        info = res.json()["director_info"]
+        assert info["pipelined"] is True
+        assert info["objective_used"] == "Répondre lentement."
+        assert info["next_objective"] == "Confondre avec le digicode."
+        assert info["stage"] == "3"
+        assert state.victim.arespond_web.await_args.kwargs["objective"] == "Répondre lentement."
+        assert state.current_objective == "Confondre avec le digicode."
+
+    def test_sequential_mode_is_the_default(self, client, monkeypatch):
+        monkeypatch.delenv("DIRECTOR_PIPELINED", raising=False)
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        self._slow_turn(state, delay=0.01)
+
+        res = c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+        info = res.json()["director_info"]
+        assert info["pipelined"] is False
+        assert info["objective_used"] == "Confondre avec le digicode."
+        assert state.victim.arespond_web.await_args.kwargs["objective"] == "Confondre avec le digicode."
+
+    def test_env_enables_pipelining_for_auto_next(self, client, monkeypatch):
+        monkeypatch.setenv("DIRECTOR_PIPELINED", "1")
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        state.is_active = True
+        state.max_turns = 15
+        state.pending_intervention = False
+        state.scammer.memory.chat_memory.messages = []
+        state.scammer.arespond_web = AsyncMock(return_value=([], "Bien sûr."))
+        self._slow_turn(state, delay=0.01)
+
+        res = c.post("/api/auto-conversation/next", json={"session_id": "test-session-123"})
+        info = res.json()["director_info"]
+        assert info["pipelined"] is True
+        assert info["objective_used"] == "Répondre lentement."
+
+    def test_stream_sends_director_after_victim(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        _stream_victim(state, [{"type": "text", "content": "Oui ?"}], "Oui ?")
+
+        res = c.post("/api/chat/stream", json={
+            "session_id": "test-session-123", "user_input": "Allô", "pipelined": True,
+        })
+        events = _parse_sse(res.text)
+        assert [e[0] for e in events] == ["segment", "segment_audio", "director", "done"]
+        assert events[2][2]["next_objective"] == "Poser des questions."
+
+
+class TestStreamingDirector:
+    def _streaming_turn(self, state, trailing_delay=0.3):
+        calls = []
+
+        async def streaming_director(**kwargs):
+            kwargs["on_objective"]({"scam_type": "banque", "stage": "3", "stage_description": "Stade 3",
+                                    "new_objective": "Confondre avec le digicode."})
+            await asyncio.sleep(trailing_delay)
+            calls.append("director_done")
+            return {"scam_type": "banque", "stage": "3", "stage_description": "demande code",
+                    "new_objective": "Confondre avec le digicode."}
+
+        async def respond(**kwargs):
+            calls.append("victim_started")
+            return [{"type": "text", "content": "Le code de la porte ?"}], "Le code de la porte ?"
+
+        state.director.aupdate_objective = AsyncMock(side_effect=streaming_director)
+        state.victim.arespond_web = AsyncMock(side_effect=respond)
+        state.victim.agenerate = AsyncMock(side_effect=respond)
+        return calls
+
+    def test_victim_starts_once_objective_is_parsed(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        calls = self._streaming_turn(state)
+
+        res = c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Votre code ?"})
+
+        assert calls == ["victim_started", "director_done"]
+        assert state.victim.arespond_web.await_args.kwargs["objective"] == "Confondre avec le digicode."
+        info = res.json()["director_info"]
+        assert info["objective_used"] == "Confondre avec le digicode."
+        assert info["stage_description"] == "demande code"
+
+    def test_stream_resends_director_with_trailing_fields(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        self._streaming_turn(state, trailing_delay=0.05)
+
+        async def aiter_audio(segs):
+            return
+            yield
+
+        state.victim.aiter_audio = aiter_audio
+        res = c.post("/api/chat/stream", json={"session_id": "test-session-123", "user_input": "Code ?"})
+        events = _parse_sse(res.text)
+        assert [e[0] for e in events] == ["director", "segment", "director", "done"]
+        assert events[0][2]["stage_description"] == "Stade 3"
+        assert events[2][2]["stage_description"] == "demande code"
+
+
+class TestMetrics:
+    def test_chat_counts_turn_and_sends_server_timing(self, client):
+        from app.core.metrics import TURNS
+        c, states = client
+        c.post("/api/sessions")
+        states["test-session-123"].victim.arespond_web.return_value = ([], "Oui ?")
+        before = TURNS.value("chat")
+
+        res = c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+
+        assert TURNS.value("chat") == before + 1
+        timing = res.headers["server-timing"]
+        assert "director_wait;dur=" in timing and "serialize;dur=" in timing
+        assert timing.split(", ")[-1].startswith("total;dur=")
+
+    def test_serialize_stage_covers_json_encoding(self, client):
+        from app.api.models import ChatResponse
+        c, states = client
+        c.post("/api/sessions")
+        states["test-session-123"].victim.arespond_web.return_value = ([], "Oui ?")
+        encode = ChatResponse.model_dump_json
+
+        def slow_encode(self, **kwargs):
+            time.sleep(0.05)
+            return encode(self, **kwargs)
+
+        with patch.object(ChatResponse, "model_dump_json", slow_encode):
+            res = c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+
+        assert res.json()["raw_text"] == "Oui ?"
+        stages = dict(part.split(";dur=") for part in res.headers["server-timing"].split(", "))
+        assert float(stages["serialize"]) >= 50
+
+    def test_metrics_endpoint_exposes_prometheus_text(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        states["test-session-123"].victim.arespond_web.return_value = ([], "Oui ?")
+        c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+        res = c.get("/metrics")
+        assert res.status_code == 200
+        assert res.headers["content-type"].startswith("text/plain")
+        assert 'scam_turns_total{kind="chat"}' in res.text
+        assert 'scam_http_request_seconds_count{method="POST",route="/api/chat",status="200"}' in res.text
+        assert "# TYPE scam_sessions_active gauge" in res.text
+        assert "scam_tts_breaker_state 0" in res.text
+
+
+class TestBudgets:
+    def _session(self, client, tokens_used):
+        c, states = client
+        from server import app
+        app.state.session_manager.budget = BudgetPolicy(
+            session_limits={"tokens": 1000}, global_limits={})
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        state.victim.arespond_web.return_value = ([], "Oui ?")
+        state.usage["tokens"] = tokens_used
+        return c, state
+
+    def test_normal_session_is_untouched(self, client):
+        c, state = self._session(client, 100)
+        tts = state.victim.tts_client
+        res = c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+        assert res.status_code == 200
+        assert state.victim.tts_client is tts
+
+    @staticmethod
+    def _record_levels(state):
+        levels = []
+
+        async def respond(**kwargs):
+            levels.append(budget.current_level())
+            return [], "Oui ?"
+
+        state.victim.arespond_web.side_effect = respond
+        return levels
+
+    def test_degrades_to_text_only_then_fast_director(self, client):
+        c, state = self._session(client, 850)
+        tts = state.victim.tts_client
+        levels = self._record_levels(state)
+        c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+        state.usage["tokens"] = 950
+        c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+
+        assert levels == [budget.TEXT_ONLY, budget.FAST_DIRECTOR]
+        # Applied per turn, the agents themselves are left as they were
+        assert state.victim.tts_client is tts
+        assert state.director.fast_path is not True
+
+    def test_session_over_budget_makes_no_director_llm_call(self, client):
+        from app.agents.director_agent import DEFAULT_RESULT, DirectorAgent
+        c, state = self._session(client, 950)
+        with patch("app.agents.director_agent.get_chat_model"):
+            state.director = DirectorAgent("fake-key", fast_path=False)
+        state.director.chain = MagicMock()
+        state.director.chain.ainvoke = AsyncMock()
+
+        for message in ("Bonjour madame.", "Donnez-moi le code reçu par SMS, c'est urgent."):
+            res = c.post("/api/chat", json={"session_id": "test-session-123", "user_input": message})
+            assert res.status_code == 200
+        state.director.chain.ainvoke.assert_not_called()
+        # Ambiguous first message: the default stalling objective, not an LLM call
+        first_call = state.victim.arespond_web.await_args_list[0].kwargs
+        assert first_call["objective"] == DEFAULT_RESULT["new_objective"]
+
+    def test_degradation_lifts_when_the_global_window_resets(self, client):
+        c, states = client
+        from server import app
+        now = [0.0]
+        policy = BudgetPolicy(session_limits={}, global_limits={"tokens": 1000},
+                              window=60, clock=lambda: now[0])
+        app.state.session_manager.budget = policy
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        levels = self._record_levels(state)
+
+        policy.charge(new_usage(), tokens=850)
+        c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+        now[0] = 61
+        c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+        assert levels == [budget.TEXT_ONLY, budget.NORMAL]
+
+    def test_exhausted_session_is_refused(self, client):
+        c, state = self._session(client, 1000)
+        res = c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allô"})
+        assert res.status_code == 429
+        state.victim.arespond_web.assert_not_called()
+
+        res = c.post("/api/auto-conversation/next", json={"session_id": "test-session-123"})
+        assert res.status_code == 400  # the session was ended
+
+    def test_stream_reports_exhaustion_as_error_event(self, client):
+        c, state = self._session(client, 1000)
+        res = c.post("/api/chat/stream", json={"session_id": "test-session-123", "user_input": "Allô"})
+        events = _parse_sse(res.text)
+        assert events[-1][0] == "error"
+        assert events[-1][2]["status_code"] == 429
+
+
+def _parse_sse(text):
+    """Parse an event-stream body into a list of (event, id, data) tuples."""
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], fields.get("id"), json.loads(fields["data"])))
+    return events
+
+
+def _stream_victim(state, segments, clean_text, audio=b"mp3"):
+    state.victim.agenerate = AsyncMock(return_value=(segments, clean_text))
+
+    async def aiter_audio(segs):
+        for i, seg in enumerate(segs):
+            if seg["type"] == "text":
+                seg["tts_audio"] = audio.hex()
+                yield i
+
+    state.victim.aiter_audio = aiter_audio
+
+
+class TestStreamingEndpoints:
+    def test_chat_stream_emits_director_segments_audio_done(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        _stream_victim(state, [
+            {"type": "text", "content": "Attendez"},
+            {"type": "sound", "sound_tag": "DOG_BARK", "sound_file": "/static/sounds/dog-barking.mp3"},
+            {"type": "text", "content": "Poupoune !"},
+        ], "Attendez Poupoune !")
+
+        res = c.post("/api/chat/stream", json={
+            "session_id": "test-session-123",
+            "user_input": "Bonjour Jeanne",
+        })
+
+        assert res.status_code == 200
+        assert res.headers["content-type"].startswith("text/event-stream")
+        events = _parse_sse(res.text)
+        assert [e[0] for e in events] == [
+            "director", "segment", "segment", "segment",
+            "segment_audio", "segment_audio", "done",
+        ]
+        assert events[0][2]["scam_type"] == "banque"
+        assert "tts_audio" not in events[1][2]
+        assert events[4][1] == "0"
+        assert events[4][2]["tts_audio"] == b"mp3".hex()
+        assert events[-1][2]["victim_text"] == "Attendez Poupoune !"
+
+    def test_chat_stream_disconnect_rolls_back_the_turn(self, client):
+        from app.api.models import ChatRequest
+        from app.api.routes import chat_stream
+
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        _stream_victim(state, [], "")
+        state.scammer.memory.chat_memory.messages = []
+        started = asyncio.Event()
+
+        async def blocked(**kwargs):
+            started.set()
+            await asyncio.Event().wait()
+
+        state.victim.agenerate = AsyncMock(side_effect=blocked)
+
+        async def scenario():
+            request = MagicMock()
+            request.app = c.app
+            response = await chat_stream(ChatRequest(
+                session_id="test-session-123", user_input="Allô ?",
+            ), request)
+            events = response.body_iterator
+            first = await events.__anext__()
+            # Client goes away while the victim is generating
+            pending = asyncio.ensure_future(events.__anext__())
+            await started.wait()
+            pending.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await pending
+            return first
+
+        assert asyncio.run(scenario()).startswith("event: director")
+        assert state.scam_type == "inconnu"
+        assert state.current_objective == "Répondre lentement."
+        assert state.turn_count == 0
+        state.victim.load_memory.assert_called_with(state.victim.dump_memory.return_value)
+
+    def test_chat_stream_nonexistent_session(self, client):
+        c, _ = client
+        res = c.post("/api/chat/stream", json={
+            "session_id": "nonexistent",
+            "user_input": "Hello",
+        })
+        assert res.status_code == 404
+
+    def test_auto_next_stream_includes_scammer_reply(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        state = states["test-session-123"]
+        state.is_active = True
+        state.max_turns = 15
+        state.pending_intervention = False
+        state.scammer.memory.chat_memory.messages = [MagicMock(content="Votre code ?")]
+        state.scammer.arespond_web = AsyncMock(return_value=(
+            [{"type": "text", "content": "Dépêchez-vous."}], "Dépêchez-vous.",
+        ))
+        _stream_victim(state, [{"type": "text", "content": "Quel code ?"}], "Quel code ?")
+
+        res = c.post("/api/auto-conversation/next/stream", json={
+            "session_id": "test-session-123",
+        })
+
+        events = _parse_sse(res.text)
+        assert [e[0] for e in events] == [
+            "director", "segment", "segment_audio", "scammer_segment", "done",
+        ]
+        state.victim.agenerate.assert_awaited_once()
+        assert state.victim.agenerate.call_args.kwargs["user_input"] == "Votre code ?"
+        done = events[-1][2]
+        assert done["turn_number"] == 1
+        assert done["scammer_text"] == "Dépêchez-vous."
+        assert done["is_complete"] is False
+
+    def test_auto_next_stream_rejects_inactive_conversation(self, client):
+        c, states = client
+        c.post("/api/sessions")
+        states["test-session-123"].is_active = False
+
+        res = c.post("/api/auto-conversation/next/stream", json={
+            "session_id": "test-session-123",
+        })
+        assert res.status_code == 400
+
+
+class TestAudioEndpoint:
+    AUDIO = bytes(range(256)) * 4
+
+    def _add(self, audio_store):
+        return audio_store.add(self.AUDIO)
+
+    def test_serves_audio_with_cache_headers(self, client, audio_store):
+        c, _ = client
+        audio_id = self._add(audio_store)
+        res = c.get(f"/api/audio/{audio_id}")
+        assert res.status_code == 200
+        assert res.content == self.AUDIO
+        assert res.headers["content-type"] == "audio/mpeg"
+        assert res.headers["etag"] == f'"{audio_id}"'
+        assert "immutable" in res.headers["cache-control"]
+        assert res.headers["accept-ranges"] == "bytes"
+
+    def test_if_none_match_returns_304(self, client, audio_store):
+        c, _ = client
+        audio_id = self._add(audio_store)
+        res = c.get(f"/api/audio/{audio_id}", headers={"If-None-Match": f'"{audio_id}"'})
+        assert res.status_code == 304
+        assert res.content == b""
+
+    def test_range_request(self, client, audio_store):
+        c, _ = client
+        audio_id = self._add(audio_store)
+        res = c.get(f"/api/audio/{audio_id}", headers={"Range": "bytes=100-199"})
+        assert res.status_code == 206
+        assert res.content == self.AUDIO[100:200]
+        assert res.headers["content-range"] == f"bytes 100-199/{len(self.AUDIO)}"
+
+    def test_suffix_and_open_ranges(self, client, audio_store):
+        c, _ = client
+        audio_id = self._add(audio_store)
+        suffix = c.get(f"/api/audio/{audio_id}", headers={"Range": "bytes=-10"})
+        assert suffix.content == self.AUDIO[-10:]
+        open_ended = c.get(f"/api/audio/{audio_id}", headers={"Range": "bytes=1000-"})
+        assert open_ended.content == self.AUDIO[1000:]
+
+    def test_unsatisfiable_range(self, client, audio_store):
+        c, _ = client
+        audio_id = self._add(audio_store)
+        res = c.get(f"/api/audio/{audio_id}", headers={"Range": "bytes=5000-"})
+        assert res.status_code == 416
+        assert res.headers["content-range"] == f"bytes */{len(self.AUDIO)}"
+
+    def test_unknown_audio(self, client):
+        c, _ = client
+        assert c.get("/api/audio/" + "0" * 64).status_code == 404
+        assert c.get("/api/audio/not-a-hash").status_code == 404
+
+
+class TestInlineAudio:
+    def _respond_with_audio(self, states, audio_store):
+        state = states["test-session-123"]
+        url = "/api/audio/" + audio_store.add(b"mp3")
+        state.victim.arespond_web.return_value = (
+            [{"type": "text", "content": "Oui ?", "tts_url": url}], "Oui ?",
+        )
+        return url
+
+    def test_chat_returns_url_without_base64_by_default(self, client, audio_store):
+        c, states = client
+        c.post("/api/sessions")
+        url = self._respond_with_audio(states, audio_store)
+
+        res = c.post("/api/chat", json={"session_id": "test-session-123", "user_input": "Allo"})
+        seg = res.json()["segments"][0]
+        assert seg["tts_url"] == url
+        assert seg["tts_audio"] is None
+
+    def test_chat_inlines_base64_on_request(self, client, audio_store):
+        c, states = client
+        c.post("/api/sessions")
+        self._respond_with_audio(states, audio_store)
+
+        res = c.post("/api/chat", json={
+            "session_id": "test-session-123",
+            "user_input": "Allo",
+            "inline_audio": True,
+        })
+        assert res.json()["segments"][0]["tts_audio"] == "bXAz"
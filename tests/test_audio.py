@@ -0,0 +1,47 @@
+import pytest
+
+from app.core.audio import mp3_frames, slice_mp3
+
+# MPEG-2 Layer III, 32 kbps, 24 kHz: 96-byte frames of 24 ms each.
+FRAME_HEADER = bytes([0xFF, 0xF3, 0x44, 0xC4])
+FRAME = FRAME_HEADER + b"\x00" * 92
+FRAME_SECONDS = 576 / 24000
+
+
+def _mp3(n_frames):
+    return FRAME * n_frames
+
+
+class TestMp3Frames:
+    def test_counts_frames_and_times(self):
+        frames = mp3_frames(_mp3(10))
+        assert len(frames) == 10
+        assert frames[3] == (3 * 96, 96, pytest.approx(3 * FRAME_SECONDS))
+
+    def test_skips_id3_tag(self):
+        id3 = b"ID3\x04\x00\x00\x00\x00\x00\x05" + b"x" * 5
+        frames = mp3_frames(id3 + _mp3(2))
+        assert frames[0][0] == len(id3)
+        assert len(frames) == 2
+
+    def test_resyncs_after_garbage(self):
+        frames = mp3_frames(b"\x00\x01" + _mp3(3))
+        assert len(frames) == 3
+
+    def test_raises_without_frames(self):
+        with pytest.raises(ValueError):
+            mp3_frames(b"not an mp3")
+
+
+class TestSliceMp3:
+    def test_slice_keeps_frames_starting_in_range(self):
+        data = _mp3(100)
+        chunk = slice_mp3(data, 0.5, 1.0)
+        # Frames start at 0.504s (21) through 0.984s (41)
+        assert len(chunk) == 21 * 96
+
+    def test_adjacent_slices_cover_whole_stream(self):
+        data = _mp3(50)
+        first = slice_mp3(data, 0.0, 0.6)
+        second = slice_mp3(data, 0.6, 10.0)
+        assert first + second == data
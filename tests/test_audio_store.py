@@ -0,0 +1,32 @@
+from app.core.audio_store import AudioStore, attach_audio, audio_id_from_url
+
+
+class TestAudioStore:
+    def test_add_is_content_addressed(self):
+        store = AudioStore(disk_dir=None)
+        first = store.add(b"mp3-bytes")
+        second = store.add(b"mp3-bytes")
+        assert first == second == AudioStore.audio_id(b"mp3-bytes")
+        assert store.get(first) == b"mp3-bytes"
+        assert store.stats["entries"] == 1
+
+    def test_spills_to_disk_after_memory_eviction(self, tmp_path):
+        store = AudioStore(max_bytes=4, disk_dir=str(tmp_path))
+        first = store.add(b"aaaa")
+        store.add(b"bbbb")
+        assert store.get(first) == b"aaaa"
+        assert store.stats["disk_hits"] == 1
+
+
+class TestAttachAudio:
+    def test_sets_url_only(self, audio_store):
+        seg = {"type": "text", "content": "Allo ?"}
+        attach_audio(seg, b"audio")
+        assert "tts_audio" not in seg
+        assert seg["tts_url"].startswith("/api/audio/")
+        assert audio_store.get(audio_id_from_url(seg["tts_url"])) == b"audio"
+
+    def test_ignores_missing_audio(self):
+        seg = {"type": "text", "content": "Allo ?"}
+        attach_audio(seg, None)
+        assert "tts_url" not in seg
@@ -0,0 +1,87 @@
+import asyncio
+import contextvars
+from unittest.mock import MagicMock
+
+from app.agents.scammer_agent import ScammerAgent
+from app.core import budget
+from app.core.budget import (
+    EXHAUSTED, FAST_DIRECTOR, NORMAL, TEXT_ONLY, BudgetPolicy, new_usage,
+)
+
+
+def _policy(session=None, global_=None, **kwargs):
+    return BudgetPolicy(session_limits=session or {}, global_limits=global_ or {}, **kwargs)
+
+
+class TestLevels:
+    def test_unlimited_by_default(self):
+        policy = _policy()
+        assert not policy.enabled
+        assert policy.level({"tokens": 10**9}) == NORMAL
+
+    def test_token_budget_degrades_in_steps(self):
+        policy = _policy({"tokens": 1000})
+        assert policy.level({"tokens": 500}) == NORMAL
+        assert policy.level({"tokens": 800}) == TEXT_ONLY
+        assert policy.level({"tokens": 900}) == FAST_DIRECTOR
+        assert policy.level({"tokens": 1000}) == EXHAUSTED
+
+    def test_tts_budget_only_removes_audio(self):
+        policy = _policy({"tts_characters": 100})
+        assert policy.level({"tts_characters": 95}) == TEXT_ONLY
+        assert policy.level({"tts_characters": 500}) == TEXT_ONLY
+
+    def test_global_budget_applies_to_every_session(self):
+        policy = _policy(global_={"seconds": 10})
+        policy.charge(new_usage(), seconds=9.5)
+        assert policy.level(new_usage()) == FAST_DIRECTOR
+
+    def test_global_window_resets(self):
+        now = [0.0]
+        policy = _policy(global_={"tokens": 100}, window=60, clock=lambda: now[0])
+        policy.charge(new_usage(), tokens=100)
+        assert policy.level(new_usage()) == EXHAUSTED
+        now[0] = 61
+        assert policy.level(new_usage()) == NORMAL
+
+
+class TestCharge:
+    def test_charge_is_a_noop_outside_a_metered_turn(self):
+        budget.charge(tokens=10)  # nothing bound in this context
+
+    def test_bound_usage_is_charged_from_tasks_and_threads(self):
+        policy = _policy({"tokens": 1000})
+        usage = new_usage()
+
+        async def turn():
+            budget.bind(usage, policy)
+            await asyncio.create_task(asyncio.to_thread(budget.charge, tts_characters=40, seconds=0.5))
+            budget.charge(tokens=120)
+
+        asyncio.run(turn())
+        assert usage == {"tokens": 120, "tts_characters": 40, "seconds": 0.5}
+        assert policy.global_usage["tokens"] == 120
+
+
+class TestTurnLevel:
+    def test_level_is_per_context(self):
+        def turn(level):
+            budget.bind(new_usage(), _policy(), level)
+            return budget.text_only(), budget.fast_director()
+
+        assert contextvars.copy_context().run(turn, TEXT_ONLY) == (True, False)
+        assert contextvars.copy_context().run(turn, FAST_DIRECTOR) == (True, True)
+        assert budget.current_level() == NORMAL
+
+    def test_text_only_turn_skips_tts(self):
+        scammer = ScammerAgent("fake-key")
+        scammer.tts_client = MagicMock()
+        scammer.memory = MagicMock()
+
+        def turn():
+            budget.bind(new_usage(), _policy(), TEXT_ONLY)
+            return asyncio.run(scammer._afinish_turn("Allô", "Votre code, madame."))
+
+        segments, _ = contextvars.copy_context().run(turn)
+        assert "tts_url" not in segments[0]
+        scammer.tts_client.synthesize_speech.assert_not_called()
@@ -0,0 +1,97 @@
+import pytest
+
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _fail(breaker, times=1):
+    for _ in range(times):
+        breaker.after_call(breaker.before_call(), 0.1, RuntimeError("unavailable"))
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("tts", failures=3, clock=_Clock())
+        _fail(breaker, 2)
+        assert breaker.state == CLOSED
+        _fail(breaker)
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpen):
+            breaker.before_call()
+        assert breaker.stats["rejected"] == 1
+
+    def test_success_resets_the_count(self):
+        breaker = CircuitBreaker("tts", failures=2, clock=_Clock())
+        _fail(breaker)
+        breaker.after_call(breaker.before_call(), 0.1)
+        _fail(breaker)
+        assert breaker.state == CLOSED
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker("tts", failures=2, slow_seconds=1.0, clock=_Clock())
+        for _ in range(2):
+            breaker.after_call(breaker.before_call(), 3.0)
+        assert breaker.state == OPEN
+        assert breaker.stats["slow"] == 2
+
+    def test_half_open_lets_one_probe_through(self):
+        clock = _Clock()
+        breaker = CircuitBreaker("tts", failures=1, cooldown=10, clock=clock)
+        _fail(breaker)
+        clock.now = 10
+        assert breaker.state == HALF_OPEN
+
+        probe = breaker.before_call()
+        with pytest.raises(CircuitOpen):
+            breaker.before_call()
+        breaker.after_call(probe, 0.1)
+        assert breaker.state == CLOSED
+
+    def test_calls_in_flight_when_it_opens_are_ignored(self):
+        clock = _Clock()
+        breaker = CircuitBreaker("tts", failures=3, cooldown=10, clock=clock)
+        early_success = breaker.before_call()
+        early_failure = breaker.before_call()
+        _fail(breaker, 3)
+        assert breaker.state == OPEN
+
+        clock.now = 8
+        breaker.after_call(early_success, 0.1)
+        assert breaker.state == OPEN  # only the probe can close it
+        breaker.after_call(early_failure, 0.1, RuntimeError("late"))
+        clock.now = 10
+        assert breaker.state == HALF_OPEN  # the cooldown was not pushed back
+
+    def test_failed_probe_reopens(self):
+        clock = _Clock()
+        opened = []
+        breaker = CircuitBreaker("tts", failures=1, cooldown=10, clock=clock,
+                                 on_open=lambda: opened.append(clock.now))
+        _fail(breaker)
+        clock.now = 10
+        _fail(breaker)
+        assert breaker.state == OPEN
+        assert opened == [0.0, 10]
+        clock.now = 15
+        with pytest.raises(CircuitOpen) as info:
+            breaker.before_call()
+        assert info.value.retry_in == pytest.approx(5)
+
+    def test_guard_records_exceptions(self):
+        breaker = CircuitBreaker("tts", failures=1, clock=_Clock())
+        with pytest.raises(RuntimeError):
+            with breaker.guard():
+                raise RuntimeError("deadline exceeded")
+        assert breaker.state == OPEN
+
+    def test_zero_failures_disables(self):
+        breaker = CircuitBreaker("tts", failures=0, clock=_Clock())
+        _fail(breaker, 10)
+        assert breaker.state == CLOSED
@@ -0,0 +1,44 @@
+from unittest.mock import patch, MagicMock
+
+from app.core import clients
+from app.core.clients import get_chat_model, get_tts_client
+
+
+class TestGetChatModel:
+    def test_same_key_and_temperature_share_instance(self):
+        assert get_chat_model("fake-key", 0.7) is get_chat_model("fake-key", 0.7)
+
+    def test_temperatures_get_distinct_models_on_one_pool(self):
+        victim = get_chat_model("fake-key", 0.7)
+        director = get_chat_model("fake-key", 0.2)
+        assert victim is not director
+        assert victim.http_client is director.http_client
+        assert victim.http_async_client is director.http_async_client
+
+
+class TestGetTtsClient:
+    def test_none_without_credentials(self, mock_no_google_credentials):
+        assert get_tts_client() is None
+
+    def test_created_once(self, monkeypatch):
+        monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS", "/tmp/fake.json")
+        with patch("google.cloud.texttospeech.TextToSpeechClient") as MockClient:
+            MockClient.return_value = MagicMock()
+            first = get_tts_client()
+            second = get_tts_client()
+        assert first is second
+        MockClient.assert_called_once()
+
+
+class TestAgentsShareClients:
+    def test_sessions_borrow_the_same_llm(self, mock_no_google_credentials):
+        from app.agents.director_agent import DirectorAgent
+        from app.agents.scammer_agent import ScammerAgent
+        from app.agents.victim_agent import VictimAgent
+
+        first = (VictimAgent("fake-key"), DirectorAgent("fake-key"), ScammerAgent("fake-key"))
+        second = (VictimAgent("fake-key"), DirectorAgent("fake-key"), ScammerAgent("fake-key"))
+        for a, b in zip(first, second):
+            assert a.llm is b.llm
+        assert first[0].memory is not second[0].memory
+        assert len(clients._chat_models) == 3
@@ -1,12 +1,15 @@
+import asyncio
 import json
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
-from app.agents.director_agent import DirectorAgent, DEFAULT_RESULT
+from app.agents.director_agent import (
+    DirectorAgent, DEFAULT_RESULT, _format_scam_scripts, _script_focus,
+)
 
 
 def _create_director(api_key="fake-key"):
-    """Helper to create a DirectorAgent with ChatGroq mocked."""
-    with patch("app.agents.director_agent.ChatGroq") as mock_chatgroq:
+    """Helper to create a DirectorAgent with the shared LLM mocked."""
+    with patch("app.agents.director_agent.get_chat_model") as mock_chatgroq:
         mock_chatgroq.return_value = MagicMock()
         director = DirectorAgent(api_key)
     return director
@@ -86,3 +89,150 @@ class TestUpdateObjective:
 
         result = director.update_objective("test")
         assert result == DEFAULT_RESULT
+
+    def test_aupdate_objective_returns_parsed_dict(self):
+        director = _create_director()
+        mock_response = MagicMock()
+        mock_response.content = '{"scam_type": "colis", "stage": "2", "new_objective": "S\'étonner des frais."}'
+        director.chain = MagicMock()
+        director.chain.ainvoke = AsyncMock(return_value=mock_response)
+
+        result = asyncio.run(director.aupdate_objective("Payez les frais de douane."))
+        assert result["scam_type"] == "colis"
+        assert result["stage_description"] == "Stade 2"
+
+    def test_aupdate_objective_returns_default_on_exception(self):
+        director = _create_director()
+        director.chain = MagicMock()
+        director.chain.ainvoke = AsyncMock(side_effect=Exception("API error"))
+
+        result = asyncio.run(director.aupdate_objective("test"))
+        assert result == DEFAULT_RESULT
+
+
+class TestBudgetLevel:
+    def test_fast_director_level_never_calls_the_llm(self):
+        import contextvars
+        from app.core import budget
+        from app.core.budget import FAST_DIRECTOR, BudgetPolicy, new_usage
+        from app.core.metrics import DIRECTOR_FALLBACKS
+
+        director = _create_director()
+        director.chain = MagicMock()
+        director.chain.ainvoke = AsyncMock()
+        before = DIRECTOR_FALLBACKS.value("budget")
+
+        def turn(message):
+            budget.bind(new_usage(), BudgetPolicy(session_limits={}, global_limits={}),
+                        FAST_DIRECTOR)
+            return asyncio.run(director.aupdate_objective(message))
+
+        assert contextvars.copy_context().run(turn, "Allô, bonjour.") == DEFAULT_RESULT
+        assert DIRECTOR_FALLBACKS.value("budget") - before == 1
+        director.chain.ainvoke.assert_not_called()
+
+
+class TestFallbackMetrics:
+    def test_fallbacks_are_counted_by_reason(self):
+        from app.core.metrics import DIRECTOR_FALLBACKS
+        before = {r: DIRECTOR_FALLBACKS.value(r) for r in ("no_json", "missing_fields", "error")}
+        DirectorAgent._parse_response("pas de JSON")
+        DirectorAgent._parse_response('{"scam_type": "banque"}')
+        director = _create_director()
+        director.chain = MagicMock()
+        director.chain.invoke.side_effect = Exception("API error")
+        director.update_objective("test")
+        assert {r: DIRECTOR_FALLBACKS.value(r) - n for r, n in before.items()} == {
+            "no_json": 1, "missing_fields": 1, "error": 1,
+        }
+
+
+def _streaming_director(chunks, error=None):
+    director = _create_director()
+    director.streaming = True
+    director.consumed = []
+
+    async def astream(inputs):
+        for chunk in chunks:
+            director.consumed.append(chunk)
+            yield MagicMock(content=chunk)
+        if error:
+            raise error
+
+    director.chain = MagicMock()
+    director.chain.astream = astream
+    return director
+
+
+class TestStreamingDirector:
+    CHUNKS = ['{"scam_type": "banque", ', '"stage": "3", "new_objective": "Confondre ',
+              'avec le digicode.", ', '"stage_description": "demande code"}', ' Voilà.']
+
+    def test_objective_reported_before_trailing_fields(self):
+        director = _streaming_director(self.CHUNKS)
+        early = []
+
+        def on_objective(result):
+            early.append((result, len(director.consumed)))
+
+        result = asyncio.run(director.aupdate_objective("Votre code ?", on_objective=on_objective))
+        (first, consumed), = early
+        assert consumed == 3
+        assert first["new_objective"] == "Confondre avec le digicode."
+        assert first["stage"] == "3"
+        assert result["stage_description"] == "demande code"
+        assert director.consumed == self.CHUNKS[:4]  # stops once the object closes
+
+    def test_garbage_stream_falls_back_to_default(self):
+        director = _streaming_director(["Désolé, ", "je ne peux pas ", "{répondre}"])
+        on_objective = MagicMock()
+        assert asyncio.run(director.aupdate_objective("?", on_objective=on_objective)) == DEFAULT_RESULT
+        on_objective.assert_not_called()
+
+    def test_truncated_stream_keeps_required_fields(self):
+        director = _streaming_director(['{"scam_type": "colis", "new_objective": "Rire."', ', "sta'])
+        result = asyncio.run(director.aupdate_objective("Payez."))
+        assert result["new_objective"] == "Rire."
+        assert result["stage_description"] == "Stade 1"
+
+    def test_error_after_objective_keeps_early_result(self):
+        director = _streaming_director(self.CHUNKS[:3], error=RuntimeError("connection reset"))
+        result = asyncio.run(director.aupdate_objective("Votre code ?"))
+        assert result["new_objective"] == "Confondre avec le digicode."
+
+    def test_error_before_objective_returns_default(self):
+        director = _streaming_director(self.CHUNKS[:1], error=RuntimeError("connection reset"))
+        assert asyncio.run(director.aupdate_objective("Votre code ?")) == DEFAULT_RESULT
+
+    def test_streaming_is_opt_in(self, monkeypatch):
+        monkeypatch.delenv("DIRECTOR_STREAMING", raising=False)
+        assert _create_director().streaming is False
+        monkeypatch.setenv("DIRECTOR_STREAMING", "1")
+        assert _create_director().streaming is True
+
+class TestScriptFocus:
+    def test_focused_catalogue_details_one_type_and_indexes_others(self):
+        scripts = _format_scam_scripts("colis")
+        assert "Colissimo" in scripts
+        assert "TeamViewer" not in scripts
+        assert "SUPPORT_TECHNIQUE : 1 alerte virus" in scripts
+        assert len(scripts) < len(_format_scam_scripts()) / 2
+
+    def test_detected_type_is_focused(self):
+        assert _script_focus("D'accord madame.", "", "banque", "colis") == "colis"
+
+    def test_signals_for_another_type_escalate_to_full_catalogue(self):
+        assert _script_focus("Installez TeamViewer.", "", "banque", "colis") is None
+
+    def test_undetected_type_without_signal_uses_full_catalogue(self):
+        assert _script_focus("Allô ?", "", "banque", "inconnu") is None
+        assert _script_focus("Ici votre banque.", "", "banque", "inconnu") == "banque"
+
+    def test_director_prompt_receives_focused_scripts(self):
+        director = _create_director()
+        director.chain = MagicMock()
+        director.chain.ainvoke = AsyncMock(return_value=MagicMock(content="{}"))
+
+        asyncio.run(director.aupdate_objective("Les frais de douane.", scam_type="colis"))
+        inputs = director.chain.ainvoke.await_args.args[0]
+        assert inputs["scam_scripts"] == _format_scam_scripts("colis")
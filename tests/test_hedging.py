@@ -0,0 +1,166 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.core import clients
+from app.core.hedging import MIN_SAMPLES, WINDOW, LatencyGuard, LLMTimeout
+from app.core.metrics import timed
+
+
+def _warm(guard, key, seconds=0.01, samples=MIN_SAMPLES):
+    for _ in range(samples):
+        guard._observe(key, seconds)
+
+
+class _Calls:
+    """Coroutine factory: the first call takes ``slow`` seconds, the
+    following ones ``fast``."""
+
+    def __init__(self, slow, fast=0.0):
+        self.delays = [slow]
+        self.fast = fast
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        delay = self.delays[self.started] if self.started < len(self.delays) else self.fast
+        n = self.started
+        self.started += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"reply {n}"
+
+
+def _in_stage(stage, coro_factory):
+    async def run():
+        with timed(stage):
+            return await coro_factory()
+    return asyncio.run(run())
+
+
+class TestHedging:
+    def test_slow_call_is_hedged_and_loser_cancelled(self):
+        guard = LatencyGuard(hedge=True, budget=1.0)
+        _warm(guard, "victim_llm")
+        calls = _Calls(slow=1.0)
+
+        start = time.perf_counter()
+        result = _in_stage("victim_llm", lambda: guard.arun(calls))
+
+        assert result == "reply 1"
+        assert time.perf_counter() - start < 0.5
+        assert guard.stats["hedged"] == 1 and guard.stats["hedge_wins"] == 1
+
+    def test_no_hedge_before_enough_samples(self):
+        guard = LatencyGuard(hedge=True, budget=1.0)
+        calls = _Calls(slow=0.05)
+        assert _in_stage("victim_llm", lambda: guard.arun(calls)) == "reply 0"
+        assert calls.started == 1
+
+    def test_budget_caps_extra_calls(self):
+        guard = LatencyGuard(hedge=True, budget=0.1)
+        _warm(guard, "victim_llm", seconds=0.001, samples=WINDOW)
+
+        async def run_many():
+            with timed("victim_llm"):
+                for _ in range(20):
+                    await guard.arun(_Calls(slow=0.02))
+
+        asyncio.run(run_many())
+        assert guard.stats["hedged"] <= 0.1 * guard.stats["calls"]
+        assert guard.stats["hedged"] >= 1
+
+    def test_failed_primary_falls_back_to_hedge(self):
+        guard = LatencyGuard(hedge=True, budget=1.0)
+        _warm(guard, "director_llm")
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                await asyncio.sleep(0.1)
+                raise RuntimeError("boom")
+            await asyncio.sleep(0.2)
+            return "ok"
+
+        assert _in_stage("director_llm", lambda: guard.arun(call)) == "ok"
+
+
+class TestTimeouts:
+    def test_hard_timeout_raises(self):
+        guard = LatencyGuard(timeouts={"scammer_llm": 0.05})
+        with pytest.raises(LLMTimeout) as info:
+            _in_stage("scammer_llm", lambda: guard.arun(_Calls(slow=1.0)))
+        assert info.value.stage == "scammer_llm"
+        assert guard.stats["timeouts"] == 1
+
+    def test_other_stages_use_the_default(self):
+        guard = LatencyGuard(timeouts={"llm": 0.05})
+        with pytest.raises(LLMTimeout):
+            _in_stage("victim_llm", lambda: guard.arun(_Calls(slow=1.0)))
+
+
+class TestStreams:
+    @staticmethod
+    def _streams(first_chunk_delays):
+        started = []
+
+        def call():
+            index = len(started)
+            started.append(index)
+
+            async def chunks():
+                await asyncio.sleep(first_chunk_delays[index])
+                for piece in ("a", "b"):
+                    yield f"{piece}{index}"
+            return chunks()
+
+        return call, started
+
+    def test_first_chunk_is_hedged(self):
+        guard = LatencyGuard(hedge=True, budget=1.0)
+        _warm(guard, "director_llm:first_chunk")
+        call, started = self._streams([1.0, 0.0])
+
+        async def consume():
+            return [c async for c in guard.astream(call)]
+
+        assert _in_stage("director_llm", consume) == ["a1", "b1"]
+        assert started == [0, 1]
+
+    def test_stream_timeout(self):
+        guard = LatencyGuard(timeouts={"director_llm": 0.05})
+        call, _ = self._streams([1.0])
+
+        async def consume():
+            return [c async for c in guard.astream(call)]
+
+        with pytest.raises(LLMTimeout):
+            _in_stage("director_llm", consume)
+
+
+class TestIntegration:
+    def test_hedged_model_class(self, monkeypatch):
+        monkeypatch.setenv("LLM_TIMEOUTS", "1")
+        clients.reset_clients()
+        try:
+            assert isinstance(clients.get_chat_model("fake-key", 0.3), clients.HedgedChatGroq)
+        finally:
+            monkeypatch.delenv("LLM_TIMEOUTS")
+            clients.reset_clients()
+
+    def test_director_falls_back_on_timeout(self):
+        from app.agents.director_agent import DEFAULT_RESULT, DirectorAgent
+        from app.core.metrics import DIRECTOR_FALLBACKS
+
+        director = DirectorAgent("fake-key", fast_path=False, streaming=False)
+        before = DIRECTOR_FALLBACKS.value("timeout")
+        with patch.object(type(director.chain), "ainvoke", side_effect=LLMTimeout("director_llm", 4)):
+            result = asyncio.run(director.aupdate_objective("Donnez-moi le code"))
+        assert result == DEFAULT_RESULT
+        assert DIRECTOR_FALLBACKS.value("timeout") == before + 1
@@ -0,0 +1,65 @@
+import json
+
+from app.agents.json_stream import JSONObjectStream
+
+DIRECTOR_OUTPUT = ('{"scam_type": "banque", "stage": 3, '
+                   '"new_objective": "Confondre avec le \\"digicode\\", {porte}.", '
+                   '"stage_description": "demande code"}')
+
+
+def _feed_by(text, size):
+    parser = JSONObjectStream()
+    completed = []
+    for i in range(0, len(text), size):
+        completed.extend(parser.feed(text[i:i + size]))
+    return parser, completed
+
+
+class TestJSONObjectStream:
+    def test_fields_are_emitted_as_they_close(self):
+        parser = JSONObjectStream()
+        assert parser.feed('{"scam_type": "ban') == []
+        assert parser.feed('que", "stage": 3') == [("scam_type", "banque")]
+        assert parser.feed(', "new_objective": "Gagner') == [("stage", 3)]
+        assert parser.feed(' du temps."') == [("new_objective", "Gagner du temps.")]
+        assert parser.close() is None  # object not closed yet
+        assert parser.feed("}") == []
+        assert parser.close() == {"scam_type": "banque", "stage": 3,
+                                  "new_objective": "Gagner du temps."}
+
+    def test_any_chunking_gives_the_same_result(self):
+        expected = json.loads(DIRECTOR_OUTPUT)
+        for size in (1, 2, 3, 7, len(DIRECTOR_OUTPUT)):
+            parser, completed = _feed_by(DIRECTOR_OUTPUT, size)
+            assert parser.close() == expected
+            assert [k for k, _ in completed] == list(expected)
+
+    def test_text_around_the_object_is_ignored(self):
+        parser, _ = _feed_by('Voici le JSON :\n```json\n' + DIRECTOR_OUTPUT + '\n```\nBonne chance', 5)
+        assert parser.close() == json.loads(DIRECTOR_OUTPUT)
+
+    def test_nested_values_and_literals(self):
+        text = '{"a": {"b": [1, "}]"]}, "c": true, "d": null, "e": -1.5e2}'
+        parser, completed = _feed_by(text, 4)
+        assert parser.close() == json.loads(text)
+        assert completed[0] == ("a", {"b": [1, "}]"]})
+
+    def test_unicode_escapes(self):
+        parser, _ = _feed_by('{"new_objective": "Appeler \\u00e0 l\'aide"}', 3)
+        assert parser.close() == {"new_objective": "Appeler à l'aide"}
+
+    def test_garbage_fails(self):
+        for text in ('{scam_type: banque}', '{"stage": 3 4}', '{"a": tru}', '{"a" "b"}'):
+            parser, _ = _feed_by(text, 2)
+            assert parser.failed, text
+            assert parser.close() is None
+
+    def test_no_object(self):
+        parser, completed = _feed_by("Je ne peux pas répondre.", 4)
+        assert completed == []
+        assert not parser.failed and parser.close() is None
+
+    def test_truncated_stream_keeps_completed_fields(self):
+        parser, _ = _feed_by('{"scam_type": "colis", "new_objective": "Demander', 6)
+        assert parser.close() is None
+        assert parser.fields == {"scam_type": "colis"}
@@ -0,0 +1,148 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import SystemMessage
+
+from app.agents.memory import TokenBudgetMemory, count_tokens
+
+
+def _memory(llm=None, **kwargs):
+    return TokenBudgetMemory(
+        memory_key="chat_history",
+        input_key="input",
+        return_messages=True,
+        human_prefix="Arnaqueur",
+        ai_prefix="Jeanne",
+        llm=llm or FakeListChatModel(responses=["Un faux conseiller demande le code."]),
+        **kwargs,
+    )
+
+
+def _turn(memory, i):
+    memory.save_context(
+        {"input": f"Message {i} de l'arnaqueur : donnez-moi votre numéro de compte, c'est urgent."},
+        {"output": f"Réponse {i} de Jeanne : attendez, je cherche mes lunettes, mon chien aboie."},
+    )
+
+
+def _prompt_tokens(memory):
+    messages = memory.load_memory_variables({})["chat_history"]
+    return sum(count_tokens(m.content) for m in messages)
+
+
+class TestTokenBudget:
+    def test_short_conversation_is_kept_verbatim(self):
+        memory = _memory(max_token_limit=1000)
+        _turn(memory, 0)
+        messages = memory.load_memory_variables({})["chat_history"]
+        assert len(messages) == 2
+        assert not memory.pending and not memory.summary
+
+    def test_prompt_size_stays_flat_after_budget(self):
+        memory = _memory(max_token_limit=150)
+
+        async def scenario():
+            sizes = []
+            for i in range(30):
+                _turn(memory, i)
+                await memory.wait_for_fold()
+                sizes.append(_prompt_tokens(memory))
+            return sizes
+
+        sizes = asyncio.run(scenario())
+        assert max(sizes) <= 150 + 20  # summary header
+        assert max(sizes[10:]) - min(sizes[10:]) < 20
+        messages = memory.load_memory_variables({})["chat_history"]
+        assert isinstance(messages[0], SystemMessage)
+        assert "faux conseiller" in messages[0].content
+        assert messages[-1].content.startswith("Réponse 29")
+
+    def test_keep_turns_caps_verbatim_history(self):
+        memory = _memory(max_token_limit=10_000, max_turns=2)
+        asyncio.run(self._turns(memory, 5))
+        assert len(memory.chat_memory.messages) == 4
+
+    async def _turns(self, memory, n):
+        for i in range(n):
+            _turn(memory, i)
+        await memory.wait_for_fold()
+
+    def test_summary_runs_off_the_critical_path(self):
+        memory = _memory(max_token_limit=60)
+
+        async def scenario():
+            for i in range(4):
+                _turn(memory, i)
+            # Prompt is already bounded before the summary lands
+            pending_before = len(memory.pending)
+            await memory.wait_for_fold()
+            return pending_before
+
+        assert asyncio.run(scenario()) > 0
+        assert memory.pending == []
+        assert memory.summary == "Un faux conseiller demande le code."
+
+    def test_load_during_a_fold_keeps_the_loaded_memory(self):
+        release = asyncio.Event()
+        seen = []
+
+        async def slow_summary(prompt):
+            seen.append(prompt.to_string())
+            await release.wait()
+            return MagicMock(content=f"Résumé {len(seen)}.")
+
+        memory = _memory(llm=slow_summary, max_token_limit=60)
+
+        async def scenario():
+            for i in range(4):
+                _turn(memory, i)
+            await asyncio.sleep(0)  # the fold waits on the LLM
+            # e.g. a turn rolled back by all_or_nothing
+            memory.load({"summary": "Résumé chargé.", "pending": [["h", "Message non résumé"]],
+                         "messages": [["h", "Allô ?"], ["a", "Oui ?"]]})
+            release.set()
+            await memory.wait_for_fold()
+
+        asyncio.run(scenario())
+        # The stale fold is dropped; the loaded pending message is folded on
+        # top of the loaded summary
+        assert memory.pending == []
+        assert memory.summary == "Résumé 2."
+        assert "Résumé chargé." in seen[1] and "Message non résumé" in seen[1]
+        assert [m.content for m in memory.chat_memory.messages] == ["Allô ?", "Oui ?"]
+
+    def test_console_mode_folds_synchronously(self):
+        memory = _memory(max_token_limit=60)
+        for i in range(4):
+            _turn(memory, i)
+        assert memory.pending == []
+        assert memory.summary
+
+    def test_failed_summary_falls_back_to_truncated_lines(self):
+        llm = MagicMock(side_effect=RuntimeError("groq down"))
+        memory = _memory(llm=llm, max_token_limit=80)
+        for i in range(4):
+            _turn(memory, i)
+        # Raw lines, oldest trimmed first to fit a third of the budget
+        assert "Réponse 2 de Jeanne" in memory.summary
+        assert "Message 0" not in memory.summary
+        assert count_tokens(memory.summary) <= 80 // 3
+
+    def test_zero_budget_disables_pruning(self):
+        memory = _memory(max_token_limit=0, max_turns=1)
+        for i in range(10):
+            _turn(memory, i)
+        assert len(memory.chat_memory.messages) == 20
+
+    def test_dump_and_load_keep_summary_and_pending(self):
+        memory = _memory(max_token_limit=10_000)
+        _turn(memory, 0)
+        memory.summary = "Résumé."
+        memory.pending = list(memory.chat_memory.messages)
+
+        restored = _memory(max_token_limit=10_000)
+        restored.load(memory.dump())
+        assert restored.summary == "Résumé."
+        assert [m.content for m in restored.pending] == [m.content for m in memory.pending]
+        assert len(restored.chat_memory.messages) == 2
@@ -0,0 +1,62 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+from app.core.metrics import Counter, Histogram, ServerTimingMiddleware, server_timing, timed
+
+
+class TestHistogram:
+    def test_buckets_are_cumulative_in_exposition(self):
+        h = Histogram("h_seconds", "help", ("stage",), buckets=(0.1, 1.0))
+        h.observe(0.05, "tts")
+        h.observe(0.5, "tts")
+        h.observe(5.0, "tts")
+        lines = h.render()
+        assert 'h_seconds_bucket{stage="tts",le="0.1"} 1' in lines
+        assert 'h_seconds_bucket{stage="tts",le="1.0"} 2' in lines
+        assert 'h_seconds_bucket{stage="tts",le="+Inf"} 3' in lines
+        assert 'h_seconds_count{stage="tts"} 3' in lines
+        assert 'h_seconds_sum{stage="tts"} 5.55' in lines
+        assert "# TYPE h_seconds histogram" in lines
+
+    def test_counter_labels(self):
+        c = Counter("turns_total", "help", ("kind",))
+        c.inc(1, "chat")
+        c.inc(2, "chat")
+        assert c.value("chat") == 3
+        assert 'turns_total{kind="chat"} 3' in c.render()
+
+
+class TestServerTiming:
+    def test_repeated_stages_are_summed(self):
+        header = server_timing([("tts", 0.1), ("victim_llm", 0.25), ("tts", 0.05)], 0.5)
+        assert header == "tts;dur=150.0, victim_llm;dur=250.0, total;dur=500.0"
+
+    def test_timed_records_histogram_outside_requests(self):
+        before = metrics.STAGE_SECONDS.count("unit_test_stage")
+        with timed("unit_test_stage"):
+            pass
+        assert metrics.STAGE_SECONDS.count("unit_test_stage") == before + 1
+
+    def test_middleware_reports_stages_of_the_request(self):
+        app = FastAPI()
+        app.add_middleware(ServerTimingMiddleware)
+
+        @app.get("/turn/{turn_id}")
+        async def turn(turn_id: int):
+            with timed("director_llm"):
+                await asyncio.sleep(0.01)
+
+            def in_thread():
+                with timed("tts"):
+                    pass
+
+            await asyncio.to_thread(in_thread)
+            return {"ok": True}
+
+        res = TestClient(app).get("/turn/3")
+        stages = [part.split(";")[0] for part in res.headers["server-timing"].split(", ")]
+        assert stages == ["director_llm", "tts", "total"]
+        assert metrics.REQUEST_SECONDS.count("GET", "/turn/{turn_id}", 200) >= 1
@@ -0,0 +1,83 @@
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from app.agents.director_agent import SCAM_SCRIPTS, DirectorAgent
+from app.agents.scam_classifier import KeywordMatcher, ScamClassifier, normalize
+
+
+class TestKeywordMatcher:
+    def test_normalize_strips_accents_and_case(self):
+        assert normalize("Accès à DISTANCE") == "acces a distance"
+
+    def test_finds_overlapping_patterns(self):
+        matcher = KeywordMatcher(["code", "mot de passe", "passe", "de"])
+        found = {matcher.patterns[i] for i in matcher.find("Votre mot de passe et le code")}
+        assert found == {"code", "mot de passe", "passe", "de"}
+
+    def test_matches_whole_words_only(self):
+        matcher = KeywordMatcher(["nom", "code"])
+        assert matcher.find("un nombre, un codex") == set()
+        assert matcher.find("Votre nom ? Le code !") == {0, 1}
+
+    def test_is_accent_and_case_insensitive(self):
+        matcher = KeywordMatcher(["sécurité", "Télécharger"])
+        assert matcher.find("SECURITE et telecharger") == {0, 1}
+
+
+class TestScamClassifier:
+    classifier = ScamClassifier(SCAM_SCRIPTS)
+
+    def test_unambiguous_message_returns_scripted_stage(self):
+        result = self.classifier.classify("Lisez-moi le code reçu par SMS.", "Arnaqueur: Ici votre banque.")
+        assert result["scam_type"] == "banque"
+        assert result["stage"] == "3"
+        assert result["new_objective"] == SCAM_SCRIPTS["banque"]["stages"]["3"]["objective"]
+        assert result["source"] == "keywords"
+
+    def test_no_signal_returns_none(self):
+        assert self.classifier.classify("Allô ? Vous m'entendez ?") is None
+
+    def test_ambiguous_message_returns_none(self):
+        # "payer" et "frais" : support technique comme colis
+        assert self.classifier.classify("Il faut payer les frais.") is None
+
+    def test_history_breaks_ties(self):
+        result = self.classifier.classify(
+            "Donnez-moi le numéro de votre carte bancaire.",
+            "Arnaqueur: Votre colis est en attente.",
+        )
+        assert (result["scam_type"], result["stage"]) == ("colis", "3")
+
+
+class TestDirectorFastPath:
+    def _director(self, fast_path):
+        with patch("app.agents.director_agent.get_chat_model", return_value=MagicMock()):
+            director = DirectorAgent("fake-key", fast_path=fast_path)
+        director.chain = MagicMock()
+        director.chain.ainvoke = AsyncMock(return_value=MagicMock(
+            content='{"scam_type": "autre", "stage": "1", "new_objective": "Gagner du temps."}'
+        ))
+        return director
+
+    def test_skips_llm_when_unambiguous(self):
+        director = self._director(fast_path=True)
+        result = asyncio.run(director.aupdate_objective(
+            "Installez TeamViewer depuis ce lien.",
+            history_summary="Arnaqueur: Votre ordinateur a un virus.\nJeanne: Un quoi ?",
+        ))
+        assert (result["scam_type"], result["stage"]) == ("support_technique", "2")
+        director.chain.ainvoke.assert_not_awaited()
+
+    def test_ignores_victim_lines_in_history(self):
+        director = self._director(fast_path=True)
+        result = asyncio.run(director.aupdate_objective(
+            "D'accord.", history_summary="Jeanne: Le code de la porte ? Le code SMS ?",
+        ))
+        assert result["scam_type"] == "autre"
+        director.chain.ainvoke.assert_awaited_once()
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv("DIRECTOR_FAST_PATH", raising=False)
+        director = self._director(fast_path=None)
+        asyncio.run(director.aupdate_objective("Lisez-moi le code SMS de votre banque."))
+        director.chain.ainvoke.assert_awaited_once()
@@ -1,11 +1,12 @@
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
 
 from app.agents.scammer_agent import ScammerAgent
 
 
 def _create_agent(api_key="fake-key"):
     """Helper to create a ScammerAgent with all external deps mocked."""
-    with patch("app.agents.scammer_agent.ChatGroq") as mock_chatgroq:
+    with patch("app.agents.scammer_agent.get_chat_model") as mock_chatgroq:
         mock_chatgroq.return_value = MagicMock()
         agent = ScammerAgent(api_key)
     return agent
@@ -49,6 +50,19 @@ class TestRespondWeb:
         assert len(messages) == 2  # user + ai
 
 
+    def test_arespond_web_updates_memory(self, mock_no_google_credentials):
+        agent = _create_agent()
+        mock_result = MagicMock()
+        mock_result.content = "Bonjour madame (sourire)."
+
+        with patch.object(type(agent.chain), "ainvoke", AsyncMock(return_value=mock_result)):
+            segments, clean_text = asyncio.run(agent.arespond_web("Allo ?"))
+
+        assert clean_text == "Bonjour madame ."
+        assert segments == [{"type": "text", "content": clean_text}]
+        assert len(agent.memory.chat_memory.messages) == 2
+
+
 class TestGenerateOpening:
     def test_generate_opening_returns_segments(self, mock_no_google_credentials):
         agent = _create_agent()
@@ -74,6 +88,18 @@ class TestGenerateOpening:
         assert len(messages) == 2
 
 
+    def test_agenerate_opening_saves_to_memory(self, mock_no_google_credentials):
+        agent = _create_agent()
+        mock_result = MagicMock()
+        mock_result.content = "Bonjour madame."
+
+        with patch.object(type(agent.chain), "ainvoke", AsyncMock(return_value=mock_result)):
+            segments, clean_text = asyncio.run(agent.agenerate_opening())
+
+        assert clean_text == "Bonjour madame."
+        assert len(agent.memory.chat_memory.messages) == 2
+
+
 class TestCleanForTts:
     def test_removes_parenthetical_directions(self):
         result = ScammerAgent._clean_for_tts("Bonjour (pause) madame")
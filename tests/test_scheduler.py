@@ -0,0 +1,171 @@
+import asyncio
+import contextvars
+import random
+import time
+from unittest.mock import AsyncMock, patch
+
+import groq
+import httpx
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.core import clients, tracing
+from app.core.metrics import timed
+from app.core.scheduler import COMPLETION_RESERVE, GroqScheduler, TokenBucket
+
+
+def _rate_limited(retry_after="0.05"):
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return groq.RateLimitError("rate limited", response=response, body=None)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    def test_refills_continuously(self):
+        bucket = TokenBucket(60, now=0.0)  # one per second
+        bucket.take(60)
+        assert bucket.delay(1, now=0.0) == pytest.approx(1.0)
+        assert bucket.delay(1, now=1.0) == 0.0
+
+    def test_unlimited(self):
+        bucket = TokenBucket(0, now=0.0)
+        bucket.take(10**6)
+        assert bucket.delay(10**6, now=0.0) == 0.0
+
+
+class TestQueueOrder:
+    def _waiters(self, scheduler, calls):
+        """Enqueue (session, stage) pairs; return the grant order."""
+        order = []
+
+        def enqueue(session, stage):
+            tracing.bind(session, 1)
+            with timed(stage):
+                scheduler._enqueue(10, lambda: order.append((session, stage)))
+
+        for session, stage in calls:
+            contextvars.copy_context().run(enqueue, session, stage)
+        return order
+
+    def test_director_first_then_round_robin_across_sessions(self):
+        clock = _Clock()
+        scheduler = GroqScheduler(rpm=60, clock=clock)
+        scheduler.requests.level = 0
+        order = self._waiters(scheduler, [
+            ("a", "victim_llm"), ("a", "scammer_llm"), ("a", "victim_llm"),
+            ("b", "victim_llm"), ("c", "director_llm"), ("a", "memory_summary"),
+        ])
+        for _ in range(6):
+            clock.now += 1.0
+            scheduler._grant()
+        assert order == [
+            ("c", "director_llm"),
+            ("a", "victim_llm"), ("b", "victim_llm"), ("a", "scammer_llm"), ("a", "victim_llm"),
+            ("a", "memory_summary"),
+        ]
+
+    def test_token_bucket_paces_large_calls(self):
+        clock = _Clock()
+        scheduler = GroqScheduler(tpm=600, clock=clock)  # 10 tokens per second
+        order = []
+        scheduler._enqueue(600, lambda: order.append(1))
+        scheduler._enqueue(300, lambda: order.append(2))
+        assert scheduler._grant() == pytest.approx(30.0)
+        assert order == [1]
+        clock.now = 30.0
+        scheduler._grant()
+        assert order == [1, 2]
+
+
+class TestRetries:
+    def test_rate_limit_pauses_and_retries(self):
+        scheduler = GroqScheduler(rng=random.Random(0))
+        call = AsyncMock(side_effect=[_rate_limited("0.05"), "ok"])
+
+        start = time.perf_counter()
+        result = asyncio.run(scheduler.arun(call, prompt_tokens=10))
+
+        assert result == "ok"
+        assert call.await_count == 2
+        assert time.perf_counter() - start >= 0.05
+        assert scheduler.stats["rate_limited"] == 1
+
+    def test_gives_up_after_max_retries(self):
+        scheduler = GroqScheduler(max_retries=1, rng=random.Random(0))
+        call = AsyncMock(side_effect=_rate_limited("0"))
+        with pytest.raises(groq.RateLimitError):
+            asyncio.run(scheduler.arun(call, prompt_tokens=10))
+        assert call.await_count == 2
+
+    def test_sync_path(self):
+        scheduler = GroqScheduler(rng=random.Random(0))
+        results = iter([_rate_limited("0"), "ok"])
+
+        def call():
+            value = next(results)
+            if isinstance(value, Exception):
+                raise value
+            return value
+
+        assert scheduler.run(call, prompt_tokens=10) == "ok"
+
+    def test_stream_is_not_retried_once_started(self):
+        scheduler = GroqScheduler(rng=random.Random(0))
+
+        async def chunks():
+            yield "a"
+            raise _rate_limited("0")
+
+        async def consume():
+            return [c async for c in scheduler.astream(chunks, prompt_tokens=10)]
+
+        with pytest.raises(groq.RateLimitError):
+            asyncio.run(consume())
+
+    def test_usage_corrects_token_bucket(self):
+        scheduler = GroqScheduler(tpm=6000)
+        result = ChatResult(generations=[ChatGeneration(message=AIMessage(content="x"))],
+                            llm_output={"token_usage": {"total_tokens": 50}})
+        asyncio.run(scheduler.arun(AsyncMock(return_value=result), prompt_tokens=40))
+        # 40 + COMPLETION_RESERVE reserved, 50 used: the difference is given back
+        assert scheduler.tokens.level == pytest.approx(6000 - 50, abs=1)
+        assert COMPLETION_RESERVE > 10
+
+
+class TestScheduledChatGroq:
+    def test_enabled_by_rate_limits(self, monkeypatch):
+        monkeypatch.setenv("GROQ_RPM", "30")
+        clients.reset_clients()
+        try:
+            model = clients.get_chat_model("fake-key", 0.3)
+            assert isinstance(model, clients.ScheduledChatGroq)
+            assert model.max_retries == 0
+        finally:
+            monkeypatch.delenv("GROQ_RPM")
+            clients.reset_clients()
+        assert not isinstance(clients.get_chat_model("fake-key", 0.3), clients.ScheduledChatGroq)
+
+    def test_calls_go_through_the_scheduler(self, monkeypatch):
+        monkeypatch.setenv("GROQ_RPM", "6000")
+        clients.reset_clients()
+        try:
+            model = clients.get_chat_model("fake-key", 0.3)
+            result = ChatResult(generations=[ChatGeneration(message=AIMessage(content="Oui ?"))])
+            with patch("langchain_groq.ChatGroq._agenerate",
+                       AsyncMock(side_effect=[_rate_limited("0"), result])) as parent:
+                reply = asyncio.run(model.ainvoke([HumanMessage(content="Allô")]))
+            assert reply.content == "Oui ?"
+            assert parent.await_count == 2
+            assert clients.scheduler.get_scheduler().stats["granted"] == 2
+        finally:
+            monkeypatch.delenv("GROQ_RPM")
+            clients.reset_clients()
@@ -1,14 +1,23 @@
+import asyncio
 from unittest.mock import patch, MagicMock
-from app.api.session_manager import SessionManager
+from app.api.session_manager import IDEMPOTENCY_MEMORY, SessionManager
 
 
-def _create_session_manager():
+def _create_session_manager(**kwargs):
     with patch("app.api.session_manager.VictimAgent") as MockAgent:
         MockAgent.return_value = MagicMock()
-        sm = SessionManager("fake-key")
+        sm = SessionManager("fake-key", **kwargs)
         return sm, MockAgent
 
 
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
 class TestCreateSession:
     def test_returns_uuid_string(self):
         sm, _ = _create_session_manager()
@@ -56,3 +65,92 @@ class TestTurnCount:
     def test_get_turn_count_nonexistent(self):
         sm, _ = _create_session_manager()
         assert sm.get_turn_count("nonexistent") == 0
+
+
+class TestIdleTtl:
+    def test_idle_session_is_evicted_on_access(self):
+        clock = FakeClock()
+        sm, _ = _create_session_manager(idle_ttl=60, clock=clock)
+        session_id = sm.create_session()
+        clock.now += 61
+        assert sm.get_state(session_id) is None
+        assert sm.is_evicted(session_id)
+        assert sm.stats["evicted_idle"] == 1
+
+    def test_access_refreshes_ttl(self):
+        clock = FakeClock()
+        sm, _ = _create_session_manager(idle_ttl=60, clock=clock)
+        session_id = sm.create_session()
+        for _ in range(3):
+            clock.now += 50
+            assert sm.get_state(session_id) is not None
+
+    def test_reap_expired_evicts_only_idle_sessions(self):
+        clock = FakeClock()
+        sm, _ = _create_session_manager(idle_ttl=60, clock=clock)
+        old = sm.create_session()
+        clock.now += 40
+        fresh = sm.create_session()
+        clock.now += 30
+        assert sm.reap_expired() == 1
+        assert not sm.exists(old)
+        assert sm.exists(fresh)
+
+    def test_deleted_session_is_not_reported_as_evicted(self):
+        sm, _ = _create_session_manager()
+        session_id = sm.create_session()
+        sm.delete(session_id)
+        assert not sm.is_evicted(session_id)
+
+    def test_run_reaper_reaps_in_background(self):
+        clock = FakeClock()
+        sm, _ = _create_session_manager(idle_ttl=60, clock=clock)
+        session_id = sm.create_session()
+        clock.now += 120
+
+        async def scenario():
+            task = asyncio.create_task(sm.run_reaper(interval=0.01))
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        asyncio.run(scenario())
+        assert not sm.exists(session_id)
+
+
+class TestCapacity:
+    def test_evicts_least_recently_used_when_full(self):
+        clock = FakeClock()
+        sm, _ = _create_session_manager(max_sessions=2, clock=clock)
+        first = sm.create_session()
+        second = sm.create_session()
+        sm.get_state(first)  # first becomes most recently used
+        third = sm.create_session()
+        assert sm.exists(first)
+        assert not sm.exists(second)
+        assert sm.exists(third)
+        assert sm.is_evicted(second)
+        assert sm.stats == {
+            "created": 3,
+            "deleted": 0,
+            "evicted_idle": 0,
+            "evicted_capacity": 1,
+            "active": 2,
+        }
+
+
+class TestTurnLock:
+    def test_same_session_shares_a_lock(self):
+        sm, _ = _create_session_manager()
+        first = sm.create_session()
+        second = sm.create_session()
+        lock = sm.lock(first)
+        assert sm.lock(first) is lock
+        assert sm.lock(second) is not lock
+
+    def test_remembered_responses_are_bounded(self):
+        sm, _ = _create_session_manager()
+        state = sm.get_state(sm.create_session())
+        for i in range(IDEMPOTENCY_MEMORY + 3):
+            state.remember_response(f"chat:{i}", "{}")
+        assert len(state.responses) == IDEMPOTENCY_MEMORY
+        assert "chat:0" not in state.responses
@@ -0,0 +1,296 @@
+import socketserver
+import threading
+from unittest.mock import patch, MagicMock
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.api.session_manager import SessionManager, SessionState
+from app.api.session_store import (
+    InMemorySessionStore,
+    RedisClient,
+    RedisSessionStore,
+    SQLiteSessionStore,
+    StaleSession,
+    create_session_store,
+    deserialize_state,
+    serialize_state,
+)
+
+
+def _new_state():
+    """A SessionState with real memories and mocked LLM plumbing."""
+    with patch("app.agents.victim_agent.create_openai_functions_agent"), \
+         patch("app.agents.victim_agent.AgentExecutor"), \
+         patch("app.agents.victim_agent.get_chat_model", return_value=MagicMock()), \
+         patch("app.agents.scammer_agent.get_chat_model", return_value=MagicMock()), \
+         patch("app.agents.director_agent.get_chat_model", return_value=MagicMock()):
+        from app.agents.director_agent import DirectorAgent
+        from app.agents.scammer_agent import ScammerAgent
+        from app.agents.victim_agent import VictimAgent
+        return SessionState(
+            victim=VictimAgent("fake-key"),
+            director=DirectorAgent("fake-key"),
+            scammer=ScammerAgent("fake-key"),
+            last_access=0.0,
+        )
+
+
+def _played_state():
+    state = _new_state()
+    state.turn_count = 3
+    state.is_active = True
+    state.pending_intervention = True
+    state.current_objective = "Demander le nom de la banque"
+    state.scam_type = "faux conseiller"
+    state.stage = "2"
+    state.victim.memory.chat_memory.messages = [
+        HumanMessage(content="Allô, madame Dubois ?"),
+        AIMessage(content="Oui, c'est moi... [PAUSE] qui est à l'appareil ?"),
+    ]
+    state.scammer.memory.chat_memory.messages = [
+        AIMessage(content="Bonjour, service fraude de votre banque."),
+    ]
+    return state
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Just enough of the Redis protocol for RedisSessionStore."""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2])
+            self.wfile.write(self._encode(self._dispatch(args)))
+
+    def _dispatch(self, args):
+        hashes, zsets = self.server.hashes, self.server.zsets
+        cmd, rest = args[0].decode().upper(), args[1:]
+        if cmd == "EVAL":
+            return self._save_script(rest[2:])
+        if cmd in ("SELECT", "EXPIRE"):
+            return "OK" if cmd == "SELECT" else 1
+        if cmd == "HSET":
+            fields = hashes.setdefault(rest[0], {})
+            for i in range(1, len(rest), 2):
+                fields[rest[i]] = rest[i + 1]
+            return len(rest) // 2
+        if cmd == "HMGET":
+            fields = hashes.get(rest[0], {})
+            return [fields.get(name) for name in rest[1:]]
+        if cmd == "DEL":
+            return int(hashes.pop(rest[0], None) is not None)
+        if cmd == "EXISTS":
+            return int(rest[0] in hashes)
+        if cmd == "ZADD":
+            zsets.setdefault(rest[0], {})[rest[2]] = float(rest[1])
+            return 1
+        if cmd == "ZREM":
+            return int(zsets.get(rest[0], {}).pop(rest[1], None) is not None)
+        if cmd == "ZCARD":
+            return len(zsets.get(rest[0], {}))
+        ordered = sorted(zsets.get(rest[0], {}).items(), key=lambda item: item[1])
+        if cmd == "ZRANGE":
+            start, stop = int(rest[1]), int(rest[2])
+            return [member for member, _ in ordered[start:stop + 1]]
+        if cmd == "ZRANGEBYSCORE":
+            limit = float(rest[2].lstrip(b"("))
+            return [member for member, score in ordered if score < limit]
+        return RuntimeError(f"unknown command {cmd}")
+
+    def _save_script(self, args):
+        """The versioned save of RedisSessionStore (_SAVE_SCRIPT)."""
+        key, index, expected, data, last_access, session_id = args
+        fields = self.server.hashes.get(key, {})
+        if b"version" in fields and fields[b"version"] != expected:
+            return 0
+        self.server.hashes[key] = {**fields, b"data": data, b"last_access": last_access,
+                                   b"version": str(int(expected) + 1).encode()}
+        self.server.zsets.setdefault(index, {})[session_id] = float(last_access)
+        return 1
+
+    def _encode(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, RuntimeError):
+            return b"-ERR %s\r\n" % str(value).encode()
+        if isinstance(value, str):
+            return b"+%s\r\n" % value.encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, bytes):
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        return b"*%d\r\n" % len(value) + b"".join(self._encode(v) for v in value)
+
+
+@pytest.fixture
+def fake_redis():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.hashes, server.zsets = {}, {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path, fake_redis):
+    if request.param == "memory":
+        yield InMemorySessionStore()
+    elif request.param == "sqlite":
+        yield SQLiteSessionStore(str(tmp_path / "sessions.db"), _new_state)
+    else:
+        client = RedisClient(*fake_redis.server_address)
+        yield RedisSessionStore(client, _new_state, key_ttl=3600)
+        client.close()
+
+
+class TestSerialization:
+    def test_round_trip_restores_state_and_memories(self):
+        blob = serialize_state(_played_state())
+        restored = deserialize_state(blob, _new_state())
+
+        assert restored.turn_count == 3
+        assert restored.is_active is True
+        assert restored.pending_intervention is True
+        assert restored.current_objective == "Demander le nom de la banque"
+        assert restored.scam_type == "faux conseiller"
+        assert restored.stage == "2"
+        victim_messages = restored.victim.memory.chat_memory.messages
+        assert [type(m) for m in victim_messages] == [HumanMessage, AIMessage]
+        assert victim_messages[1].content == "Oui, c'est moi... [PAUSE] qui est à l'appareil ?"
+        assert restored.scammer.memory.chat_memory.messages[0].content.startswith("Bonjour")
+
+    def test_snapshot_is_compact(self):
+        assert len(serialize_state(_played_state())) < 400
+
+
+class TestSessionStores:
+    def test_save_and_load(self, store):
+        state = _played_state()
+        state.last_access = 10.0
+        store.save("a", state)
+        loaded = store.load("a")
+        assert loaded.turn_count == 3
+        assert loaded.last_access == 10.0
+        assert len(loaded.victim.memory.chat_memory.messages) == 2
+
+    def test_load_missing_returns_none(self, store):
+        assert store.load("missing") is None
+
+    def test_delete(self, store):
+        store.save("a", _played_state())
+        assert store.delete("a") is True
+        assert store.delete("a") is False
+        assert not store.exists("a")
+        assert store.count() == 0
+
+    def test_stale_save_is_refused(self, store):
+        if isinstance(store, InMemorySessionStore):
+            pytest.skip("live objects: one process, serialized by the session lock")
+        store.save("a", _played_state())
+        first, second = store.load("a"), store.load("a")
+        first.turn_count = 4
+        store.save("a", first)
+        second.turn_count = 4
+        with pytest.raises(StaleSession):
+            store.save("a", second)
+
+        # The winner can keep going; a reload picks up its version
+        first.turn_count = 5
+        store.save("a", first)
+        assert store.load("a").turn_count == 5
+        assert store.load("a").version == first.version
+
+    def test_touch_updates_lru_order_and_idle_scan(self, store):
+        for i, session_id in enumerate(["a", "b", "c"]):
+            state = _new_state()
+            state.last_access = float(i)
+            store.save(session_id, state)
+        store.touch("a", 10.0)
+
+        assert store.oldest() == "b"
+        assert store.idle_since(5.0) == ["b", "c"]
+        assert store.load("a").last_access == 10.0
+        assert store.count() == 3
+
+
+class TestSharedStore:
+    def test_two_managers_share_sessions_through_sqlite(self, tmp_path):
+        url = f"sqlite:///{tmp_path / 'sessions.db'}"
+        with patch("app.api.session_manager.SessionManager._new_state", lambda self: _new_state()):
+            worker_a = SessionManager("fake-key", clock=lambda: 1.0,
+                                      store=create_session_store(url, _new_state))
+            worker_b = SessionManager("fake-key", clock=lambda: 1.0,
+                                      store=create_session_store(url, _new_state))
+
+            session_id = worker_a.create_session()
+            state = worker_b.get_state(session_id)
+            state.turn_count += 1
+            state.victim.memory.chat_memory.add_user_message("Allô ?")
+            worker_b.save(session_id, state)
+
+            reloaded = worker_a.get_state(session_id)
+        assert reloaded.turn_count == 1
+        assert reloaded.victim.memory.chat_memory.messages[0].content == "Allô ?"
+
+    def test_overlapping_turns_on_two_workers_do_not_lose_one(self, tmp_path):
+        url = f"sqlite:///{tmp_path / 'sessions.db'}"
+        with patch("app.api.session_manager.SessionManager._new_state", lambda self: _new_state()):
+            worker_a = SessionManager("fake-key", clock=lambda: 1.0,
+                                      store=create_session_store(url, _new_state))
+            worker_b = SessionManager("fake-key", clock=lambda: 1.0,
+                                      store=create_session_store(url, _new_state))
+            session_id = worker_a.create_session()
+            turn_a = worker_a.get_state(session_id)
+            turn_b = worker_b.get_state(session_id)
+
+            turn_a.victim.memory.chat_memory.add_user_message("Allô ?")
+            worker_a.save(session_id, turn_a)
+            turn_b.victim.memory.chat_memory.add_user_message("Vous êtes là ?")
+            with pytest.raises(StaleSession):
+                worker_b.save(session_id, turn_b)
+
+            messages = worker_a.get_state(session_id).victim.memory.chat_memory.messages
+        assert [m.content for m in messages] == ["Allô ?"]
+
+    def test_sqlite_file_without_version_column_is_upgraded(self, tmp_path):
+        import sqlite3
+        path = str(tmp_path / "sessions.db")
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, "
+                   "last_access REAL NOT NULL)")
+        db.execute("INSERT INTO sessions VALUES (?, ?, ?)",
+                   ("a", serialize_state(_played_state()), 1.0))
+        db.commit()
+        db.close()
+
+        store = SQLiteSessionStore(path, _new_state)
+        state = store.load("a")
+        assert state.version == 0
+        store.save("a", state)
+        assert store.load("a").version == 1
+
+    def test_sqlite_url_paths_follow_sqlalchemy(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        create_session_store("sqlite:///relative.db", _new_state)
+        assert (tmp_path / "relative.db").exists()
+
+        absolute = tmp_path / "data" / "absolute.db"
+        absolute.parent.mkdir()
+        create_session_store(f"sqlite:///{absolute}", _new_state)  # sqlite:////tmp/...
+        assert absolute.exists()
+
+        with pytest.raises(ValueError):
+            create_session_store("sqlite://host/sessions.db", _new_state)
+
+    def test_unknown_store_url_raises(self):
+        with pytest.raises(ValueError):
+            create_session_store("mongodb://localhost", _new_state)
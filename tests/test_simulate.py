@@ -0,0 +1,151 @@
+import asyncio
+import io
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+import simulate
+from app.api.session_manager import SessionState
+from app.core import tracing
+from simulate import choice_picker, run, simulate_conversation
+
+
+def _state(max_turns=4):
+    state = SessionState(victim=MagicMock(), director=MagicMock(), scammer=MagicMock(),
+                         max_turns=max_turns)
+    state.director.aupdate_objective = AsyncMock(return_value={
+        "scam_type": "banque", "stage": "2", "stage_description": "identité",
+        "new_objective": "Chercher ses lunettes.",
+    })
+    state.victim.arespond_web = AsyncMock(return_value=([], "Attendez..."))
+    state.scammer.agenerate_opening = AsyncMock(return_value=([], "Bonjour, votre banque."))
+    state.scammer.arespond_web = AsyncMock(return_value=([], "Votre code, vite."))
+    return state
+
+
+class TestChoicePicker:
+    def test_scripted_choices_cycle(self):
+        pick = choice_picker("4,2", seed=0)
+        assert [pick() for _ in range(3)] == ["4", "2", "4"]
+
+    def test_random_choices_are_seeded(self):
+        a, b = choice_picker("random", 7), choice_picker("random", 7)
+        assert [a() for _ in range(5)] == [b() for _ in range(5)]
+
+    def test_unknown_choice_rejected(self):
+        with pytest.raises(ValueError):
+            choice_picker("4,9", seed=0)
+
+
+class TestSimulateConversation:
+    def test_runs_to_max_turns_with_interventions(self):
+        state = _state(max_turns=4)
+        transcript = asyncio.run(simulate_conversation(state, choice_picker("4", 0)))
+
+        turns = transcript["turns"]
+        assert transcript["opening"] == "Bonjour, votre banque."
+        assert [t["turn"] for t in turns] == [1, 2, 3, 4]
+        # An intervention follows every second turn, then the scammer waits
+        assert "choice" not in turns[1] and turns[2]["choice"] == "4"
+        assert "scammer_ms" not in turns[1]["timings"]
+        assert turns[2]["scammer"] == "Votre code, vite."
+        assert turns[0]["director"]["objective"] == "Chercher ses lunettes."
+        assert set(turns[0]["timings"]) == {"director_ms", "victim_ms", "scammer_ms"}
+        assert not state.is_active
+
+    def test_pipelined_mode_matches_the_http_path(self):
+        state = _state(max_turns=2)
+        first_objective = state.current_objective
+        transcript = asyncio.run(simulate_conversation(state, choice_picker("4", 0), pipelined=True))
+
+        # The victim answers on the objective from before the director's result
+        first_call = state.victim.arespond_web.await_args_list[0].kwargs
+        assert first_call["objective"] == first_objective
+        assert "director_ms" not in transcript["turns"][0]["timings"]
+        assert transcript["turns"][0]["director"]["objective"] == "Chercher ses lunettes."
+
+    def test_binds_session_and_turn_for_tracing(self):
+        state = _state(max_turns=2)
+        seen = []
+
+        async def respond(text):
+            seen.append(dict(tracing.current_context()))
+            return [], "Votre code, vite."
+
+        state.scammer.arespond_web = AsyncMock(side_effect=respond)
+        asyncio.run(simulate_conversation(state, choice_picker("4", 0), session_id="sim-1"))
+        assert seen == [{"session_id": "sim-1", "turn": 1}]
+
+    def test_hang_up_ends_the_conversation(self):
+        state = _state(max_turns=10)
+        transcript = asyncio.run(simulate_conversation(state, choice_picker("1", 0)))
+        assert len(transcript["turns"]) == 3
+        assert transcript["hung_up"] is True
+        constraint = state.victim.arespond_web.await_args.kwargs["constraint"]
+        assert "raccrocher" in constraint
+
+
+class TestRun:
+    def test_streams_transcripts_and_bounds_concurrency(self):
+        running = {"now": 0, "max": 0}
+
+        def make_state():
+            state = _state(max_turns=2)
+
+            async def opening():
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+                await asyncio.sleep(0.01)
+                running["now"] -= 1
+                return [], "Allô ?"
+
+            state.scammer.agenerate_opening = AsyncMock(side_effect=opening)
+            return state
+
+        out = io.StringIO()
+        summary = asyncio.run(run(6, make_state, lambda i: choice_picker("4", i), out,
+                                  concurrency=2))
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert sorted(r["id"] for r in records) == list(range(6))
+        assert running["max"] == 2
+        assert summary["errors"] == 0
+        assert summary["turns"] == 12
+        assert "p95" in summary["victim_ms"]
+
+    def test_failed_conversation_is_recorded(self):
+        def make_state():
+            state = _state()
+            state.scammer.agenerate_opening = AsyncMock(side_effect=RuntimeError("429 rate limit"))
+            return state
+
+        out = io.StringIO()
+        summary = asyncio.run(run(2, make_state, lambda i: choice_picker("4", i), out))
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert summary["errors"] == 2
+        assert records[0]["error"] == "RuntimeError: 429 rate limit"
+
+
+class TestMain:
+    def test_stdout_only_carries_jsonl(self, capsys):
+        def make_state(api_key, max_turns, tts):
+            state = _state(max_turns=2)
+
+            async def noisy_opening():
+                print("✓ Google TTS client initialized (v1)")
+                return [], "Allô ?"
+
+            state.scammer.agenerate_opening = AsyncMock(side_effect=noisy_opening)
+            return state
+
+        argv = ["simulate.py", "-n", "2", "--choices", "4"]
+        with patch("sys.argv", argv), patch("simulate.load_config", return_value="key"), \
+                patch("simulate.new_state", side_effect=make_state):
+            simulate.main()
+
+        out, err = capsys.readouterr()
+        records = [json.loads(line) for line in out.splitlines()]
+        assert len(records) == 2
+        assert records[0]["session_id"] != records[1]["session_id"]
+        assert "TTS client initialized" in err
@@ -0,0 +1,110 @@
+import asyncio
+from unittest.mock import MagicMock, AsyncMock
+
+from app.api.speculation import Speculator
+
+CONSTRAINTS = {"1": "raccroche", "2": "carte", "3": "malaise", "4": "Aucune"}
+
+
+def _make_state(delay=0.0):
+    state = MagicMock()
+    state.turn_count = 2
+    state.script_hint = "banque"
+    state.current_objective = "Gagner du temps."
+    state.victim.get_history_summary.return_value = "Aucun historique"
+    state.director.aupdate_objective = AsyncMock(return_value={"new_objective": "Poser des questions."})
+    state.forks = []
+
+    def fork():
+        victim = MagicMock()
+
+        async def respond(user_input, objective, constraint):
+            await asyncio.sleep(delay)
+            return [{"type": "text", "content": constraint}], f"{objective} / {constraint}"
+
+        victim.arespond_web = AsyncMock(side_effect=respond)
+        victim.dump_memory.return_value = {"messages": [["a", "fork"]]}
+        state.forks.append(victim)
+        return victim
+
+    state.victim.fork.side_effect = fork
+    return state
+
+
+class TestSpeculator:
+    def test_disabled_does_nothing(self):
+        speculator = Speculator(enabled=False)
+        assert speculator.start("s", _make_state(), "Allô", CONSTRAINTS) is False
+        assert speculator.stats["started"] == 0
+
+    def test_hit_returns_chosen_branch_and_runs_director_once(self):
+        speculator = Speculator(enabled=True)
+        state = _make_state()
+
+        async def scenario():
+            speculator.start("s", state, "Allô", CONSTRAINTS)
+            await asyncio.sleep(0.01)
+            return await speculator.take("s", state, "2", "Allô")
+
+        branch = asyncio.run(scenario())
+        assert branch.text == "Poser des questions. / carte"
+        assert branch.memory == {"messages": [["a", "fork"]]}
+        assert len(state.forks) == 4
+        assert state.director.aupdate_objective.await_count == 1
+        assert speculator.stats["hits"] == 1
+        assert speculator.stats["hits_ready"] == 1
+
+    def test_take_waits_for_running_branch_and_cancels_others(self):
+        speculator = Speculator(enabled=True)
+        state = _make_state(delay=0.05)
+
+        async def scenario():
+            speculator.start("s", state, "Allô", CONSTRAINTS)
+            branch = await speculator.take("s", state, "1", "Allô")
+            await asyncio.sleep(0)
+            return branch
+
+        branch = asyncio.run(scenario())
+        stats = speculator.stats
+        assert branch.text.endswith("raccroche")
+        assert stats["hits_ready"] == 0
+        assert stats["hit_wait_seconds"] > 0
+        assert stats["cancelled"] == 3
+        assert stats["inflight"] == 0
+
+    def test_stale_speculation_is_a_miss(self):
+        speculator = Speculator(enabled=True)
+        state = _make_state()
+
+        async def scenario():
+            speculator.start("s", state, "Allô", CONSTRAINTS)
+            state.turn_count += 1
+            return await speculator.take("s", state, "2", "Allô")
+
+        assert asyncio.run(scenario()) is None
+        assert speculator.stats["misses"] == 1
+
+    def test_budget_limits_branches(self):
+        speculator = Speculator(enabled=True, max_inflight=6)
+
+        async def scenario():
+            first = speculator.start("a", _make_state(delay=1), "Allô", CONSTRAINTS)
+            second = speculator.start("b", _make_state(delay=1), "Allô", CONSTRAINTS)
+            speculator.discard("a")
+            await asyncio.sleep(0)
+            return first, second
+
+        assert asyncio.run(scenario()) == (True, False)
+        assert speculator.stats["skipped_budget"] == 1
+
+    def test_failed_branch_falls_back(self):
+        speculator = Speculator(enabled=True)
+        state = _make_state()
+        state.director.aupdate_objective = AsyncMock(side_effect=RuntimeError("groq down"))
+
+        async def scenario():
+            speculator.start("s", state, "Allô", CONSTRAINTS)
+            return await speculator.take("s", state, "2", "Allô")
+
+        assert asyncio.run(scenario()) is None
+        assert speculator.stats["misses"] == 1
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from app.core import tracing
+from app.core.metrics import timed
+from app.core.tracing import TraceCallbackHandler, TraceWriter, aggregate, load_spans
+
+
+def _read(directory):
+    return list(load_spans(str(directory)))
+
+
+@pytest.fixture
+def trace_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRACE_DIR", str(tmp_path))
+    tracing.shutdown()
+    yield tmp_path
+    tracing.shutdown()
+
+
+class TestTraceWriter:
+    def test_close_flushes_queued_spans(self, tmp_path):
+        writer = TraceWriter(str(tmp_path), flush_interval=60)
+        for i in range(5):
+            writer.emit({"i": i})
+        writer.close()
+        assert [s["i"] for s in _read(tmp_path)] == [0, 1, 2, 3, 4]
+        assert writer.written == 5
+
+    def test_rotates_past_max_bytes(self, tmp_path):
+        writer = TraceWriter(str(tmp_path), batch_size=1, max_bytes=40)
+        for i in range(4):
+            writer.emit({"payload": "x" * 20, "i": i})
+        writer.close()
+        assert len(os.listdir(tmp_path)) == 4
+        assert sorted(s["i"] for s in _read(tmp_path)) == [0, 1, 2, 3]
+
+    def test_full_queue_drops_instead_of_blocking(self, tmp_path):
+        writer = TraceWriter(str(tmp_path), max_queue=1)
+        writer._queue.put(None)  # writer thread stops, nothing drains the queue
+        writer._thread.join()
+        writer.emit({"i": 1})
+        writer.emit({"i": 2})
+        assert writer.dropped >= 1
+
+
+class TestEmit:
+    def test_disabled_without_trace_dir(self, monkeypatch):
+        monkeypatch.delenv("TRACE_DIR", raising=False)
+        tracing.shutdown()
+        tracing.emit("tts", characters=3)
+        assert tracing.get_writer() is None
+
+    def test_span_carries_bound_turn_and_stage(self, trace_dir):
+        async def turn():
+            tracing.bind("s1", 3)
+            # Tasks inherit the binding
+            await asyncio.create_task(asyncio.to_thread(_synth))
+
+        def _synth():
+            with timed("tts"), tracing.span("tts", characters=12):
+                pass
+
+        asyncio.run(turn())
+        tracing.shutdown()
+        [span] = _read(trace_dir)
+        assert span["session_id"] == "s1"
+        assert span["turn"] == 3
+        assert span["stage"] == "tts"
+        assert span["characters"] == 12
+        assert "wall_ms" in span
+
+    def test_span_records_errors(self, trace_dir):
+        with pytest.raises(RuntimeError):
+            with tracing.span("tts", characters=1):
+                raise RuntimeError("quota")
+        tracing.shutdown()
+        assert _read(trace_dir)[0]["error"] == "RuntimeError"
+
+
+class TestCallbackHandler:
+    def _run(self, handler, result, stage="victim_llm"):
+        run_id = uuid4()
+        messages = [[SystemMessage(content="Tu es Jeanne."), HumanMessage(content="Allô ?")]]
+        with timed(stage):
+            handler.on_chat_model_start({}, messages, run_id=run_id,
+                                        invocation_params={"model": "llama-3.1-8b-instant"})
+        handler.on_llm_end(result, run_id=run_id)
+
+    def test_uses_groq_token_usage(self, trace_dir):
+        result = LLMResult(
+            generations=[[ChatGeneration(message=AIMessage(content="Oui ?"))]],
+            llm_output={"token_usage": {"prompt_tokens": 120, "completion_tokens": 8}},
+        )
+        self._run(TraceCallbackHandler(), result)
+        tracing.shutdown()
+        [span] = _read(trace_dir)
+        assert span["kind"] == "llm"
+        assert span["stage"] == "victim_llm"
+        assert span["model"] == "llama-3.1-8b-instant"
+        assert (span["prompt_tokens"], span["completion_tokens"]) == (120, 8)
+        assert "tokens_estimated" not in span
+
+    def test_estimates_tokens_without_usage(self, trace_dir):
+        result = LLMResult(generations=[[ChatGeneration(message=AIMessage(content="Oui, qui est là ?"))]])
+        self._run(TraceCallbackHandler(), result)
+        tracing.shutdown()
+        [span] = _read(trace_dir)
+        assert span["tokens_estimated"] is True
+        assert span["prompt_tokens"] > 0 and span["completion_tokens"] > 0
+
+    def test_error_span(self, trace_dir):
+        handler = TraceCallbackHandler()
+        run_id = uuid4()
+        handler.on_chat_model_start({}, [[HumanMessage(content="x")]], run_id=run_id)
+        handler.on_llm_error(TimeoutError(), run_id=run_id)
+        tracing.shutdown()
+        assert _read(trace_dir)[0]["error"] == "TimeoutError"
+
+
+class TestReport:
+    SPANS = [
+        {"kind": "llm", "stage": "victim_llm", "session_id": "a", "model": "llama-3.1-8b-instant",
+         "prompt_tokens": 1_000_000, "completion_tokens": 0, "wall_ms": 100},
+        {"kind": "llm", "stage": "victim_llm", "session_id": "b", "model": "llama-3.1-8b-instant",
+         "prompt_tokens": 0, "completion_tokens": 1_000_000, "wall_ms": 300, "error": "Timeout"},
+        {"kind": "tts", "stage": "tts", "session_id": "a", "characters": 1_000_000, "wall_ms": 50},
+    ]
+
+    def test_aggregates_per_stage_and_session(self):
+        report = aggregate(self.SPANS)
+        victim = report["stages"]["victim_llm"]
+        assert victim["calls"] == 2
+        assert victim["errors"] == 1
+        assert victim["p50_ms"] == 300
+        assert victim["cost_usd"] == pytest.approx(0.13)
+        assert report["stages"]["tts"]["cost_usd"] == pytest.approx(16.0)
+        assert report["sessions"] == 2
+        assert report["cost_per_session_usd"] == pytest.approx((16.13) / 2)
+
+    def test_cli_json(self, tmp_path, capsys):
+        with open(tmp_path / "spans.jsonl", "w") as f:
+            f.write("\n".join(json.dumps(s) for s in self.SPANS) + "\n")
+        tracing.main(["report", str(tmp_path), "--json"])
+        assert json.loads(capsys.readouterr().out)["stages"]["tts"]["characters"] == 1_000_000
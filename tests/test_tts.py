@@ -0,0 +1,179 @@
+from unittest.mock import MagicMock
+
+import pytest
+from google.cloud import texttospeech
+
+from app.core.circuit_breaker import OPEN, CircuitOpen
+from app.core.tts import TTSCache, get_tts_breaker, get_tts_cache, synthesize_ssml
+
+
+def _voice(name="fr-FR-Neural2-E"):
+    return texttospeech.VoiceSelectionParams(language_code="fr-FR", name=name)
+
+
+def _audio_config():
+    return texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
+
+
+def _mock_client(audio=b"fake-audio"):
+    client = MagicMock()
+    response = MagicMock()
+    response.audio_content = audio
+    client.synthesize_speech.return_value = response
+    return client
+
+
+class TestMakeKey:
+    def test_same_inputs_same_key(self):
+        a = TTSCache.make_key("<speak>Attendez</speak>", _voice(), _audio_config())
+        b = TTSCache.make_key("<speak>Attendez</speak>", _voice(), _audio_config())
+        assert a == b
+
+    def test_voice_changes_key(self):
+        a = TTSCache.make_key("<speak>Allo</speak>", _voice("fr-FR-Neural2-E"), _audio_config())
+        b = TTSCache.make_key("<speak>Allo</speak>", _voice("fr-FR-Neural2-D"), _audio_config())
+        assert a != b
+
+
+class TestMemoryTier:
+    def test_miss_then_hit(self):
+        cache = TTSCache(max_bytes=100)
+        assert cache.get("k") is None
+        cache.put("k", b"abc")
+        assert cache.get("k") == b"abc"
+        assert cache.stats["hits"] == 1
+        assert cache.stats["misses"] == 1
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = TTSCache(max_bytes=10)
+        cache.put("a", b"xxxx")
+        cache.put("b", b"yyyy")
+        cache.get("a")
+        cache.put("c", b"zzzz")
+        assert cache.get("b") is None
+        assert cache.get("a") == b"xxxx"
+        assert cache.stats["evictions"] == 1
+        assert cache.stats["bytes"] == 8
+
+    def test_skips_entries_larger_than_budget(self):
+        cache = TTSCache(max_bytes=2)
+        cache.put("big", b"xxxx")
+        assert cache.stats["entries"] == 0
+
+
+class TestDiskTier:
+    def test_survives_new_instance_after_flush(self, tmp_path):
+        cache = TTSCache(disk_dir=str(tmp_path))
+        cache.put("abcd", b"mp3")
+        cache.flush()
+        restarted = TTSCache(disk_dir=str(tmp_path))
+        assert restarted.get("abcd") == b"mp3"
+        assert restarted.stats["disk_hits"] == 1
+
+    def test_disk_hit_promotes_to_memory(self, tmp_path):
+        cache = TTSCache(disk_dir=str(tmp_path))
+        cache.put("abcd", b"mp3")
+        cache.flush()
+        restarted = TTSCache(disk_dir=str(tmp_path))
+        restarted.get("abcd")
+        restarted.get("abcd")
+        assert restarted.stats["disk_hits"] == 1
+        assert restarted.stats["entries"] == 1
+
+    def test_written_to_disk_only_on_eviction(self, tmp_path):
+        cache = TTSCache(max_bytes=4, disk_dir=str(tmp_path))
+        cache.put("aaaa", b"1111")
+        assert cache.stats["disk_entries"] == 0
+        cache.put("bbbb", b"2222")
+        assert cache.stats["disk_entries"] == 1
+        assert (tmp_path / "aa" / "aaaa.bin").read_bytes() == b"1111"
+
+    def test_disk_tier_is_a_bounded_lru(self, tmp_path):
+        cache = TTSCache(max_bytes=4, disk_dir=str(tmp_path), disk_max_bytes=8)
+        for key in ("aaaa", "bbbb", "cccc", "dddd"):
+            cache.put(key, key.encode())
+        # aaaa, bbbb, cccc spilled; aaaa dropped to stay under 8 bytes
+        assert cache.stats["disk_bytes"] == 8
+        assert cache.stats["disk_evictions"] == 1
+        assert not (tmp_path / "aa" / "aaaa.bin").exists()
+        assert cache.get("aaaa") is None
+
+        restarted = TTSCache(max_bytes=4, disk_dir=str(tmp_path), disk_max_bytes=4)
+        assert restarted.stats["disk_entries"] == 1
+
+
+class TestSynthesizeSsml:
+    def test_identical_request_synthesized_once(self):
+        client = _mock_client()
+        for _ in range(3):
+            audio = synthesize_ssml(client, "<speak>Pardon ?</speak>", _voice(), _audio_config())
+        assert audio == b"fake-audio"
+        client.synthesize_speech.assert_called_once()
+        stats = get_tts_cache().stats
+        assert stats["hits"] == 2
+        assert stats["saved_chars"] == 2 * len("<speak>Pardon ?</speak>")
+
+    def test_empty_audio_not_cached(self):
+        client = _mock_client(audio=b"")
+        synthesize_ssml(client, "<speak></speak>", _voice(), _audio_config())
+        synthesize_ssml(client, "<speak></speak>", _voice(), _audio_config())
+        assert client.synthesize_speech.call_count == 2
+
+
+class TestSynthesizeSsmlWithMarks:
+    def test_returns_audio_and_marks_and_caches_both(self):
+        from google.cloud import texttospeech_v1beta1
+
+        from app.core.tts import synthesize_ssml_with_marks
+
+        client = MagicMock()
+        timepoint = MagicMock()
+        timepoint.mark_name = "t0"
+        timepoint.time_seconds = 0.25
+        client.synthesize_speech.return_value = MagicMock(
+            audio_content=b"turn-audio", timepoints=[timepoint]
+        )
+        voice = texttospeech_v1beta1.VoiceSelectionParams(language_code="fr-FR")
+        config = texttospeech_v1beta1.AudioConfig(
+            audio_encoding=texttospeech_v1beta1.AudioEncoding.MP3
+        )
+
+        first = synthesize_ssml_with_marks(client, "<speak>x</speak>", voice, config)
+        second = synthesize_ssml_with_marks(client, "<speak>x</speak>", voice, config)
+
+        assert first == (b"turn-audio", {"t0": 0.25})
+        assert second == first
+        client.synthesize_speech.assert_called_once()
+        request = client.synthesize_speech.call_args.kwargs["request"]
+        assert list(request.enable_time_pointing) == [
+            texttospeech_v1beta1.SynthesizeSpeechRequest.TimepointType.SSML_MARK
+        ]
+
+
+class TestBreaker:
+    def test_outage_short_circuits_synthesis(self):
+        client = _mock_client()
+        client.synthesize_speech.side_effect = RuntimeError("503 unavailable")
+        for i in range(3):
+            with pytest.raises(RuntimeError):
+                synthesize_ssml(client, f"<speak>{i}</speak>", _voice(), _audio_config())
+        assert get_tts_breaker().state == OPEN
+
+        with pytest.raises(CircuitOpen):
+            synthesize_ssml(client, "<speak>Allô ?</speak>", _voice(), _audio_config())
+        assert client.synthesize_speech.call_count == 3
+
+    def test_cached_audio_served_while_open(self):
+        synthesize_ssml(_mock_client(), "<speak>Oui</speak>", _voice(), _audio_config())
+        breaker = get_tts_breaker()
+        for _ in range(breaker.failures):
+            breaker.after_call(breaker.before_call(), 0.0, RuntimeError("down"))
+
+        audio = synthesize_ssml(_mock_client(), "<speak>Oui</speak>", _voice(), _audio_config())
+        assert audio == b"fake-audio"
+
+    def test_deadline_passed_when_configured(self, monkeypatch):
+        monkeypatch.setenv("TTS_TIMEOUT", "2.5")
+        client = _mock_client()
+        synthesize_ssml(client, "<speak>Hein ?</speak>", _voice(), _audio_config())
+        assert client.synthesize_speech.call_args.kwargs["timeout"] == 2.5
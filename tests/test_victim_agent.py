@@ -1,15 +1,19 @@
+import asyncio
 import re
-from unittest.mock import patch, MagicMock
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
 
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from langchain_core.messages import HumanMessage, AIMessage
 
 from app.agents.victim_agent import VictimAgent
+from app.core.audio_store import audio_id_from_url
 
 
 def _create_agent(api_key="fake-key"):
     """Helper to create a VictimAgent with all external deps mocked."""
     with patch("app.agents.victim_agent.create_openai_functions_agent") as mock_create, \
-         patch("app.agents.victim_agent.ChatGroq") as mock_chatgroq, \
+         patch("app.agents.victim_agent.get_chat_model") as mock_chatgroq, \
          patch("app.agents.victim_agent.AgentExecutor") as mock_executor_cls:
         mock_chatgroq.return_value = MagicMock()
         mock_create.return_value = MagicMock()
@@ -127,6 +131,160 @@ class TestRespond:
         assert "[PAUSE]" not in result
 
 
+class TestRespondWeb:
+    def test_respond_web_builds_segments(self, mock_no_google_credentials):
+        agent = _create_agent()
+        agent.executor.invoke.return_value = {
+            "output": "Attendez [DOORBELL] je reviens [PAUSE] pardon"
+        }
+
+        segments, clean_text = agent.respond_web("Hello")
+        assert [s["type"] for s in segments] == ["text", "sound", "text", "pause", "text"]
+        assert segments[1]["sound_file"] == "/static/sounds/doorbell.mp3"
+        assert "[DOORBELL]" not in clean_text
+
+    def test_arespond_web_matches_respond_web(self, mock_no_google_credentials):
+        agent = _create_agent()
+        output = {"output": "Oui [DOG_BARK] Poupoune ! [PAUSE] Pardon ?"}
+        agent.executor.invoke.return_value = output
+        agent.executor.ainvoke = AsyncMock(return_value=output)
+
+        expected = agent.respond_web("Hello")
+        assert asyncio.run(agent.arespond_web("Hello")) == expected
+
+    def test_arespond_web_synthesizes_segments_concurrently(self, mock_no_google_credentials):
+        agent = _create_agent()
+        agent.executor.ainvoke = AsyncMock(return_value={
+            "output": "Un [DOG_BARK] deux [DOORBELL] trois"
+        })
+
+        def slow_tts(**kwargs):
+            time.sleep(0.2)
+            response = MagicMock()
+            response.audio_content = b"audio"
+            return response
+
+        agent.tts_client = MagicMock()
+        agent.tts_client.synthesize_speech.side_effect = slow_tts
+
+        start = time.perf_counter()
+        segments, _ = asyncio.run(agent.arespond_web("Hello"))
+        elapsed = time.perf_counter() - start
+
+        assert agent.tts_client.synthesize_speech.call_count == 3
+        assert all(s["tts_url"] for s in segments if s["type"] == "text")
+        assert elapsed < 0.5
+
+    def test_aiter_audio_yields_each_synthesized_segment(self, mock_no_google_credentials):
+        agent = _create_agent()
+        agent.tts_client = MagicMock()
+        agent.tts_client.synthesize_speech.return_value = MagicMock(audio_content=b"a")
+        segments = agent._build_segments("Un [PAUSE] deux")
+
+        async def collect():
+            return [i async for i in agent.aiter_audio(segments)]
+
+        assert sorted(asyncio.run(collect())) == [0, 2]
+        assert "tts_url" in segments[2]
+
+    def test_tts_error_keeps_text_segment(self, mock_no_google_credentials):
+        agent = _create_agent()
+        agent.executor.ainvoke = AsyncMock(return_value={"output": "Bonjour"})
+        agent.tts_client = MagicMock()
+        agent.tts_client.synthesize_speech.side_effect = Exception("TTS down")
+
+        segments, _ = asyncio.run(agent.arespond_web("Hello"))
+        assert segments == [{"type": "text", "content": "Bonjour"}]
+
+    def test_tts_outage_stops_after_breaker_opens(self, mock_no_google_credentials):
+        agent = _create_agent()
+        agent.executor.invoke.return_value = {
+            "output": "Un [PAUSE] deux [PAUSE] trois [PAUSE] quatre [PAUSE] cinq"
+        }
+        agent.tts_client = MagicMock()
+        agent.tts_client.synthesize_speech.side_effect = Exception("deadline exceeded")
+
+        segments, _ = agent.respond_web("Hello")
+        assert all("tts_url" not in s for s in segments)
+        assert agent.tts_client.synthesize_speech.call_count == 3
+
+
+def _timepoint(name, seconds):
+    tp = MagicMock()
+    tp.mark_name = name
+    tp.time_seconds = seconds
+    return tp
+
+
+class TestTurnSynthesis:
+    # MPEG-2 Layer III frames of 24 ms (see tests/test_audio.py)
+    FRAME = bytes([0xFF, 0xF3, 0x44, 0xC4]) + b"\x00" * 92
+
+    def _turn_agent(self):
+        agent = _create_agent()
+        agent.tts_mode = "turn"
+        agent.tts_client = MagicMock()
+        agent.tts_beta_client = MagicMock()
+        return agent
+
+    def test_turn_ssml_marks_each_spoken_segment(self, mock_no_google_credentials):
+        agent = _create_agent()
+        segments = agent._build_segments("Un [DOG_BARK] deux & trois [PAUSE] (rire)")
+        ssml, spoken = agent._turn_ssml(segments)
+        assert spoken == [0, 2]
+        assert '<mark name="t0"/>Un<mark name="e0"/>' in ssml
+        assert '<mark name="t2"/>deux &amp; trois<mark name="e2"/>' in ssml
+        assert ssml.count("<break") == 1
+
+    def test_single_call_splits_audio_per_segment(self, mock_no_google_credentials, audio_store):
+        agent = self._turn_agent()
+        output = {"output": "Un [DOG_BARK] deux [PAUSE] trois"}
+        agent.executor.invoke.return_value = output
+        response = MagicMock()
+        response.audio_content = self.FRAME * 100
+        response.timepoints = [
+            _timepoint("t0", 0.0), _timepoint("e0", 0.48),
+            _timepoint("t2", 0.78), _timepoint("e2", 1.2),
+            _timepoint("t4", 1.5), _timepoint("e4", 2.4),
+        ]
+        agent.tts_beta_client.synthesize_speech.return_value = response
+
+        segments, _ = agent.respond_web("Hello")
+
+        agent.tts_beta_client.synthesize_speech.assert_called_once()
+        agent.tts_client.synthesize_speech.assert_not_called()
+        assert [s["type"] for s in segments] == ["text", "sound", "text", "pause", "text"]
+        lengths = [
+            len(audio_store.get(audio_id_from_url(s["tts_url"])))
+            for s in segments if s["type"] == "text"
+        ]
+        assert lengths == [20 * 96, 17 * 96, 37 * 96]
+
+    def test_missing_marks_fall_back_to_segment_synthesis(self, mock_no_google_credentials, audio_store):
+        agent = self._turn_agent()
+        agent.executor.ainvoke = AsyncMock(return_value={"output": "Un [DOORBELL] deux"})
+        response = MagicMock()
+        response.audio_content = self.FRAME * 10
+        response.timepoints = []
+        agent.tts_beta_client.synthesize_speech.return_value = response
+        agent.tts_client.synthesize_speech.return_value = MagicMock(audio_content=b"seg")
+
+        segments, _ = asyncio.run(agent.arespond_web("Hello"))
+
+        assert agent.tts_client.synthesize_speech.call_count == 2
+        assert audio_store.get(audio_id_from_url(segments[0]["tts_url"])) == b"seg"
+
+    def test_tts_failure_returns_text_only(self, mock_no_google_credentials):
+        agent = self._turn_agent()
+        agent.executor.invoke.return_value = {"output": "Un [DOORBELL] deux"}
+        agent.tts_beta_client.synthesize_speech.side_effect = Exception("TTS down")
+
+        segments, _ = agent.respond_web("Hello")
+
+        agent.tts_client.synthesize_speech.assert_not_called()
+        assert all("tts_url" not in s for s in segments)
+
+
 class TestGetHistorySummary:
     def test_empty_memory_returns_aucun_historique(self, mock_no_google_credentials):
         agent = _create_agent()
@@ -161,3 +319,100 @@ class TestGetHistorySummary:
         result = agent.get_history_summary(max_turns=2)
         lines = result.strip().split("\n")
         assert len(lines) == 4  # 2 turns * 2 messages
+
+
+    def test_lines_formatted_once_per_message(self, mock_no_google_credentials):
+        agent = _create_agent()
+        agent.memory.save_context({"input": "Allô ?"}, {"output": "Oui [PAUSE] qui est là ?"})
+        with patch.object(VictimAgent, "_TAG_PATTERN") as pattern:
+            result = agent.get_history_summary()
+        pattern.sub.assert_not_called()
+        assert result == "Arnaqueur: Allô ?\nJeanne: Oui  qui est là ?"
+
+    def test_history_survives_memory_pruning(self, mock_no_google_credentials):
+        agent = _create_agent()
+        agent.memory.max_turns = 1
+        agent.memory.max_token_limit = 10_000
+        for i in range(8):
+            agent.memory.save_context({"input": f"Question {i}"}, {"output": f"Réponse {i}"})
+        lines = agent.get_history_summary(max_turns=5).split("\n")
+        assert len(agent.memory.chat_memory.messages) == 2
+        assert lines[0] == "Arnaqueur: Question 3"
+        assert lines[-1] == "Jeanne: Réponse 7"
+
+    def test_rebuilt_after_memory_load(self, mock_no_google_credentials):
+        agent = _create_agent()
+        agent.memory.save_context({"input": "Avant"}, {"output": "Avant"})
+        agent.load_memory({"messages": [["h", "Après"], ["a", "Oui"]]})
+        assert agent.get_history_summary() == "Arnaqueur: Après\nJeanne: Oui"
+        agent.load_memory({"messages": []})
+        assert agent.get_history_summary() == "Aucun historique"
+
+class TestFork:
+    def test_fork_copies_memory_independently(self, mock_no_google_credentials):
+        agent = _create_agent()
+        agent.memory.chat_memory.add_user_message("Allô ?")
+        with patch("app.agents.victim_agent.create_openai_functions_agent"), \
+             patch("app.agents.victim_agent.get_chat_model"), \
+             patch("app.agents.victim_agent.AgentExecutor"):
+            clone = agent.fork()
+        clone.memory.chat_memory.add_ai_message("Oui ?")
+        assert clone.tts_mode == agent.tts_mode
+        assert len(agent.memory.chat_memory.messages) == 1
+        assert [m.content for m in clone.memory.chat_memory.messages] == ["Allô ?", "Oui ?"]
+
+
+class _RecordingChatModel(FakeListChatModel):
+    """Fake LLM that records the messages it is sent."""
+    seen: list = []
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        self.seen.append([(m.type, m.content) for m in messages])
+        return super()._call(messages, stop, run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.seen.append([(m.type, m.content) for m in messages])
+        yield from super()._stream(messages, stop, run_manager, **kwargs)
+
+
+class TestLeanMode:
+    REPLIES = ["Oh [DOG_BARK] Poupoune ! Attendez.", "Je ne sais plus [PAUSE] quoi."]
+
+    def _agent(self, lean):
+        llm = _RecordingChatModel(responses=list(self.REPLIES), seen=[])
+        with patch("app.agents.victim_agent.get_chat_model", return_value=llm):
+            agent = VictimAgent("fake-key", lean=lean)
+        return agent, llm
+
+    def test_lean_mode_skips_agent_executor(self, mock_no_google_credentials):
+        agent, _ = self._agent(lean=True)
+        assert agent.executor is None
+        assert agent.chain is not None
+
+    def test_env_enables_lean_mode(self, mock_no_google_credentials, monkeypatch):
+        monkeypatch.setenv("VICTIM_LEAN", "1")
+        agent, _ = self._agent(lean=None)
+        assert agent.lean and agent.executor is None
+
+    def test_same_prompt_output_and_memory_as_executor(self, mock_no_google_credentials):
+        runs = []
+        for lean in (False, True):
+            agent, llm = self._agent(lean)
+            results = [agent.respond_web("Allô, votre banque.", "Gagner du temps", "None"),
+                       agent.respond_web("Votre code ?", "Digresser", "Aucune")]
+            runs.append((results, llm.seen, agent.dump_memory()))
+        assert runs[0] == runs[1]
+        assert [t for t, _ in runs[1][1][1]] == ["system", "human", "ai", "human"]
+
+    def test_async_path_records_memory(self, mock_no_google_credentials):
+        agent, llm = self._agent(lean=True)
+        segments, clean = asyncio.run(agent.agenerate("Allô ?", "Gagner du temps"))
+        assert clean == "Oh  Poupoune ! Attendez."
+        assert [s["type"] for s in segments] == ["text", "sound", "text"]
+        assert agent.get_history_summary() == "Arnaqueur: Allô ?\nJeanne: Oh  Poupoune ! Attendez."
+
+    def test_fork_keeps_lean_mode(self, mock_no_google_credentials):
+        agent, llm = self._agent(lean=True)
+        with patch("app.agents.victim_agent.get_chat_model", return_value=llm):
+            clone = agent.fork()
+        assert clone.lean and clone.executor is None